@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file aoj.py
+@brief 各スクリプトの機能をサブコマンドとしてまとめた統合コマンド
+
+サブコマンドのモジュールは実行するときに初めて読み込むため、
+オフラインの処理（export/rank/similarity）はrequestsなどの通信用ライブラリを読み込まずに起動します。
+サブコマンドを複数並べると順に実行し、user.csvは最初に必要になったときに1回だけ読み込んで
+以降の処理に渡します（checkで更新した内容は、ファイルを読み直さずにrank・exportに反映されます）。
+
+使用方法:
+  python3 aoj.py check --workers 8
+  python3 aoj.py export --format xlsx
+  python3 aoj.py check rank export
+"""
+
+import argparse
+import importlib
+import sys
+from typing import Dict, List, Optional, Tuple
+
+# サブコマンド: (モジュール, 引数を追加する関数, 実行する関数, 説明)
+COMMANDS: Dict[str, Tuple[str, str, str, str]] = {
+    "init": ("check_submission", "add_data_arguments", "run_init", "user.csvを初期化"),
+    "clean": ("check_submission", "add_data_arguments", "run_clean", "user.csvを正規化"),
+    "check": ("check_submission", "add_arguments", "run_check", "提出状況を確認・更新"),
+    "download": ("download_all_submissions", "add_arguments", "run_download",
+                 "100点の提出をダウンロード"),
+    "export": ("export_excel", "add_arguments", "run_export", "Excel用レポートを出力"),
+    "rank": ("generate_rankings", "add_arguments", "run_rankings", "ランキングを出力"),
+    "similarity": ("similarity", "add_arguments", "run_similarity", "似た提出を検出"),
+}
+
+# サブコマンドによって意味が異なる引数。これを持つサブコマンドを複数並べた場合は、
+# それぞれ「--コマンド名-引数名」（例: --rank-incremental, --similarity-output）で指定する
+AMBIGUOUS_OPTIONS = ("--incremental", "--output")
+
+# -i/-pを使わずにuser.csv・prob.csv（または--db）を読み込み、読み込んだ（更新した）データを
+# 次のサブコマンドに渡すサブコマンド
+ROSTER_COMMANDS = ("check", "download", "rank")
+
+# 読み込むファイルを指定する引数（前のサブコマンドがデータを渡す場合は使われない）
+INPUT_OPTIONS = {"input": "-i/--input", "problems": "-p/--problems"}
+
+# APIにアクセスするサブコマンド（終了時に処理時間・リクエストの概要を表示する）
+NETWORK_COMMANDS = ("check", "download")
+
+def split_commands(argv: List[str]) -> Tuple[List[str], List[str]]:
+    """
+    先頭に並んだサブコマンド名と、残りの引数に分ける
+
+    @param argv コマンドライン引数
+    @return (サブコマンド名のリスト, 残りの引数)
+    """
+    count = 0
+    while count < len(argv) and argv[count] in COMMANDS:
+        count += 1
+    return argv[:count], argv[count:]
+
+def usage() -> str:
+    """
+    サブコマンドの一覧を含む使用方法
+
+    @return 使用方法の文字列
+    """
+    lines = ["使用方法: aoj.py COMMAND [COMMAND ...] [オプション]", "", "コマンド:"]
+    lines += [f"  {name:<11} {spec[3]}" for name, spec in COMMANDS.items()]
+    lines += ["", "複数のコマンドを並べると順に実行し、読み込んだuser.csvを共有します（例: check rank export）。",
+              "各コマンドのオプションは aoj.py COMMAND --help で表示します。"]
+    return "\n".join(lines)
+
+def option_dest(flags: Tuple[str, ...], kwargs: dict) -> str:
+    """
+    argparseと同じ規則で引数の格納先の名前を求める
+
+    @param flags 引数の名前（-o, --outputなど）
+    @param kwargs add_argumentのキーワード引数
+    @return 格納先の名前
+    """
+    if "dest" in kwargs:
+        return kwargs["dest"]
+    longs = [f for f in flags if f.startswith("--")]
+    return (longs or list(flags))[0].lstrip("-").replace("-", "_")
+
+class ArgumentRecorder:
+    """add_argumentsが追加する引数を記録する（パーサーの代わりに渡す）"""
+
+    def __init__(self):
+        self.calls: List[Tuple[Tuple[str, ...], dict]] = []
+
+    def add_argument(self, *flags: str, **kwargs):
+        self.calls.append((flags, kwargs))
+
+def build_parser(commands: List[str]) -> Tuple[argparse.ArgumentParser, Dict[str, Dict[str, str]]]:
+    """
+    指定されたサブコマンドのモジュールだけを読み込み、それらの引数をまとめたパーサーを作成する。
+    同じ名前で同じ意味の引数（--db・--workersなど）は全てのサブコマンドで共有する。
+    意味が異なる引数（AMBIGUOUS_OPTIONS）を複数のサブコマンドが持つ場合は、
+    サブコマンドごとに「--コマンド名-引数名」として追加する。
+
+    @param commands サブコマンド名のリスト
+    @return (引数パーサー, サブコマンドごとの{元の格納先: 名前を変えた格納先})
+    """
+    from metrics import add_metrics_arguments
+
+    commands = list(dict.fromkeys(commands))
+    recorded = {}
+    for name in commands:
+        module_name, add_name, _, _ = COMMANDS[name]
+        recorder = ArgumentRecorder()
+        getattr(importlib.import_module(module_name), add_name)(recorder)
+        recorded[name] = recorder.calls
+
+    owners: Dict[str, int] = {}
+    for name in commands:
+        for flags, _ in recorded[name]:
+            for flag in set(flags) & set(AMBIGUOUS_OPTIONS):
+                owners[flag] = owners.get(flag, 0) + 1
+
+    parser = argparse.ArgumentParser(prog="aoj.py " + " ".join(commands))
+    shared: Dict[str, str] = {}
+    renames: Dict[str, Dict[str, str]] = {name: {} for name in commands}
+    for name in commands:
+        group = parser.add_argument_group(f"{name}: {COMMANDS[name][3]}")
+        for flags, kwargs in recorded[name]:
+            dest = option_dest(flags, kwargs)
+            if any(owners.get(flag, 0) > 1 for flag in flags):
+                renamed = f"{name}_{dest}"
+                renames[name][dest] = renamed
+                group.add_argument(*(f"--{name}-{f[2:]}" for f in flags if f.startswith("--")),
+                                   **dict(kwargs, dest=renamed))
+            elif flags and all(shared.get(flag) == dest for flag in flags):
+                # 前のサブコマンドが追加した同じ引数を共有する
+                continue
+            else:
+                # 名前が同じで格納先が異なる引数はargparseがエラーにする
+                group.add_argument(*flags, **kwargs)
+                shared.update((flag, dest) for flag in flags)
+    add_metrics_arguments(parser)
+    return parser, renames
+
+def check_inputs(parser: argparse.ArgumentParser, commands: List[str], args: argparse.Namespace):
+    """
+    前のサブコマンドから渡されるデータの代わりに読み込むファイルが指定されていないか確認する
+
+    @param parser 引数パーサー（エラーの表示に使用）
+    @param commands サブコマンド名のリスト
+    @param args 解析した引数
+    """
+    for i, name in enumerate(commands):
+        if not set(commands[:i]) & set(ROSTER_COMMANDS):
+            continue
+        for dest, label in INPUT_OPTIONS.items():
+            if dest not in vars(args):
+                continue
+            default = parser.get_default(dest)
+            if getattr(args, dest) != default:
+                previous = next(c for c in commands[:i] if c in ROSTER_COMMANDS)
+                parser.error(f"{label}は{name}の前の{previous}が読み込んだデータを使うため指定できません"
+                             f"（{name}を先頭にするか、別々に実行してください）")
+
+def command_args(args: argparse.Namespace, renames: Dict[str, str]) -> argparse.Namespace:
+    """
+    サブコマンドに渡す引数を作る（名前を変えた引数を元の名前で参照できるようにする）
+
+    @param args 解析した引数
+    @param renames {元の格納先: 名前を変えた格納先}
+    @return サブコマンドの引数
+    """
+    if not renames:
+        return args
+    values = vars(args).copy()
+    values.update((dest, getattr(args, renamed)) for dest, renamed in renames.items())
+    return argparse.Namespace(**values)
+
+def main(argv: Optional[List[str]] = None):
+    argv = sys.argv[1:] if argv is None else argv
+    commands, rest = split_commands(argv)
+    if not commands:
+        print(usage())
+        if rest and rest[0] not in ("-h", "--help"):
+            print(f"\nエラー: 不明なコマンドです: {rest[0]}")
+            sys.exit(2)
+        return
+
+    parser, renames = build_parser(commands)
+    args = parser.parse_args(rest)
+    check_inputs(parser, commands, args)
+
+    from metrics import get_metrics, write_metrics_from_args
+
+    metrics = get_metrics()
+    metrics.script = "aoj"
+
+    # 各処理は読み込んだ（更新した）データを返し、次の処理はそれをそのまま使う
+    roster = None
+    for name in commands:
+        module_name, _, run_name, _ = COMMANDS[name]
+        if len(commands) > 1:
+            print(f"== {name} ==")
+        roster = getattr(importlib.import_module(module_name), run_name)(
+            command_args(args, renames[name]), roster)
+        if roster is not None:
+            # スナップショットのメモリマップ（ファイルとファイル記述子）を次の処理に持ち越さない
+            roster.release()
+
+    if len(commands) > 1 or (set(commands) & set(NETWORK_COMMANDS)
+                              and not getattr(args, "watch", False)):
+        metrics.print_summary()
+    write_metrics_from_args(args, metrics)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file aoj_client.py
+@brief AOJ APIへのリクエストを共通化するクライアント
+
+check_submission.pyとdownload_all_submissions.pyで共有するHTTPクライアントです。
+コネクションプール付きのSessionを使い回してTLSハンドシェイクを削減し、
+5xxエラーや接続エラーは指数バックオフ（ジッター付き）で再試行します。
+リクエスト速度は同じエンドポイントで共有するRateLimiterで制御し、
+429/503の抑制応答ではRetry-Afterに従って待機・減速します。
+結果はFetchResultとして返し、「提出なし」と「取得失敗」を区別できるようにします。
+stream_jsonはJSON配列の応答を受信しながら1要素ずつ返し（json_stream.py）、途中で打ち切れます。
+環境変数AOJ_ENDPOINTを指定すると、そのURLをエンドポイントとして使用します（stub_server.py用）。
+"""
+
+import os
+import random
+import threading
+import time
+from typing import Any, Iterator, NamedTuple, Optional
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+from json_stream import iter_json_array
+from metrics import Metrics, get_metrics
+from rate_limiter import RateLimiter, get_rate_limiter, parse_retry_after
+from response_cache import ResponseCache
+
+# SSL警告を抑制
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+# AOJ APIのエンドポイント（環境変数AOJ_ENDPOINTで変更可能）
+ENDPOINT = os.environ.get("AOJ_ENDPOINT", 'https://judgeapi.u-aizu.ac.jp')
+
+# 取得結果の状態
+STATUS_OK = "ok"                # 取得成功
+STATUS_NOT_FOUND = "not_found"  # 該当データなし（提出なし）
+STATUS_ERROR = "error"          # 取得失敗
+
+# デフォルト設定
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_BASE = 0.5   # 秒
+DEFAULT_BACKOFF_MAX = 8.0    # 秒
+DEFAULT_TIMEOUT = 10         # 秒
+
+# ストリーミング受信の1回あたりの読み込みサイズ（バイト）
+STREAM_CHUNK_SIZE = 8192
+
+# 途中で打ち切った応答の残りがこのバイト数以下なら読み捨てて接続を再利用する
+DRAIN_LIMIT = 1 << 16
+
+# 抑制（スロットリング）を示すHTTPステータス
+THROTTLE_STATUS = (429, 503)
+
+class FetchResult(NamedTuple):
+    """APIリクエストの結果"""
+    status: str
+    data: Any = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        """取得に成功したか（該当データなしも成功として扱う）"""
+        return self.status != STATUS_ERROR
+
+class AOJClient:
+    """コネクションプールと再試行を備えたAOJ APIクライアント"""
+
+    def __init__(self, endpoint: str = ENDPOINT,
+                 pool_size: int = DEFAULT_POOL_SIZE,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 backoff_base: float = DEFAULT_BACKOFF_BASE,
+                 backoff_max: float = DEFAULT_BACKOFF_MAX,
+                 timeout: float = DEFAULT_TIMEOUT,
+                 cache: Optional[ResponseCache] = None,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 metrics: Optional[Metrics] = None):
+        """
+        @param endpoint APIのベースURL
+        @param pool_size 接続プールのサイズ（並列実行数以上を推奨）
+        @param max_retries 再試行の最大回数
+        @param backoff_base バックオフの基準秒数
+        @param backoff_max バックオフの最大秒数
+        @param timeout 1リクエストのタイムアウト秒数
+        @param cache レスポンスキャッシュ（Noneならキャッシュしない）
+        @param rate_limiter レートリミッター（省略時はエンドポイントで共有するもの）
+        @param metrics 応答時間などの計測器（省略時はプロセス内で共有するもの）
+        """
+        self.endpoint = endpoint
+        self.cache = cache
+        self.rate_limiter = rate_limiter or get_rate_limiter(endpoint)
+        self.metrics = metrics or get_metrics()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.verify = False
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def backoff(self, attempt: int) -> float:
+        """
+        再試行までの待機秒数を計算する（フルジッター付き指数バックオフ）
+
+        @param attempt 何回目の再試行か（0始まり）
+        @return 待機秒数
+        """
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def get_json(self, path: str, params: Optional[dict] = None) -> FetchResult:
+        """
+        APIからJSONを取得する
+
+        @param path エンドポイントからのパス（例: /reviews/12345）
+        @param params クエリパラメータ
+        @return FetchResult（404は該当データなしとして返す）
+        """
+        if self.cache is not None:
+            data = self.cache.get(path, params)
+            if data is not None:
+                return FetchResult(STATUS_OK, data)
+
+        result = self._request(path, params)
+        if self.cache is not None and result.status == STATUS_OK:
+            self.cache.put(path, params, result.data)
+        return result
+
+    def stream_json(self, path: str, params: Optional[dict] = None) -> FetchResult:
+        """
+        APIからJSONの配列を取得し、要素を受信しながら1つずつ返す。
+        応答全体をリストにしないため、途中で打ち切れば残りは受信・解析しない。
+        キャッシュを使う場合は応答全体をキャッシュするため、get_jsonで取得した配列を順に返す。
+
+        @param path エンドポイントからのパス
+        @param params クエリパラメータ
+        @return FetchResult（dataは要素のイテレータ、404は該当データなしとしてNone）。
+                イテレータは受信中の切断や不正なJSONでValueErrorを送出する
+        """
+        if self.cache is not None:
+            result = self.get_json(path, params)
+            if result.status == STATUS_OK:
+                return FetchResult(STATUS_OK, iter(result.data or []))
+            return result
+        return self._request(path, params, stream=True)
+
+    @staticmethod
+    def _iter_response(resp: requests.Response) -> Iterator[Any]:
+        """
+        ストリーミング受信中の応答からJSON配列の要素を順に返す
+
+        @param resp stream=Trueで受信した応答
+        @return 配列の要素のイテレータ
+        """
+        try:
+            yield from iter_json_array(resp.iter_content(STREAM_CHUNK_SIZE))
+        except requests.RequestException as e:
+            raise ValueError(f"受信中にエラーが発生しました - {e}") from e
+        finally:
+            # 打ち切った場合も残りが少なければ読み捨て、接続をプールに戻す
+            try:
+                drained = 0
+                for chunk in resp.iter_content(STREAM_CHUNK_SIZE):
+                    drained += len(chunk)
+                    if drained > DRAIN_LIMIT:
+                        break
+            except requests.RequestException:
+                pass
+            resp.close()
+
+    def _request(self, path: str, params: Optional[dict] = None,
+                 stream: bool = False) -> FetchResult:
+        """
+        APIにリクエストし、必要に応じて再試行する
+
+        @param path エンドポイントからのパス
+        @param params クエリパラメータ
+        @param stream 200の応答を受信しながら解析するか（dataはJSON配列の要素のイテレータ）
+        @return FetchResult
+        """
+        url = f"{self.endpoint}{path}"
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                self.metrics.observe_retry()
+            self.rate_limiter.acquire()
+            retry_after = None
+            start = time.perf_counter()
+            try:
+                resp = self.session.get(url, params=params, timeout=self.timeout, stream=stream)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.metrics.observe_request("error", time.perf_counter() - start)
+                error = str(e)
+            else:
+                if stream and resp.status_code == 200:
+                    # 本文はまだ受信していないため、ヘッダーの長さを受信バイト数とする
+                    nbytes = int(resp.headers.get("Content-Length") or 0)
+                else:
+                    nbytes = len(resp.content)
+                self.metrics.observe_request(str(resp.status_code), time.perf_counter() - start,
+                                             nbytes)
+                if resp.status_code in THROTTLE_STATUS:
+                    # 抑制応答: 共有リミッターを減速させ、Retry-Afterがあればその間待機
+                    error = f"HTTP {resp.status_code}"
+                    retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+                    self.rate_limiter.on_throttle(retry_after)
+                elif resp.status_code == 404:
+                    self.rate_limiter.on_success()
+                    return FetchResult(STATUS_NOT_FOUND)
+                elif resp.status_code >= 500:
+                    error = f"HTTP {resp.status_code}"
+                elif resp.status_code != 200:
+                    # 5xx以外のエラーは再試行しても結果が変わらない
+                    return FetchResult(STATUS_ERROR, error=f"HTTP {resp.status_code}")
+                else:
+                    self.rate_limiter.on_success()
+                    if stream:
+                        return FetchResult(STATUS_OK, self._iter_response(resp))
+                    try:
+                        return FetchResult(STATUS_OK, resp.json())
+                    except ValueError as e:
+                        return FetchResult(STATUS_ERROR, error=f"JSON解析失敗 - {e}")
+
+            # Retry-Afterの待機はリミッターが行う
+            if attempt < self.max_retries and retry_after is None:
+                time.sleep(self.backoff(attempt))
+
+        return FetchResult(STATUS_ERROR, error=error)
+
+    def close(self):
+        """Sessionを閉じる"""
+        self.session.close()
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+def get_default_client() -> AOJClient:
+    """
+    プロセス内で共有するデフォルトのクライアントを返す
+
+    @return AOJClient
+    """
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = AOJClient()
+        return _default_client
+
+def set_default_client(client: AOJClient):
+    """
+    プロセス内で共有するデフォルトのクライアントを差し替える
+
+    @param client 新しいクライアント
+    """
+    global _default_client
+    with _default_client_lock:
+        _default_client = client
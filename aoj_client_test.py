@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file aoj_client_test.py
+@brief aoj_client.pyのテストコード
+"""
+
+import argparse
+import json
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+from aoj_client import AOJClient, STATUS_ERROR, STATUS_NOT_FOUND, STATUS_OK
+from metrics import Metrics
+from rate_limiter import RateLimiter, add_rate_arguments, parse_retry_after, rate_limiter_from_args
+
+def make_response(status_code: int, data=None, headers=None) -> mock.Mock:
+    """テスト用のレスポンスを生成"""
+    resp = mock.Mock()
+    resp.status_code = status_code
+    resp.headers = headers or {}
+    resp.json.return_value = data
+    resp.content = json.dumps(data).encode("utf-8")
+    # ストリーミング受信では3バイトずつ返す
+    resp.iter_content.side_effect = lambda size: iter(
+        [resp.content[i:i + 3] for i in range(0, len(resp.content), 3)])
+    return resp
+
+class TestAOJClient(unittest.TestCase):
+    def setUp(self):
+        """テスト前の準備（バックオフ待ちなし）"""
+        self.limiter = RateLimiter(rate=1000, max_rate=1000, burst=1000)
+        self.metrics = Metrics("test")
+        self.client = AOJClient(max_retries=2, backoff_base=0, rate_limiter=self.limiter,
+                                metrics=self.metrics)
+
+    def test_get_json_ok(self):
+        """正常取得のテスト"""
+        with mock.patch.object(self.client.session, "get",
+                               return_value=make_response(200, [{"score": 100}])):
+            result = self.client.get_json("/submission_records/users/test1")
+        self.assertEqual(result.status, STATUS_OK)
+        self.assertTrue(result.ok)
+        self.assertEqual(result.data, [{"score": 100}])
+
+    def test_get_json_not_found(self):
+        """404を提出なしとして扱うテスト"""
+        with mock.patch.object(self.client.session, "get", return_value=make_response(404)):
+            result = self.client.get_json("/reviews/1")
+        self.assertEqual(result.status, STATUS_NOT_FOUND)
+        self.assertTrue(result.ok)
+        self.assertIsNone(result.data)
+
+    def test_get_json_retry_on_server_error(self):
+        """5xxエラー時に再試行するテスト"""
+        responses = [make_response(503), make_response(500), make_response(200, [])]
+        with mock.patch.object(self.client.session, "get", side_effect=responses) as get:
+            result = self.client.get_json("/reviews/1")
+        self.assertEqual(get.call_count, 3)
+        self.assertEqual(result.status, STATUS_OK)
+        requests_metrics = self.metrics.to_dict()["requests"]
+        self.assertEqual(requests_metrics["status"], {"200": 1, "500": 1, "503": 1})
+        self.assertEqual(requests_metrics["retries"], 2)
+        self.assertEqual(requests_metrics["latency_seconds_buckets"]["+Inf"], 3)
+
+    def test_get_json_connection_error(self):
+        """接続エラーが続いた場合に取得失敗となるテスト"""
+        with mock.patch.object(self.client.session, "get",
+                               side_effect=requests.ConnectionError("down")) as get:
+            result = self.client.get_json("/reviews/1")
+        self.assertEqual(get.call_count, 3)
+        self.assertEqual(result.status, STATUS_ERROR)
+        self.assertFalse(result.ok)
+        self.assertEqual(self.metrics.to_dict()["requests"]["status"], {"error": 3})
+
+    def test_get_json_client_error_not_retried(self):
+        """4xxエラーは再試行しないテスト"""
+        with mock.patch.object(self.client.session, "get", return_value=make_response(400)) as get:
+            result = self.client.get_json("/reviews/1")
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(result.status, STATUS_ERROR)
+
+    def test_get_json_throttled(self):
+        """429応答でRetry-Afterに従い減速して再試行するテスト"""
+        responses = [make_response(429, headers={"Retry-After": "0"}), make_response(200, [])]
+        with mock.patch.object(self.client.session, "get", side_effect=responses) as get:
+            result = self.client.get_json("/reviews/1")
+        self.assertEqual(get.call_count, 2)
+        self.assertEqual(result.status, STATUS_OK)
+        self.assertEqual(self.limiter.throttled, 1)
+        self.assertLess(self.limiter.rate, 1000)
+
+    def test_stream_json(self):
+        """受信しながら要素を返し、終了後に応答を閉じることのテスト"""
+        data = [{"score": 100, "judgeId": i} for i in range(5)]
+        resp = make_response(200, data)
+        with mock.patch.object(self.client.session, "get", return_value=resp) as get:
+            result = self.client.stream_json("/submission_records/users/test1")
+        self.assertTrue(get.call_args.kwargs["stream"])
+        self.assertEqual(result.status, STATUS_OK)
+        self.assertEqual(list(result.data), data)
+        resp.close.assert_called_once()
+
+        # 不正なJSONは要素を返す途中でValueErrorとなる
+        resp = make_response(200)
+        resp.iter_content.side_effect = lambda size: iter([b'[{"score": 1}, {"sc'])
+        with mock.patch.object(self.client.session, "get", return_value=resp):
+            result = self.client.stream_json("/submission_records/users/test1")
+        with self.assertRaises(ValueError):
+            list(result.data)
+
+        with mock.patch.object(self.client.session, "get", return_value=make_response(404)):
+            self.assertEqual(self.client.stream_json("/reviews/1").status, STATUS_NOT_FOUND)
+
+class TestRateLimiter(unittest.TestCase):
+    def test_aimd(self):
+        """正常応答で加算的に増え、抑制応答で半分になることのテスト"""
+        limiter = RateLimiter(rate=10, min_rate=1, max_rate=20)
+        for _ in range(10):
+            limiter.on_success()
+        self.assertGreater(limiter.rate, 10)
+        self.assertLessEqual(limiter.rate, 20)
+
+        rate = limiter.rate
+        limiter.on_throttle()
+        self.assertAlmostEqual(limiter.rate, rate / 2)
+        # クールダウン中の連続した抑制応答では再度減速しない
+        limiter.on_throttle()
+        self.assertAlmostEqual(limiter.rate, rate / 2)
+
+    def test_retry_after_pauses(self):
+        """Retry-Afterの間はトークンを取得できないことのテスト"""
+        limiter = RateLimiter(rate=1000, max_rate=1000, burst=1000)
+        limiter.on_throttle(retry_after=0.05)
+        start = time.monotonic()
+        limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.04)
+
+    def test_shared_from_args(self):
+        """引数から得たリミッターを同じエンドポイントの全クライアントが共有することのテスト"""
+        endpoint = "http://rate-limiter-test.invalid"
+        args = argparse.Namespace(rate=3.0, max_rate=6.0)
+        limiter = rate_limiter_from_args(args, endpoint)
+        self.assertIs(AOJClient(endpoint).rate_limiter, limiter)
+        self.assertEqual((limiter.rate, limiter.max_rate), (3.0, 6.0))
+        # 同じ設定で再度構成しても調整済みのレートは保たれる
+        limiter.on_success()
+        rate = limiter.rate
+        self.assertIs(rate_limiter_from_args(args, endpoint), limiter)
+        self.assertEqual(limiter.rate, rate)
+
+    def test_invalid_rate(self):
+        """0以下のレートは引数の解析時・リミッターの作成時に拒否することのテスト"""
+        parser = argparse.ArgumentParser()
+        add_rate_arguments(parser)
+        self.assertEqual(parser.parse_args(["--rate", "2.5"]).rate, 2.5)
+        for argv in (["--rate", "0"], ["--max-rate", "-1"], ["--rate", "fast"]):
+            with self.assertRaises(SystemExit), mock.patch("sys.stderr"):
+                parser.parse_args(argv)
+        with self.assertRaises(ValueError):
+            RateLimiter(rate=0)
+        with self.assertRaises(ValueError):
+            RateLimiter(max_rate=0)
+        limiter = RateLimiter()
+        with self.assertRaises(ValueError):
+            limiter.configure(10, 0)
+        self.assertEqual(limiter.settings, (10.0, 50.0))
+
+    def test_parse_retry_after(self):
+        """Retry-Afterヘッダーの解釈テスト"""
+        self.assertEqual(parse_retry_after("3"), 3.0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("invalid"))
+        self.assertEqual(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0.0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file aoj_test.py
+@brief aoj.pyのテストコード
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import export_excel
+import generate_rankings
+from aoj import build_parser, command_args, main, split_commands
+from roster_snapshot import load_report_roster
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+class TestAOJ(unittest.TestCase):
+    def setUp(self):
+        """一時ディレクトリにuser.csv・prob.csvを用意して移動する"""
+        self.cwd = os.getcwd()
+        self.dir = tempfile.mkdtemp()
+        shutil.copy(os.path.join(HERE, "test_data", "user_test.csv"),
+                    os.path.join(self.dir, "user.csv"))
+        shutil.copy(os.path.join(HERE, "test_data", "prob_test.csv"),
+                    os.path.join(self.dir, "prob.csv"))
+        os.chdir(self.dir)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.dir)
+
+    def test_split_commands(self):
+        """先頭のコマンド名の並びだけをサブコマンドとして扱うことのテスト"""
+        self.assertEqual(split_commands(["check", "rank", "export", "--db", "x", "export"]),
+                         (["check", "rank", "export"], ["--db", "x", "export"]))
+        self.assertEqual(split_commands(["--help"]), ([], ["--help"]))
+
+    def test_pipeline_shares_roster(self):
+        """複数のコマンドを並べたとき、user.csvを1回だけ読み込むことのテスト"""
+        with mock.patch.object(generate_rankings, "load_report_roster",
+                               wraps=load_report_roster) as rank_load, \
+                mock.patch.object(export_excel, "load_report_roster",
+                                  wraps=load_report_roster) as export_load:
+            main(["rank", "export", "--format", "xlsx"])
+        self.assertEqual(rank_load.call_count + export_load.call_count, 1)
+        self.assertTrue(os.path.exists("scores_for_excel.xlsx"))
+        self.assertTrue(any(name.startswith("total_ranking_") for name in os.listdir("rankings")))
+
+    def test_ambiguous_options(self):
+        """意味が異なるオプションはコマンドごとの名前で指定し、無視される入力の指定は拒否することのテスト"""
+        parser, renames = build_parser(["check", "rank"])
+        args = parser.parse_args(["--rank-incremental", "--db", "x.sqlite"])
+        check_args = command_args(args, renames["check"])
+        rank_args = command_args(args, renames["rank"])
+        self.assertEqual((check_args.incremental, rank_args.incremental), (False, True))
+        self.assertEqual((check_args.db, rank_args.db), ("x.sqlite", "x.sqlite"))
+        with self.assertRaises(SystemExit), mock.patch("sys.stderr"):
+            parser.parse_args(["--incremental"])
+
+        # 単独のコマンドでは元の名前のまま
+        parser, renames = build_parser(["rank"])
+        self.assertTrue(parser.parse_args(["--incremental"]).incremental)
+
+        # rankの後のexportは-pのファイルを読まないため拒否し、先頭のexportなら使用する
+        with self.assertRaises(SystemExit), mock.patch("sys.stderr"):
+            main(["rank", "export", "-p", "other.csv"])
+        shutil.copy("prob.csv", "other.csv")
+        main(["export", "rank", "-p", "other.csv", "-o", "out.tsv"])
+        self.assertTrue(os.path.exists("out.tsv"))
+
+    def test_offline_commands_do_not_import_network_modules(self):
+        """オフラインのコマンドがrequestsを読み込まないことのテスト"""
+        code = ("import sys; sys.path.insert(0, %r); import aoj; aoj.main(['export', 'rank']); "
+                "print('requests' in sys.modules)" % HERE)
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                                check=True)
+        self.assertEqual(result.stdout.splitlines()[-1], "False")
+
+if __name__ == "__main__":
+    unittest.main()
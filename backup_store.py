@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file backup_store.py
+@brief user.csvの安全な書き込みと重複排除したバックアップ履歴の管理
+
+- atomic_write_csv: 一時ファイルに書き込み、fsyncしてから置き換えるため、
+  書き込み途中で中断してもuser.csvが壊れない
+- BackupStore: user.csvのスナップショットを内容のハッシュで圧縮保存する。
+  前回と同じ内容なら新しいスナップショットを作らず、保持数を超えた古いものは削除する
+
+使用方法:
+  python3 backup_store.py list                      # バックアップ一覧
+  python3 backup_store.py restore user_20250422_001 # user.csvに復元
+"""
+
+import argparse
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import tempfile
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# デフォルト設定
+BACKUP_DIR = "backups"
+DEFAULT_KEEP = 100   # 保持するスナップショット数
+
+# 新規ファイルのパーミッションに適用するumask（取得には設定が必要なため、並列処理の開始前の読み込み時に1回だけ行う）
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def file_mode(path: str) -> int:
+    """
+    置き換え後のファイルに設定するパーミッションを返す
+
+    @param path 書き込むファイルのパス
+    @return 既存ファイルのパーミッション（新規ファイルの場合はumaskを適用した0o666）
+    """
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+def atomic_write_bytes(path: str, data: bytes, mode: Optional[int] = None):
+    """
+    ファイルを原子的に書き込む（一時ファイル→fsync→置き換え）。
+    パーミッションは既存ファイルのもの（新規ファイルの場合はopenで作成した場合と同じ）を引き継ぐ。
+
+    @param path 書き込むファイルのパス
+    @param data 書き込む内容
+    @param mode パーミッション（省略時は既存ファイルのもの）
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        # mkstempは0600で作成するため、置き換えで元のパーミッションが失われないようにする
+        if hasattr(os, "fchmod"):
+            os.fchmod(fd, file_mode(path) if mode is None else mode)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    # 置き換え（rename）自体を永続化するためディレクトリもfsync
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+def atomic_write_csv(path: str, rows: List[List[str]]):
+    """
+    CSVファイルを原子的に書き込む
+
+    @param path 書き込むファイルのパス
+    @param rows 書き込む行のリスト
+    """
+    buf = io.StringIO(newline="")
+    writer = csv.writer(buf)
+    writer.writerows(rows)
+    atomic_write_bytes(path, buf.getvalue().encode("utf-8"))
+
+class BackupStore:
+    """内容のハッシュで重複排除したバックアップ履歴"""
+
+    def __init__(self, directory: str = BACKUP_DIR):
+        """
+        @param directory バックアップを保存するディレクトリ
+        """
+        self.directory = directory
+        self.objects_dir = os.path.join(directory, "objects")
+        self.index_file = os.path.join(directory, "index.json")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self.snapshots = self._load_index()
+
+    def _load_index(self) -> List[Dict]:
+        """スナップショットの一覧を読み込む"""
+        if not os.path.exists(self.index_file):
+            return []
+        with open(self.index_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_index(self):
+        """スナップショットの一覧を保存する"""
+        data = json.dumps(self.snapshots, ensure_ascii=False, indent=1).encode("utf-8")
+        atomic_write_bytes(self.index_file, data)
+
+    def _object_path(self, digest: str) -> str:
+        """ハッシュに対応する圧縮ファイルのパス"""
+        return os.path.join(self.objects_dir, f"{digest}.csv.gz")
+
+    def _next_name(self) -> str:
+        """user_YYYYMMDD_NNN形式の新しいスナップショット名を返す"""
+        date_str = datetime.now().strftime("%Y%m%d")
+        names = {s["name"] for s in self.snapshots}
+        n = 1
+        while f"user_{date_str}_{n:03d}" in names:
+            n += 1
+        return f"user_{date_str}_{n:03d}"
+
+    def save(self, path: str) -> Tuple[str, bool]:
+        """
+        ファイルのスナップショットを保存する
+
+        @param path バックアップするファイル
+        @return (スナップショット名, 新たに作成したか)
+                直前のスナップショットと同じ内容なら作成せず、その名前を返す
+        """
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+
+        if self.snapshots and self.snapshots[-1]["hash"] == digest:
+            return self.snapshots[-1]["name"], False
+
+        obj = self._object_path(digest)
+        if not os.path.exists(obj):
+            atomic_write_bytes(obj, gzip.compress(data))
+        name = self._next_name()
+        self.snapshots.append({"name": name, "time": datetime.now().isoformat(timespec="seconds"),
+                               "hash": digest, "size": len(data)})
+        self._save_index()
+        return name, True
+
+    def prune(self, keep: int = DEFAULT_KEEP) -> int:
+        """
+        新しい順にkeep件を残して古いスナップショットを削除する
+
+        @param keep 保持するスナップショット数
+        @return 削除したスナップショット数
+        """
+        if len(self.snapshots) <= keep:
+            return 0
+        removed = len(self.snapshots) - keep
+        self.snapshots = self.snapshots[removed:]
+        self._save_index()
+
+        # どのスナップショットからも参照されない圧縮ファイルを削除
+        used = {s["hash"] for s in self.snapshots}
+        for name in os.listdir(self.objects_dir):
+            if name.endswith(".csv.gz") and name[:-len(".csv.gz")] not in used:
+                os.remove(os.path.join(self.objects_dir, name))
+        return removed
+
+    def find(self, name: str) -> Optional[Dict]:
+        """
+        名前からスナップショットを探す
+
+        @param name スナップショット名
+        @return スナップショットの情報（見つからなければNone）
+        """
+        for snapshot in self.snapshots:
+            if snapshot["name"] == name:
+                return snapshot
+        return None
+
+    def restore(self, name: str, dest: str = "user.csv"):
+        """
+        スナップショットを復元する
+
+        @param name スナップショット名
+        @param dest 復元先のファイル
+        """
+        snapshot = self.find(name)
+        if snapshot is None:
+            raise KeyError(name)
+        with open(self._object_path(snapshot["hash"]), "rb") as f:
+            data = gzip.decompress(f.read())
+        atomic_write_bytes(dest, data)
+
+def main():
+    parser = argparse.ArgumentParser(description="user.csvのバックアップ履歴を管理")
+    parser.add_argument("command", choices=["list", "restore"],
+                        help="list: 一覧表示, restore: 復元")
+    parser.add_argument("name", nargs="?", help="復元するスナップショット名")
+    parser.add_argument("-o", "--output", default="user.csv",
+                        help="復元先のファイル（デフォルト: user.csv）")
+    parser.add_argument("--dir", default=BACKUP_DIR,
+                        help=f"バックアップディレクトリ（デフォルト: {BACKUP_DIR}）")
+    args = parser.parse_args()
+
+    store = BackupStore(args.dir)
+    if args.command == "list":
+        for s in store.snapshots:
+            print(f"{s['name']}\t{s['time']}\t{s['size']}バイト\t{s['hash'][:12]}")
+        return
+
+    if not args.name:
+        parser.error("restoreにはスナップショット名が必要です")
+    try:
+        store.restore(args.name, args.output)
+    except KeyError:
+        print(f"エラー: スナップショット{args.name}が見つかりません")
+        return
+    print(f"{args.name}を{args.output}に復元しました。")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file backup_store_test.py
+@brief backup_store.pyのテストコード
+"""
+
+import csv
+import os
+import shutil
+import tempfile
+import unittest
+
+import backup_store
+from backup_store import BackupStore, atomic_write_bytes, atomic_write_csv
+
+class TestBackupStore(unittest.TestCase):
+    def setUp(self):
+        """テスト用のディレクトリを作成"""
+        self.directory = tempfile.mkdtemp()
+        self.user_csv = os.path.join(self.directory, "user.csv")
+        self.store = BackupStore(os.path.join(self.directory, "backups"))
+
+    def tearDown(self):
+        """テスト用のディレクトリを削除"""
+        shutil.rmtree(self.directory)
+
+    def write_user_csv(self, score: str):
+        """テスト用のuser.csvを書き込む"""
+        atomic_write_csv(self.user_csv, [["123456", "テスト", "太郎", "test1", score, "0", "-1"]])
+
+    def test_atomic_write_csv(self):
+        """書き込んだ内容が読めて一時ファイルが残らないことのテスト"""
+        self.write_user_csv("100")
+        with open(self.user_csv, newline="") as f:
+            self.assertEqual(next(csv.reader(f))[4], "100")
+        self.assertEqual(sorted(os.listdir(self.directory)), ["backups", "user.csv"])
+
+    def test_atomic_write_keeps_mode(self):
+        """既存ファイルのパーミッションを引き継ぎ、新規ファイルはumaskに従うことのテスト"""
+        atomic_write_bytes(self.user_csv, b"new")
+        self.assertEqual(os.stat(self.user_csv).st_mode & 0o777, 0o666 & ~backup_store._UMASK)
+        os.chmod(self.user_csv, 0o640)
+        self.write_user_csv("100")
+        self.assertEqual(os.stat(self.user_csv).st_mode & 0o777, 0o640)
+
+    def test_dedup_identical_snapshots(self):
+        """同じ内容では新しいスナップショットを作らないことのテスト"""
+        self.write_user_csv("0")
+        name1, created1 = self.store.save(self.user_csv)
+        name2, created2 = self.store.save(self.user_csv)
+        self.assertTrue(created1)
+        self.assertFalse(created2)
+        self.assertEqual(name1, name2)
+        self.assertEqual(len(self.store.snapshots), 1)
+
+    def test_prune_and_restore(self):
+        """保持数を超えたら古いものを削除し、残りは復元できることのテスト"""
+        names = []
+        for score in ["0", "50", "100"]:
+            self.write_user_csv(score)
+            names.append(self.store.save(self.user_csv)[0])
+        self.assertEqual(self.store.prune(keep=2), 1)
+        self.assertIsNone(self.store.find(names[0]))
+        self.assertEqual(len(os.listdir(self.store.objects_dir)), 2)
+
+        self.store.restore(names[1], self.user_csv)
+        with open(self.user_csv, newline="") as f:
+            self.assertEqual(next(csv.reader(f))[4], "50")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file batch_runner.py
+@brief 複数のコース（user.csv・prob.csvを置いたディレクトリ）をまとめて処理する
+
+各コースのディレクトリで check_submission.py → export_excel.py → generate_rankings.py を
+順に実行する代わりに、次の3段階で全コースを処理します。
+
+1. load: 各コースのuser.csv・prob.csvをプロセスプールで並列に読み込む
+2. fetch: 全コースで必要なAPIリクエストを重複を除いてまとめて取得する
+   （複数のコースに登録されている学生・共通の問題は1回だけ取得）
+3. courses: コースごとにバックアップ・user.csvの更新・Excel用レポート・ランキングの出力を
+   プロセスプールで並列に行う（出力は各コースのディレクトリに独立して書き込む）
+
+使用方法:
+  python3 batch_runner.py course_a course_b course_c
+  python3 batch_runner.py courses/* --workers 8 --processes 4
+  python3 batch_runner.py course_a course_b --steps check export --format xlsx
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from aoj_client import DEFAULT_POOL_SIZE, ENDPOINT, AOJClient
+from backup_store import BACKUP_DIR, DEFAULT_KEEP, BackupStore
+from change_log import CHANGE_LOG_FILE, append_changes, make_entry, make_source_entry
+from check_submission import (STRATEGY_AUTO, STRATEGY_PAIR, STRATEGY_USER,
+                              choose_strategy, fetch_max_info, fetch_user_max_info, is_better)
+from export_excel import FORMAT_TSV, FORMAT_XLSX, write_report
+from generate_rankings import write_rankings
+from metrics import TimedIterator, add_metrics_arguments, get_metrics, write_metrics_from_args
+from parallel import map_ordered
+from rate_limiter import add_rate_arguments, rate_limiter_from_args
+from response_cache import add_cache_arguments, cache_from_args
+from roster import Roster, load_roster, save_roster
+
+# 処理内容
+STEP_CHECK = "check"        # 提出状況の確認・user.csvの更新
+STEP_EXPORT = "export"      # Excel用レポート出力
+STEP_RANKINGS = "rankings"  # ランキング出力
+STEPS = [STEP_CHECK, STEP_EXPORT, STEP_RANKINGS]
+
+# 取得結果: (ユーザーID, 問題ID)ごとの(max_score, submission_timestamp, judge_id)、取得失敗時はNone
+Infos = Dict[Tuple[str, str], Optional[Tuple[int, int, int]]]
+
+def map_processes(func: Callable, items: List, processes: int = 1) -> Iterator:
+    """
+    各要素にfuncを適用し、結果を入力順に返す。
+    processesが2以上の場合はプロセスプールで並列に実行する（funcと要素はpickle可能であること）。
+
+    @param func 各要素に適用する関数（モジュールのトップレベルの関数）
+    @param items 入力のリスト
+    @param processes 並列実行するプロセス数
+    @return funcの結果のイテレータ（itemsと同じ順序）
+    """
+    if processes <= 1 or len(items) <= 1:
+        yield from map(func, items)
+        return
+    with ProcessPoolExecutor(max_workers=min(processes, len(items))) as executor:
+        yield from executor.map(func, items)
+
+def load_course(course: str) -> Roster:
+    """
+    コースのuser.csvとprob.csvを読み込む
+
+    @param course コースのディレクトリ
+    @return Roster
+    """
+    return load_roster(os.path.join(course, "user.csv"), os.path.join(course, "prob.csv"))
+
+def plan_lookups(rosters: List[Roster]) -> Tuple[Dict[str, List[str]], int]:
+    """
+    全コースで必要な(ユーザー, 問題)の組を重複を除いてユーザーごとにまとめる
+
+    @param rosters コースごとのRoster
+    @return (ユーザーIDごとの問題IDのリスト（初出順）, 重複を除く前の組の数)
+    """
+    user_problems: Dict[str, Dict[str, None]] = {}
+    total = 0
+    for roster in rosters:
+        for student in roster.students:
+            probs = user_problems.setdefault(student.user_id, {})
+            for pid in roster.problems:
+                probs[pid] = None
+            total += len(roster.problems)
+    return {uid: list(probs) for uid, probs in user_problems.items()}, total
+
+def fetch_lookups(user_problems: Dict[str, List[str]], workers: int = 1,
+                  client: Optional[AOJClient] = None,
+                  strategy: str = STRATEGY_AUTO) -> Infos:
+    """
+    重複を除いた(ユーザー, 問題)の組の最新情報を取得する。
+    ユーザーごとに、全コース分の問題数に応じて取得方法を選ぶ。
+
+    @param user_problems ユーザーIDごとの問題IDのリスト
+    @param workers 並列実行数
+    @param client 使用するAPIクライアント（省略時は共有クライアント）
+    @param strategy 取得方法（auto/pair/user）
+    @return (ユーザーID, 問題ID)ごとの取得結果
+    """
+    tasks: List[Tuple[str, Optional[str]]] = []
+    for uid, probs in user_problems.items():
+        if choose_strategy(strategy, len(probs)) == STRATEGY_USER:
+            tasks.append((uid, None))
+        else:
+            tasks.extend((uid, pid) for pid in probs)
+
+    def fetch(task: Tuple[str, Optional[str]]):
+        uid, pid = task
+        if pid is None:
+            return fetch_user_max_info(uid, user_problems[uid], client=client)
+        return fetch_max_info(uid, pid, client=client)
+
+    infos: Infos = {}
+    for (uid, pid), result in zip(tasks, map_ordered(fetch, tasks, workers)):
+        if pid is not None:
+            infos[(uid, pid)] = result
+            continue
+        for p in user_problems[uid]:
+            infos[(uid, p)] = None if result is None else result[p]
+    return infos
+
+def apply_infos(roster: Roster, infos: Infos,
+                changes: Optional[List[Dict]] = None) -> Tuple[int, int]:
+    """
+    取得結果をrosterに反映する（取得に失敗した組は現在の値を保持）
+
+    @param roster 学生一覧と提出記録（その場で更新する）
+    @param infos (ユーザーID, 問題ID)ごとの取得結果
+    @param changes 更新したセルごとの変更ログの行を追加するリスト
+    @return (更新したセル数, 取得に失敗したセル数)
+    """
+    updated = failed = 0
+    for s, student in enumerate(roster.students):
+        for i, pid in enumerate(roster.problems):
+            info = infos.get((student.user_id, pid))
+            if info is None:
+                failed += 1
+                continue
+            current = roster.cell(s, i)
+            if is_better(info[0], info[1], current[0], current[1]):
+                roster.set_cell(s, i, *info)
+                if changes is not None:
+                    changes.append(make_entry(student.student_id, student.user_id, pid,
+                                              current, info))
+                updated += 1
+    return updated, failed
+
+def course_infos(roster: Roster, infos: Infos) -> Infos:
+    """
+    取得結果のうちコースに必要な分だけを取り出す（子プロセスへ渡す量を減らす）
+
+    @param roster コースのRoster
+    @param infos 全コース分の取得結果
+    @return コースの(ユーザーID, 問題ID)ごとの取得結果
+    """
+    return {(st.user_id, pid): infos.get((st.user_id, pid))
+            for st in roster.students for pid in roster.problems}
+
+def write_course(job: Tuple[str, Roster, Optional[Infos], List[str], str, int]) -> Dict:
+    """
+    1コース分の更新と出力を行う（プロセスプールから呼ばれる）
+
+    @param job (コースのディレクトリ, Roster, 取得結果（checkしない場合はNone）,
+               処理内容のリスト, Excel用レポートの形式, 保持するバックアップ数)
+    @return 処理結果の概要
+    """
+    course, roster, infos, steps, output_format, keep = job
+    start = time.perf_counter()
+    summary = {"course": course, "students": len(roster.students),
+               "problems": len(roster.problems), "updated": 0, "failed": 0}
+
+    if STEP_CHECK in steps and infos is not None:
+        user_csv = os.path.join(course, "user.csv")
+        store = BackupStore(os.path.join(course, BACKUP_DIR))
+        store.save(user_csv)
+        store.prune(keep)
+        changes = []
+        summary["updated"], summary["failed"] = apply_infos(roster, infos, changes)
+        save_roster(roster, user_csv)
+        # check_submission.pyと同様に、保存したuser.csvの記録を添えて変更ログに追記する
+        changes.append(make_source_entry(user_csv))
+        append_changes(os.path.join(course, CHANGE_LOG_FILE), changes)
+
+    if STEP_EXPORT in steps:
+        write_report(roster, os.path.join(course, f"scores_for_excel.{output_format}"),
+                     output_format)
+
+    if STEP_RANKINGS in steps:
+        write_rankings(roster, os.path.join(course, "rankings"))
+
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    return summary
+
+def run_batch(courses: List[str], steps: List[str] = STEPS, workers: int = 1,
+              processes: int = 1, client: Optional[AOJClient] = None,
+              strategy: str = STRATEGY_AUTO, output_format: str = FORMAT_TSV,
+              keep: int = DEFAULT_KEEP) -> List[Dict]:
+    """
+    複数のコースをまとめて処理する
+
+    @param courses コースのディレクトリのリスト
+    @param steps 処理内容（check/export/rankings）
+    @param workers APIリクエストの並列実行数
+    @param processes 読み込み・出力を並列実行するプロセス数
+    @param client 使用するAPIクライアント（省略時は共有クライアント）
+    @param strategy 取得方法（auto/pair/user）
+    @param output_format Excel用レポートの形式（tsv/xlsx）
+    @param keep コースごとに保持するバックアップ数
+    @return コースごとの処理結果の概要（coursesと同じ順序）
+    """
+    metrics = get_metrics()
+    with metrics.phase("load"):
+        rosters = list(map_processes(load_course, courses, processes))
+
+    infos: Optional[Infos] = None
+    if STEP_CHECK in steps:
+        user_problems, total = plan_lookups(rosters)
+        unique = sum(len(probs) for probs in user_problems.values())
+        print(f"{len(courses)}コース: 学生・問題の組 {total}件（重複を除いて{unique}件、"
+              f"ユーザー{len(user_problems)}人）を取得します。")
+        with metrics.phase("fetch"):
+            infos = fetch_lookups(user_problems, workers, client, strategy)
+
+    jobs = [(course, roster, None if infos is None else course_infos(roster, infos),
+             steps, output_format, keep)
+            for course, roster in zip(courses, rosters)]
+    # 子プロセスへ渡した分は親プロセスで保持しない
+    del rosters
+
+    results = TimedIterator(map_processes(write_course, jobs, processes))
+    summaries = list(results)
+    metrics.add_phase("courses", results.elapsed)
+    return summaries
+
+def main():
+    parser = argparse.ArgumentParser(description="複数のコースの提出状況の更新・レポート出力をまとめて実行")
+    parser.add_argument("courses", nargs="+",
+                        help="コースのディレクトリ（それぞれuser.csvとprob.csvを置く）")
+    parser.add_argument("--steps", nargs="+", choices=STEPS, default=STEPS,
+                        help="処理内容（デフォルト: check export rankings）")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="APIリクエストの並列実行数（デフォルト: 1）")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1,
+                        help="コースの読み込み・出力を並列実行するプロセス数（デフォルト: CPU数）")
+    parser.add_argument("--retries", type=int, default=3,
+                        help="APIリクエスト失敗時の再試行回数（デフォルト: 3）")
+    parser.add_argument("--strategy", choices=[STRATEGY_AUTO, STRATEGY_PAIR, STRATEGY_USER],
+                        default=STRATEGY_AUTO,
+                        help="取得方法: pair=問題ごと, user=ユーザーごとに全提出記録, "
+                             "auto=問題数で自動選択（デフォルト: auto）")
+    parser.add_argument("--format", choices=[FORMAT_TSV, FORMAT_XLSX], default=FORMAT_TSV,
+                        help="Excel用レポートの形式（デフォルト: tsv）")
+    parser.add_argument("--keep-backups", type=int, default=DEFAULT_KEEP,
+                        help=f"コースごとに保持するバックアップ数（デフォルト: {DEFAULT_KEEP}）")
+    add_cache_arguments(parser)
+    add_rate_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    for course in args.courses:
+        for name in ("user.csv", "prob.csv"):
+            if not os.path.exists(os.path.join(course, name)):
+                parser.error(f"{os.path.join(course, name)}が見つかりません")
+
+    metrics = get_metrics()
+    metrics.script = "batch_runner"
+    cache = cache_from_args(args)
+    client = AOJClient(pool_size=max(args.workers, DEFAULT_POOL_SIZE), max_retries=args.retries,
+                       cache=cache, rate_limiter=rate_limiter_from_args(args, ENDPOINT))
+
+    summaries = run_batch(args.courses, args.steps, args.workers, args.processes, client,
+                          args.strategy, args.format, args.keep_backups)
+
+    for s in summaries:
+        line = f"{s['course']}: {s['students']}人 × {s['problems']}問"
+        if STEP_CHECK in args.steps:
+            line += f", 更新 {s['updated']}件"
+            if s["failed"]:
+                line += f", 取得失敗 {s['failed']}件（値は変更していません）"
+        print(line + f" ({s['seconds']:.2f}秒)")
+
+    if STEP_CHECK in args.steps:
+        client.rate_limiter.print_stats()
+    if cache is not None:
+        cache.print_stats()
+    metrics.print_summary()
+    write_metrics_from_args(args, metrics)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file batch_runner_test.py
+@brief batch_runner.pyのテストコード
+"""
+
+import csv
+import os
+import shutil
+import tempfile
+import unittest
+
+from aoj_client import AOJClient
+from batch_runner import plan_lookups, run_batch
+from change_log import CHANGE_LOG_FILE
+from check_submission import STRATEGY_PAIR, STRATEGY_USER, get_max_info
+from generate_rankings import update_rankings
+from rate_limiter import RateLimiter
+from roster import Roster, load_roster
+from stub_server import StubAOJServer
+
+class TestBatchRunner(unittest.TestCase):
+    def setUp(self):
+        """共通の学生・問題を含む2つのコースを作成"""
+        self.dir = tempfile.mkdtemp()
+        self.courses = {
+            "course_a": (["shared", "only_a"], ["ITP1_1_A", "ITP1_1_B"]),
+            "course_b": (["shared", "only_b"], ["ITP1_1_B", "ITP1_1_C"]),
+        }
+        for course, (users, probs) in self.courses.items():
+            path = os.path.join(self.dir, course)
+            os.makedirs(path)
+            with open(os.path.join(path, "user.csv"), "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                for i, user_id in enumerate(users):
+                    writer.writerow([f"{course}{i}", "テスト", user_id, user_id]
+                                    + ["0", "0", "-1"] * len(probs))
+            with open(os.path.join(path, "prob.csv"), "w", newline="", encoding="utf-8") as f:
+                csv.writer(f).writerow(probs)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_plan_lookups(self):
+        """コース間で共通の(ユーザー, 問題)を1つにまとめることのテスト"""
+        rosters = [Roster.from_rows([["1", "a", "b", uid] for uid in users], probs)
+                   for users, probs in self.courses.values()]
+        user_problems, total = plan_lookups(rosters)
+        self.assertEqual(total, 8)
+        self.assertEqual(user_problems, {"shared": ["ITP1_1_A", "ITP1_1_B", "ITP1_1_C"],
+                                         "only_a": ["ITP1_1_A", "ITP1_1_B"],
+                                         "only_b": ["ITP1_1_B", "ITP1_1_C"]})
+
+    def run_courses(self, strategy, processes):
+        """スタブサーバーに対して全コースを処理し、(リクエスト数, 概要, サーバー)を返す"""
+        server = StubAOJServer(["shared", "only_a", "only_b"],
+                               ["ITP1_1_A", "ITP1_1_B", "ITP1_1_C"])
+        with server:
+            client = AOJClient(server.url, rate_limiter=RateLimiter(1000, max_rate=1000))
+            courses = [os.path.join(self.dir, c) for c in self.courses]
+            summaries = run_batch(courses, workers=4, processes=processes, client=client,
+                                  strategy=strategy)
+            expected = {(uid, pid): get_max_info(uid, pid, client=client)
+                        for uid in ("shared", "only_a", "only_b")
+                        for pid in ("ITP1_1_A", "ITP1_1_B", "ITP1_1_C")}
+            return server.stats()["requests"] - 9, summaries, expected
+
+    def check_outputs(self, expected):
+        """各コースのuser.csv・レポート・ランキングが独立に出力されていることを確認"""
+        for course, (users, probs) in self.courses.items():
+            path = os.path.join(self.dir, course)
+            roster = load_roster(os.path.join(path, "user.csv"), os.path.join(path, "prob.csv"))
+            for s, user_id in enumerate(users):
+                for i, pid in enumerate(probs):
+                    self.assertEqual(roster.cell(s, i), expected[(user_id, pid)])
+            self.assertTrue(os.path.exists(os.path.join(path, "scores_for_excel.tsv")))
+            self.assertTrue(os.path.isdir(os.path.join(path, "rankings")))
+            self.assertTrue(os.path.exists(os.path.join(path, "backups", "index.json")))
+
+    def test_pair_strategy_dedup(self):
+        """問題ごとの取得で、共通の組は1回だけ取得することのテスト"""
+        requests, summaries, expected = self.run_courses(STRATEGY_PAIR, processes=1)
+        # 8組のうち(shared, ITP1_1_B)が重複
+        self.assertEqual(requests, 7)
+        self.assertEqual([s["failed"] for s in summaries], [0, 0])
+        self.check_outputs(expected)
+
+    def test_user_strategy_processes(self):
+        """ユーザーごとの取得とプロセスプールでの出力のテスト"""
+        requests, summaries, expected = self.run_courses(STRATEGY_USER, processes=2)
+        # ユーザー3人 × 1ページ
+        self.assertEqual(requests, 3)
+        self.assertEqual([s["course"] for s in summaries],
+                         [os.path.join(self.dir, c) for c in self.courses])
+        self.check_outputs(expected)
+
+    def test_incremental_rankings_after_batch(self):
+        """一括処理で更新したコースのランキングを差分更新できる（作り直さない）ことのテスト"""
+        paths = []
+        for course in self.courses:
+            path = os.path.join(self.dir, course)
+            paths.append((os.path.join(path, "user.csv"), os.path.join(path, "prob.csv"), None,
+                          os.path.join(path, "rankings"), os.path.join(path, "state.json"),
+                          os.path.join(path, CHANGE_LOG_FILE)))
+            self.assertEqual(update_rankings(*paths[-1])[1], True)
+
+        self.run_courses(STRATEGY_PAIR, processes=1)
+        for args in paths:
+            applied, rebuilt = update_rankings(*args)
+            self.assertFalse(rebuilt)
+            self.assertGreater(applied, 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file benchmark.py
+@brief スタブサーバーを使って各スクリプトの実行時間を計測するベンチマーク
+
+学生数ごとに合成したuser.csvを一時ディレクトリに作成し、stub_server.pyのスタブサーバーに
+対してcheck_submission.py、download_all_submissions.py、export_excel.py、
+generate_rankings.pyを順に実行して、それぞれの実行時間とリクエスト数を計測します。
+結果はJSONで保存し、--compareで以前の結果と比較できます。
+
+使用方法:
+  python3 benchmark.py                          # 50, 500, 5000人 × prob.csvの問題
+  python3 benchmark.py --scales 50 500 --latency 0.005
+  python3 benchmark.py --compare bench_results/bench_20250422_120000.json
+"""
+
+import argparse
+import csv
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from rate_limiter import positive_rate
+from stub_server import StubAOJServer
+
+# デフォルト設定
+DEFAULT_SCALES = [50, 500, 5000]
+DEFAULT_WORKERS = 8
+DEFAULT_RATE = 1000.0     # スタブサーバーに対するリクエストレート（件/秒）
+RESULT_DIR = "bench_results"
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def bench_commands(workers: int, rate: float) -> List[tuple]:
+    """
+    計測するコマンドの一覧を返す（この順に実行する）
+
+    @param workers 並列実行数
+    @param rate リクエストレート
+    @return (名前, 引数のリスト)のリスト
+    """
+    api_args = ["--workers", str(workers), "--rate", str(rate), "--max-rate", str(rate)]
+    return [
+        ("check_submission", ["check_submission.py"] + api_args),
+        ("download_all_submissions", ["download_all_submissions.py"] + api_args),
+        ("export_excel", ["export_excel.py"]),
+        ("generate_rankings", ["generate_rankings.py"]),
+    ]
+
+def write_inputs(directory: str, students: int, problems: List[str]) -> List[str]:
+    """
+    合成したuser.csvとprob.csvを作成する
+
+    @param directory 作成先ディレクトリ
+    @param students 学生数
+    @param problems 問題IDのリスト
+    @return AOJユーザーIDのリスト
+    """
+    users = [f"bench_user{i:05d}" for i in range(students)]
+    with open(os.path.join(directory, "user.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        for i, user_id in enumerate(users):
+            writer.writerow([f"s{i:05d}", "姓", f"名{i}", user_id] + ["0", "0", "-1"] * len(problems))
+    with open(os.path.join(directory, "prob.csv"), "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerow(problems)
+    return users
+
+def run_scale(students: int, problems: List[str], args: argparse.Namespace) -> List[Dict]:
+    """
+    1つの学生数について全スクリプトを計測する
+
+    @param students 学生数
+    @param problems 問題IDのリスト
+    @param args コマンドライン引数
+    @return 計測結果のリスト
+    """
+    results = []
+    workdir = tempfile.mkdtemp(prefix=f"aoj_bench_{students}_")
+    try:
+        users = write_inputs(workdir, students, problems)
+        server = StubAOJServer(users, problems, args.seed, latency=args.latency,
+                               error_rate=args.error_rate, throttle_rate=args.throttle_rate)
+        env = dict(os.environ, AOJ_ENDPOINT=server.url)
+        with server:
+            for name, command in bench_commands(args.workers, args.rate):
+                before = server.stats()
+                start = time.perf_counter()
+                proc = subprocess.run([sys.executable, os.path.join(SCRIPT_DIR, command[0])] + command[1:],
+                                      cwd=workdir, env=env, stdout=subprocess.DEVNULL,
+                                      stderr=subprocess.PIPE, text=True)
+                seconds = time.perf_counter() - start
+                after = server.stats()
+                result = {"students": students, "problems": len(problems), "script": name,
+                          "seconds": round(seconds, 4), "returncode": proc.returncode}
+                result.update({k: after[k] - before[k] for k in after})
+                results.append(result)
+                status = "" if proc.returncode == 0 else f"  (終了コード {proc.returncode})"
+                print(f"{students:>6}人 {name:<26} {seconds:9.3f}秒 "
+                      f"{result['requests']:>8}リクエスト{status}")
+                if proc.returncode != 0:
+                    print(proc.stderr.strip())
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def git_revision() -> Optional[str]:
+    """
+    計測したコードのgitリビジョンを返す
+
+    @return コミットID（取得できなければNone）
+    """
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPT_DIR,
+                             capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+def compare(base: Dict, current: Dict):
+    """
+    2つの計測結果の実行時間を比較して表示する
+
+    @param base 比較元の計測結果
+    @param current 今回の計測結果
+    """
+    old = {(r["students"], r["script"]): r["seconds"] for r in base["results"]}
+    print(f"\n比較: {base.get('revision')} → {current.get('revision')}")
+    for r in current["results"]:
+        key = (r["students"], r["script"])
+        if key not in old:
+            continue
+        ratio = r["seconds"] / old[key] if old[key] else float("inf")
+        print(f"{key[0]:>6}人 {key[1]:<26} {old[key]:9.3f}秒 → {r['seconds']:9.3f}秒 ({ratio:.2f}倍)")
+
+def main():
+    parser = argparse.ArgumentParser(description="スタブサーバーを使ったベンチマーク")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES,
+                        help=f"計測する学生数（デフォルト: {' '.join(map(str, DEFAULT_SCALES))}）")
+    parser.add_argument("-p", "--problems", default=os.path.join(SCRIPT_DIR, "prob.csv"),
+                        help="問題定義ファイル（デフォルト: prob.csv）")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"APIリクエストの並列実行数（デフォルト: {DEFAULT_WORKERS}）")
+    parser.add_argument("--rate", type=positive_rate, default=DEFAULT_RATE,
+                        help=f"リクエストレート（件/秒、デフォルト: {DEFAULT_RATE}）")
+    parser.add_argument("--latency", type=float, default=0.0, help="スタブの応答遅延（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="スタブがHTTP 500を返す確率")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="スタブがHTTP 429を返す確率")
+    parser.add_argument("--seed", type=int, default=0, help="合成データのシード値")
+    parser.add_argument("-o", "--output", help=f"結果のJSONファイル（デフォルト: {RESULT_DIR}/bench_日時.json）")
+    parser.add_argument("--compare", help="比較する以前の結果のJSONファイル")
+    args = parser.parse_args()
+
+    with open(args.problems, "r", newline="", encoding="utf-8") as f:
+        problems = next(csv.reader(f))
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "settings": {"workers": args.workers, "rate": args.rate, "latency": args.latency,
+                     "error_rate": args.error_rate, "throttle_rate": args.throttle_rate,
+                     "seed": args.seed},
+        "results": [],
+    }
+    for students in args.scales:
+        report["results"].extend(run_scale(students, problems, args))
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULT_DIR, exist_ok=True)
+        output = os.path.join(RESULT_DIR, f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    print(f"\n{output} に保存しました。")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+if __name__ == "__main__":
+    main()
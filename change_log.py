@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file change_log.py
+@brief 提出記録の更新内容を追記していく変更ログ（JSON Lines）
+
+check_submission.pyは、より良い提出で更新したセルごとに1行
+（学籍番号・ユーザーID・問題ID・更新前後のスコア/提出日時/judgeId・記録時刻）を追記します。
+user.csvを初期化・正規化したときは、それ以前のログから状態を再現できないことを示す
+resetの行を追記します。user.csvを保存したときは、保存した内容のサイズ・更新時刻・ハッシュを
+sourceの行として追記し、generate_rankings.pyはこれと一致しないuser.csv（バックアップからの復元や
+手作業の編集など、ログに記録されない書き換え）を検出してランキングの状態を作り直します。
+generate_rankings.py --incrementalは前回読んだ位置以降の行だけを
+読み込んでランキングの状態に反映します。
+"""
+
+import json
+import os
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+
+from roster_snapshot import source_stamp
+
+# デフォルトの変更ログ
+CHANGE_LOG_FILE = "changes.jsonl"
+
+def make_entry(student_id: str, user_id: str, problem: str,
+               old: Tuple[int, int, int], new: Tuple[int, int, int]) -> Dict:
+    """
+    1セルの更新内容を表す行を作成する
+
+    @param student_id 学籍番号
+    @param user_id AOJユーザーID
+    @param problem 問題ID
+    @param old 更新前の(score, date, judge_id)
+    @param new 更新後の(score, date, judge_id)
+    @return 変更ログの1行
+    """
+    return {"time": datetime.now().isoformat(timespec="seconds"), "student_id": student_id,
+            "user_id": user_id, "problem": problem, "old": list(old), "new": list(new)}
+
+def make_reset_entry() -> Dict:
+    """
+    user.csvを初期化・正規化したことを表す行を作成する
+
+    @return 変更ログの1行
+    """
+    return {"time": datetime.now().isoformat(timespec="seconds"), "reset": True}
+
+def make_source_entry(user_csv: str = "user.csv") -> Dict:
+    """
+    user.csvを保存した直後の内容を表す行を作成する
+
+    @param user_csv 保存したuser.csvのパス
+    @return 変更ログの1行
+    """
+    return {"time": datetime.now().isoformat(timespec="seconds"),
+            "source": source_stamp(user_csv)}
+
+def append_changes(path: str, entries: Iterable[Dict]) -> int:
+    """
+    変更ログに追記する（まとめて1回で書き込み、fsyncする）
+
+    @param path 変更ログのパス
+    @param entries 追記する行
+    @return 追記した行数
+    """
+    lines = [json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries]
+    if not lines:
+        return 0
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("".join(lines))
+        f.flush()
+        os.fsync(f.fileno())
+    return len(lines)
+
+def read_changes(path: str, offset: int = 0) -> Tuple[List[Dict], int]:
+    """
+    変更ログをoffsetバイト目以降から読み込む。
+    書き込み途中の最終行（改行で終わっていない行）は読まずに残す。
+
+    @param path 変更ログのパス
+    @param offset 読み込みを開始する位置（前回の戻り値）
+    @return (読み込んだ行のリスト, 次回の読み込み開始位置)
+    """
+    if not os.path.exists(path):
+        return [], 0
+    entries = []
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            offset += len(line)
+            if line.strip():
+                entries.append(json.loads(line))
+    return entries, offset
+
+def log_size(path: str) -> int:
+    """
+    変更ログの現在のサイズ（存在しなければ0）
+
+    @param path 変更ログのパス
+    @return バイト数
+    """
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file change_log_test.py
+@brief change_log.pyのテストコード
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from change_log import append_changes, make_entry, make_reset_entry, read_changes
+
+class TestChangeLog(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "changes.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_append_and_read_from_offset(self):
+        """前回読んだ位置以降の行だけを読み込むことのテスト"""
+        self.assertEqual(read_changes(self.path), ([], 0))
+        first = make_entry("1", "user1", "ITP1_1_A", (0, 0, -1), (100, 1683936000000, 11))
+        append_changes(self.path, [first])
+        entries, offset = read_changes(self.path)
+        self.assertEqual(entries, [first])
+        self.assertEqual(entries[0]["new"], [100, 1683936000000, 11])
+
+        append_changes(self.path, [make_reset_entry()])
+        entries, offset = read_changes(self.path, offset)
+        self.assertEqual(len(entries), 1)
+        self.assertTrue(entries[0]["reset"])
+        self.assertEqual(offset, os.path.getsize(self.path))
+
+    def test_partial_line_is_left(self):
+        """書き込み途中の最終行は次回に読むことのテスト"""
+        entry = make_entry("1", "user1", "ITP1_1_A", (0, 0, -1), (100, 1, 11))
+        append_changes(self.path, [entry])
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write('{"time": ')
+        entries, offset = read_changes(self.path)
+        self.assertEqual(entries, [entry])
+        self.assertLess(offset, os.path.getsize(self.path))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file check_journal.py
+@brief check_submission.pyの取得結果を1件ずつ追記する進捗ジャーナル（--resume用）
+
+check_submission.pyは、(ユーザー, 問題)ごとの取得結果を受け取るたびにジャーナル（JSON Lines）へ
+追記し、user.csvの保存と変更ログへの追記が終わった時点でジャーナルを削除します。
+ネットワーク障害・Ctrl+C・タイムアウトなどで中断した場合はジャーナルが残るため、
+--resumeを指定すると記録済みの結果をそのまま使い、残りの組だけを取得します。
+
+各行は次のいずれかです（取得に失敗した組は記録しないため、再開時に再取得されます）。
+- {"user": ユーザーID, "problem": 問題ID, "info": [スコア, 提出日時, judgeId]}
+- {"user": ユーザーID, "watermark": 最新提出日時}（増分取得で、そのユーザーの全問題を記録した後）
+"""
+
+import json
+import os
+import time
+from typing import Dict, Tuple
+
+# デフォルトのジャーナルファイル
+JOURNAL_FILE = "check_journal.jsonl"
+
+# ディスクへの書き込みを確定（fsync）する間隔（秒）
+FSYNC_INTERVAL = 1.0
+
+def read_journal(path: str) -> Tuple[Dict[Tuple[str, str], Tuple[int, int, int]], Dict[str, int]]:
+    """
+    ジャーナルを読み込む。書き込み途中の最終行（改行で終わっていない行・壊れた行）は読まない。
+
+    @param path ジャーナルのパス
+    @return ((ユーザーID, 問題ID)ごとの(スコア, 提出日時, judgeId), ユーザーIDごとのウォーターマーク)
+    """
+    done: Dict[Tuple[str, str], Tuple[int, int, int]] = {}
+    watermarks: Dict[str, int] = {}
+    if not os.path.exists(path):
+        return done, watermarks
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break
+            if "watermark" in entry:
+                watermarks[entry["user"]] = int(entry["watermark"])
+            else:
+                done[(entry["user"], entry["problem"])] = tuple(entry["info"])
+    return done, watermarks
+
+class CheckJournal:
+    """取得結果の進捗ジャーナル"""
+
+    def __init__(self, path: str = JOURNAL_FILE, resume: bool = False):
+        """
+        @param path ジャーナルのパス
+        @param resume 既存のジャーナルを読み込んで続きを記録するか（Falseなら空にして開始）
+        """
+        self.path = path
+        if resume:
+            self.done, self.watermarks = read_journal(path)
+        else:
+            self.done, self.watermarks = {}, {}
+        self.file = open(path, "a" if resume else "w", encoding="utf-8")
+        self.last_sync = time.monotonic()
+
+    def _write(self, entry: Dict):
+        """1行を追記する（プロセスが強制終了しても残るよう毎回flushし、fsyncは一定間隔で行う）"""
+        self.file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.file.flush()
+        now = time.monotonic()
+        if now - self.last_sync >= FSYNC_INTERVAL:
+            os.fsync(self.file.fileno())
+            self.last_sync = now
+
+    def record(self, user_id: str, problem: str, info: Tuple[int, int, int]):
+        """
+        1組の取得結果を記録する
+
+        @param user_id AOJユーザーID
+        @param problem 問題ID
+        @param info (スコア, 提出日時, judgeId)
+        """
+        self._write({"user": user_id, "problem": problem, "info": list(info)})
+
+    def record_watermark(self, user_id: str, newest: int):
+        """
+        ユーザーの全問題を記録した後のウォーターマークを記録する
+
+        @param user_id AOJユーザーID
+        @param newest 確認済みの最新提出日時（ミリ秒）
+        """
+        self._write({"user": user_id, "watermark": newest})
+
+    def close(self):
+        """書き込みを確定して閉じる"""
+        if not self.file.closed:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+
+    def remove(self):
+        """全ての結果を保存し終えたジャーナルを閉じて削除する"""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def journal_exists(path: str = JOURNAL_FILE) -> bool:
+    """
+    中断した実行のジャーナルが残っているか
+
+    @param path ジャーナルのパス
+    @return 記録が1件以上あればTrue
+    """
+    try:
+        return os.path.getsize(path) > 0
+    except OSError:
+        return False
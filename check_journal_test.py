@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file check_journal_test.py
+@brief check_journal.pyのテストコード
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from check_journal import CheckJournal, journal_exists, read_journal
+from check_submission import NO_SUBMISSION, STRATEGY_USER, update_roster
+from roster import Roster
+
+ROWS = [
+    ["123456", "テスト", "太郎", "test1", "80", "1683936000000", "12345"],
+    ["234567", "テスト", "花子", "test2"],
+    ["345678", "テスト", "三郎", "test3"],
+]
+PROBS = ["ITP1_1_A", "ITP1_1_B"]
+
+def fake_fetch_max_info(uid, pid, debug=False, client=None, history=None):
+    """(ユーザー, 問題)ごとに決まった結果を返す"""
+    return 100, 1683936100000 + len(pid) + int(uid[-1]), 20000 + int(uid[-1])
+
+class TestCheckJournal(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "check_journal.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_resume_fetches_only_outstanding_pairs(self):
+        """中断後の再開で、記録済みの組を取得せずに中断しなかった場合と同じ結果になることのテスト"""
+        expected = Roster.from_rows(ROWS, PROBS)
+        with mock.patch("check_submission.fetch_max_info", side_effect=fake_fetch_max_info), \
+                mock.patch("builtins.print"):
+            expected_updates = update_roster(expected)
+
+        # 4件目の取得中に中断する
+        calls = []
+
+        def interrupted(uid, pid, debug=False, client=None, history=None):
+            calls.append((uid, pid))
+            if len(calls) == 4:
+                raise KeyboardInterrupt
+            return fake_fetch_max_info(uid, pid)
+
+        roster = Roster.from_rows(ROWS, PROBS)
+        journal = CheckJournal(self.path)
+        with mock.patch("check_submission.fetch_max_info", side_effect=interrupted), \
+                mock.patch("builtins.print"):
+            with self.assertRaises(KeyboardInterrupt):
+                update_roster(roster, journal=journal)
+        journal.close()
+        self.assertTrue(journal_exists(self.path))
+        self.assertEqual(len(read_journal(self.path)[0]), 3)
+
+        # 再開時はuser.csv（中断前の内容）から読み直し、残りの3組だけを取得する
+        roster = Roster.from_rows(ROWS, PROBS)
+        journal = CheckJournal(self.path, resume=True)
+        with mock.patch("check_submission.fetch_max_info",
+                        side_effect=fake_fetch_max_info) as fetch, \
+                mock.patch("builtins.print"):
+            updates = update_roster(roster, journal=journal)
+        self.assertEqual(fetch.call_count, 3)
+        self.assertEqual(roster.to_rows(), expected.to_rows())
+        self.assertEqual(updates, expected_updates)
+
+        journal.remove()
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_resume_skips_completed_users(self):
+        """ユーザー単位の取得では、全問題を記録済みのユーザーだけを取得しないことのテスト"""
+        journal = CheckJournal(self.path)
+        journal.record("test1", "ITP1_1_A", (100, 1683936100000, 1))
+        journal.record("test1", "ITP1_1_B", (0, 0, NO_SUBMISSION))
+        journal.record("test2", "ITP1_1_A", (100, 1683936200000, 2))
+        journal.close()
+
+        roster = Roster.from_rows(ROWS, PROBS)
+        journal = CheckJournal(self.path, resume=True)
+        infos = {pid: (100, 1683936300000, 3) for pid in PROBS}
+        with mock.patch("check_submission.fetch_user_max_info", return_value=infos) as fetch, \
+                mock.patch("builtins.print"):
+            update_roster(roster, strategy=STRATEGY_USER, journal=journal)
+        journal.close()
+
+        self.assertEqual([c.args[0] for c in fetch.call_args_list], ["test2", "test3"])
+        rows = roster.to_rows()
+        self.assertEqual(rows[0][4:], ["100", "1683936100000", "1", "0", "0", str(NO_SUBMISSION)])
+        # 記録済みの組は記録した値を使う
+        self.assertEqual(rows[1][4:7], ["100", "1683936200000", "2"])
+        self.assertEqual(rows[1][7:], ["100", "1683936300000", "3"])
+
+    def test_read_journal_ignores_partial_line(self):
+        """書き込み途中の最終行を読まないことのテスト"""
+        journal = CheckJournal(self.path)
+        journal.record("test1", "ITP1_1_A", (100, 1, 2))
+        journal.record_watermark("test1", 5)
+        journal.close()
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write('{"user": "test2", "problem": "ITP1_1_A", "in')
+
+        done, watermarks = read_journal(self.path)
+        self.assertEqual(done, {("test1", "ITP1_1_A"): (100, 1, 2)})
+        self.assertEqual(watermarks, {"test1": 5})
+
+if __name__ == "__main__":
+    unittest.main()
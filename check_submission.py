@@ -12,100 +12,379 @@ user.csvに反映します。
 --init: user.csvを初期状態にリセット
 --clean: user.csvのデータを正規化して再保存
 --debug: デバッグ情報を表示
+--workers N: N並列でAPIリクエストを実行
+--retries N: APIリクエスト失敗時の再試行回数
+--strategy: 取得方法（pair/user/auto）
+--incremental: 前回確認した提出より新しい提出のみを取得
+--cache: APIレスポンスをディスクにキャッシュ
+--rate / --max-rate: APIリクエストの初期・最高レート（件/秒）
+--db PATH: user.csvの代わりにSQLiteデータベースを使用
+--keep-backups N: 保持するバックアップ数
+--metrics-json / --metrics-prom PATH: 処理時間・APIリクエストの計測値をJSON/Prometheus形式で出力
+--change-log PATH: 更新内容を追記する変更ログ（generate_rankings.py --incrementalで使用）
+--freeze-solved: 満点を記録済みの組は取得を省略（--verify-days日ごとに全件を確認）
+--plan: 取得せずに、リクエスト数と推定時間を表示
+--resume: 中断した実行の続きから再開（取得結果は1件ずつcheck_journal.jsonlに記録）
+--history [PATH]: 取得した提出記録を全件、履歴（history.sqlite）に保存（submission_history.pyで集計）
+--watch: 常駐して提出状況を監視（学生ごとに確認間隔を調整し、まとめて保存）
 """
 
-import requests
 import csv
+import json
 import os
-import urllib3
 import argparse
-from datetime import datetime
-from typing import List, Tuple
-
-# SSL警告を抑制
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-
-# AOJ APIのエンドポイント
-ENDPOINT = 'https://judgeapi.u-aizu.ac.jp'
+import time
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from aoj_client import DEFAULT_POOL_SIZE, ENDPOINT, AOJClient, get_default_client
+from backup_store import DEFAULT_KEEP, BackupStore, atomic_write_csv
+from change_log import (CHANGE_LOG_FILE, append_changes, make_entry, make_reset_entry,
+                        make_source_entry)
+from check_journal import JOURNAL_FILE, CheckJournal, journal_exists, read_journal
+from fetch_planner import (DEFAULT_VERIFY_DAYS, MAX_SCORE, PLAN_STATE_FILE, FetchPlan,
+                           frozen_pairs, save_last_verified, verify_due)
+from metrics import TimedIterator, add_metrics_arguments, get_metrics, write_metrics_from_args
+from parallel import map_ordered
+from rate_limiter import add_rate_arguments, rate_limiter_from_args
+from response_cache import add_cache_arguments, cache_from_args
+from roster import Roster, load_roster, save_roster
+from submission_history import HISTORY_FILE, SubmissionHistory
+from submission_store import SubmissionStore
+
+# AOJ APIのパス
 URI = '/submission_records'
 
 # 未設定時の値
 NO_SUBMISSION = -1
 
-def debug_print(msg: str, debug: bool = False):
-    """デバッグモード時のみメッセージを出力"""
+# ユーザー単位取得時の1ページあたりの件数
+PAGE_SIZE = 500
+
+# (ユーザー, 問題)ごとの取得時の1ページあたりの件数
+PROBLEM_PAGE_SIZE = 100
+
+# 1組（1ユーザー）あたりに取得するページ数の上限（ページ指定を無視するサーバーへの備え）
+MAX_PAGES = 1000
+
+# 取得方法
+STRATEGY_PAIR = "pair"  # (ユーザー, 問題)ごとに取得
+STRATEGY_USER = "user"  # ユーザーごとに全提出記録を取得
+STRATEGY_AUTO = "auto"  # 問題数に応じて自動選択
+
+# 問題数がこの値以上ならユーザー単位で取得する
+USER_STRATEGY_MIN_PROBLEMS = 5
+
+# 増分取得の状態ファイル
+WATERMARK_FILE = "watermark.json"
+
+def debug_print(debug: bool, msg: str, *args):
+    """
+    デバッグモード時のみメッセージを出力する。
+    引数は%形式で遅延して埋め込むため、デバッグモードでなければ文字列を組み立てない。
+
+    @param debug デバッグ情報を表示するか
+    @param msg メッセージ（%形式の書式）
+    @param args 書式に埋め込む値
+    """
     if debug:
-        print(f"DEBUG: {msg}")
+        print("DEBUG: " + (msg % args if args else msg))
 
-def get_max_info(user_id: str, prob_id: str, debug: bool = False) -> tuple[int, int, int]:
+def parse_submission(sub: dict) -> Tuple[int, int, int]:
+    """
+    提出記録1件からスコア、提出日時、judgeIdを数値として取り出す。
+
+    @param sub APIから取得した提出記録
+    @return (score, submission_timestamp, judge_id)（変換失敗時は初期値）
+    """
+    score = sub.get("score", 0)
+    date = sub.get("submissionDate", 0)
+    jid = sub.get("judgeId", NO_SUBMISSION)
+
+    # 数値に変換（変換失敗時は初期値）
+    try:
+        score = int(score)
+    except (ValueError, TypeError):
+        score = 0
+    try:
+        date = int(date)
+    except (ValueError, TypeError):
+        date = 0
+    try:
+        jid = int(jid)
+    except (ValueError, TypeError):
+        jid = NO_SUBMISSION
+    return score, date, jid
+
+def is_better(score: int, date: int, cur_score: int, cur_date: int) -> bool:
+    """
+    スコアが高い、または同スコアで日時が新しい場合にTrueを返す。
+
+    @param score 比較対象のスコア
+    @param date 比較対象の提出日時
+    @param cur_score 現在のスコア
+    @param cur_date 現在の提出日時
+    @return 比較対象の方が良い提出か
+    """
+    return score > cur_score or (score == cur_score and date > cur_date)
+
+class RecordOrder:
+    """
+    ページ単位で受信する提出記録が新しい順に並んでいるかを確認する。
+    新しい順であることを確認できた間だけ途中での打ち切りを許す。
+    ページの先頭の記録が既出の場合、または新しい順の間に前のページの記録より新しい場合は
+    （ページ指定を無視して同じ記録を返すサーバーとみなし）そこで取得を終える。
+    新しい順でない場合は既出の判定とMAX_PAGESだけで終える。
+    """
+
+    def __init__(self):
+        self.ordered = True
+        self.last_date: Optional[int] = None
+        self.first_ids: Set[int] = set()
+
+    def start_page(self, date: int, jid: int) -> bool:
+        """
+        ページの先頭の記録を確認する
+
+        @param date 先頭の記録の提出日時
+        @param jid 先頭の記録のjudgeId
+        @return 続きを読むか（既出のページならFalse）
+        """
+        if jid in self.first_ids:
+            return False
+        # 新しい順でない記録では、前のページより新しくても続きのページでありうる
+        if self.ordered and self.last_date is not None and date > self.last_date:
+            return False
+        self.first_ids.add(jid)
+        return True
+
+    def observe(self, date: int):
+        """
+        記録の提出日時を確認する（前の記録より新しければ、以降は打ち切らない）
+
+        @param date 提出日時
+        """
+        if self.last_date is not None and date > self.last_date:
+            self.ordered = False
+        self.last_date = date
+
+def fetch_max_info(user_id: str, prob_id: str, debug: bool = False,
+                   client: Optional[AOJClient] = None, page_size: int = PROBLEM_PAGE_SIZE,
+                   history: Optional[SubmissionHistory] = None) -> Optional[Tuple[int, int, int]]:
     """
     指定ユーザー・問題の提出記録を取得し、
     最高スコア、最新提出日時（ミリ秒）、judgeIdを返す。
 
+    提出記録はpage_size件ずつのページを受信しながら1件ずつ集計し、最高の提出だけを保持する。
+    AOJは提出記録を新しい順に返すため、満点の提出に達した時点でそれが結果となり、
+    次の記録がそれより古いことを確認したら残りの記録・ページは取得しない
+    （historyを指定した場合、新しい順でない記録を受信した場合は全件を取得する）。
+    ページ指定を無視するサーバーに備え、既出のページを受信するかMAX_PAGESに達したら取得を終える。
+
     @param user_id AOJユーザーID
     @param prob_id AOJ問題ID
     @param debug デバッグ情報を表示するか
-    @return (max_score, submission_timestamp, judge_id)
+    @param client 使用するAPIクライアント（省略時は共有クライアント）
+    @param page_size 1ページあたりの取得件数
+    @param history 取得した提出記録を保存する履歴
+    @return (max_score, submission_timestamp, judge_id)、取得失敗時はNone
     """
-    url = f"{ENDPOINT}{URI}/users/{user_id}/problems/{prob_id}"
+    client = client or get_default_client()
     max_score, max_date, max_jid = 0, 0, NO_SUBMISSION
-    try:
-        resp = requests.get(url, verify=False, timeout=10)
-        data = resp.json() or []
-        debug_print(f"{prob_id}: データ数 {len(data)}", debug)
+    count = 0
 
-        for sub in data:
-            score = sub.get("score", 0)
-            date = sub.get("submissionDate", 0)
-            jid = sub.get("judgeId", NO_SUBMISSION)
-
-            # 数値に変換（変換失敗時は初期値）
-            try:
-                score = int(score)
-            except (ValueError, TypeError):
-                score = 0
-            try:
-                date = int(date)
-            except (ValueError, TypeError):
-                date = 0
-            try:
-                jid = int(jid)
-            except (ValueError, TypeError):
-                jid = NO_SUBMISSION
-
-            debug_print(f"{prob_id}: スコア={score} 日時={date} ID={jid}", debug)
-
-            # スコアが更新、または同スコアで日時が新しい場合に更新
-            if score > max_score or (score == max_score and date > max_date):
-                max_score = score
-                max_date = date
-                max_jid = jid
-                debug_print(f"{prob_id}: 更新 → スコア={max_score} 日時={max_date} ID={max_jid}", debug)
-
-    except Exception as e:
+    order = RecordOrder()
+    page = 0
+    try:
+        finished = False
+        while not finished:
+            result = client.stream_json(f"{URI}/users/{user_id}/problems/{prob_id}",
+                                        params={"page": page, "size": page_size})
+            if not result.ok:
+                print(f"エラー: {prob_id}の取得中にエラーが発生しました - {result.error}")
+                return None
+            if result.data is None:
+                break
+
+            received = 0
+            repeated = False
+            records = [] if history is not None else None
+            for sub in result.data:
+                score, date, jid = parse_submission(sub)
+                if received == 0 and not order.start_page(date, jid):
+                    repeated = True
+                    break
+                order.observe(date)
+                # 満点の提出の次の記録がそれより古ければ、新しい順であり以降の記録は結果を変えない
+                if max_score >= MAX_SCORE and history is None and order.ordered:
+                    finished = True
+                    break
+                received += 1
+                if records is not None:
+                    records.append(sub)
+                if debug:
+                    debug_print(debug, "%s: スコア=%d 日時=%d ID=%d", prob_id, score, date, jid)
+
+                # スコアが更新、または同スコアで日時が新しい場合に更新
+                if is_better(score, date, max_score, max_date):
+                    max_score = score
+                    max_date = date
+                    max_jid = jid
+                    debug_print(debug, "%s: 更新 → スコア=%d 日時=%d ID=%d",
+                                prob_id, max_score, max_date, max_jid)
+            count += received
+            if records:
+                history.add(user_id, records, prob_id)
+
+            # 最終ページ（ページ指定を無視して全件・同じページを返すサーバーも含む）
+            if finished or repeated or received != page_size:
+                break
+            page += 1
+            if page >= MAX_PAGES:
+                print(f"警告: {prob_id}の提出記録が{MAX_PAGES}ページを超えたため取得を打ち切りました")
+                break
+    except ValueError as e:
         print(f"エラー: {prob_id}の取得中にエラーが発生しました - {e}")
+        return None
 
-    debug_print(f"{prob_id}: 最終結果 → スコア={max_score} 日時={max_date} ID={max_jid}", debug)
+    debug_print(debug, "%s: データ数 %d（%dページ）", prob_id, count, page + 1)
+    debug_print(debug, "%s: 最終結果 → スコア=%d 日時=%d ID=%d", prob_id, max_score, max_date, max_jid)
     return max_score, max_date, max_jid
 
-def backup_user_csv() -> str:
+def fetch_user_submissions(user_id: str, probs: List[str], debug: bool = False,
+                           client: Optional[AOJClient] = None, page_size: int = PAGE_SIZE,
+                           since: int = 0, history: Optional[SubmissionHistory] = None
+                           ) -> Optional[Tuple[Dict[str, Tuple[int, int, int]], int]]:
     """
-    user.csvのバックアップを作成し、バックアップファイル名を返す。
+    指定ユーザーの提出記録をページ単位で取得し、
+    prob.csvの各問題について最高スコア、最新提出日時（ミリ秒）、judgeIdを求める。
+    判定規則はfetch_max_infoと同じ。
+
+    AOJは提出記録を新しい順に返すため、sinceを指定した場合は
+    提出日時がsinceより古い記録に達した時点で取得を打ち切る。
+    全ての問題で満点の提出に達した場合も、それより古い記録は結果を変えないため打ち切る
+    （historyを指定した場合は全件を保存するため打ち切らない）。
+    新しい順でない記録を受信した場合は打ち切らず、既出のページを受信するか
+    MAX_PAGESに達するまで取得する。
+
+    @param user_id AOJユーザーID
+    @param probs 問題IDのリスト
+    @param debug デバッグ情報を表示するか
+    @param client 使用するAPIクライアント（省略時は共有クライアント）
+    @param page_size 1ページあたりの取得件数
+    @param since この日時（ミリ秒）以降の提出のみを対象にする（0なら全件）
+    @param history 取得した提出記録を保存する履歴
+    @return (問題IDごとの(max_score, submission_timestamp, judge_id), 取得した中で最新の提出日時)、
+            取得失敗時はNone
     """
-    date_str = datetime.now().strftime("%Y%m%d")
-    n = 1
+    client = client or get_default_client()
+    best = {pid: (0, 0, NO_SUBMISSION) for pid in probs}
+    unsolved = len(best)
+    newest = since
+
+    order = RecordOrder()
+    page = 0
     while True:
-        name = f"user_{date_str}_{n:03d}.csv"
-        if not os.path.exists(name):
+        result = client.get_json(f"{URI}/users/{user_id}",
+                                 params={"page": page, "size": page_size})
+        if not result.ok:
+            print(f"エラー: {user_id}の提出記録の取得中にエラーが発生しました - {result.error}")
+            return None
+
+        data = result.data or []
+        debug_print(debug, "%s: ページ%d データ数 %d", user_id, page, len(data))
+        if data and not order.start_page(*parse_submission(data[0])[1:]):
             break
-        n += 1
-    with open("user.csv", "r") as src, open(name, "w") as dst:
-        dst.write(src.read())
-    return name
+        if history is not None:
+            history.add(user_id, data)
 
-def initialize_user_csv():
+        reached = False
+        for sub in data:
+            score, date, jid = parse_submission(sub)
+            order.observe(date)
+            if unsolved == 0 and history is None and order.ordered:
+                # 全ての問題で満点に達し、以降の記録はそれより古い
+                reached = True
+                break
+            if date < since:
+                if order.ordered:
+                    # 前回までに確認済みの提出に到達
+                    reached = True
+                    break
+                continue
+            newest = max(newest, date)
+
+            pid = sub.get("problemId")
+            if pid not in best:
+                continue
+            max_score, max_date, _ = best[pid]
+            if is_better(score, date, max_score, max_date):
+                best[pid] = (score, date, jid)
+                debug_print(debug, "%s: 更新 → スコア=%d 日時=%d ID=%d", pid, score, date, jid)
+                if score >= MAX_SCORE > max_score:
+                    unsolved -= 1
+
+        if reached or len(data) < page_size:
+            break
+        page += 1
+        if page >= MAX_PAGES:
+            print(f"警告: {user_id}の提出記録が{MAX_PAGES}ページを超えたため取得を打ち切りました")
+            break
+
+    return best, newest
+
+def fetch_user_max_info(user_id: str, probs: List[str], debug: bool = False,
+                        client: Optional[AOJClient] = None, page_size: int = PAGE_SIZE,
+                        history: Optional[SubmissionHistory] = None
+                        ) -> Optional[Dict[str, Tuple[int, int, int]]]:
+    """
+    指定ユーザーの全提出記録を取得し、問題ごとの最高スコア、最新提出日時、judgeIdを返す。
+
+    @param user_id AOJユーザーID
+    @param probs 問題IDのリスト
+    @param debug デバッグ情報を表示するか
+    @param client 使用するAPIクライアント（省略時は共有クライアント）
+    @param page_size 1ページあたりの取得件数
+    @param history 取得した提出記録を保存する履歴
+    @return 問題IDごとの(max_score, submission_timestamp, judge_id)、取得失敗時はNone
+    """
+    fetched = fetch_user_submissions(user_id, probs, debug, client, page_size, history=history)
+    if fetched is None:
+        return None
+    return fetched[0]
+
+def get_max_info(user_id: str, prob_id: str, debug: bool = False,
+                 client: Optional[AOJClient] = None) -> tuple[int, int, int]:
+    """
+    fetch_max_infoと同様だが、取得失敗時は未提出の値を返す。
+
+    @param user_id AOJユーザーID
+    @param prob_id AOJ問題ID
+    @param debug デバッグ情報を表示するか
+    @param client 使用するAPIクライアント（省略時は共有クライアント）
+    @return (max_score, submission_timestamp, judge_id)
+    """
+    info = fetch_max_info(user_id, prob_id, debug, client)
+    if info is None:
+        return 0, 0, NO_SUBMISSION
+    return info
+
+def backup_user_csv(keep: int = DEFAULT_KEEP) -> Tuple[str, bool]:
+    """
+    user.csvのスナップショットをバックアップ履歴に保存し、古いものを削除する。
+
+    @param keep 保持するスナップショット数
+    @return (スナップショット名, 新たに作成したか)
+    """
+    store = BackupStore()
+    name, created = store.save("user.csv")
+    store.prune(keep)
+    return name, created
+
+def initialize_user_csv(watermark_file: str = WATERMARK_FILE):
     """
     user.csvを初期化し、各問題のスコア・提出日時・judgeIdを初期値にリセットする。
+
+    @param watermark_file 併せて削除する増分取得の状態ファイル
     """
     with open("user.csv", "r", newline="") as f:
         rows = list(csv.reader(f))
@@ -118,9 +397,10 @@ def initialize_user_csv():
             # score, date, judgeIdをそれぞれ初期化
             base.extend(["0", "0", str(NO_SUBMISSION)])
         out.append(base)
-    with open("user.csv", "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerows(out)
+    atomic_write_csv("user.csv", out)
+    # 増分取得の状態も初期化（次回は全件取得）
+    if os.path.exists(watermark_file):
+        os.remove(watermark_file)
     print("user.csvを初期化しました。")
 
 def normalize_submission_data(row: List[str], prob_count: int) -> List[str]:
@@ -186,97 +466,464 @@ def clean_user_csv():
     normalized = [normalize_submission_data(row, prob_count) for row in rows]
 
     # 保存
-    with open("user.csv", "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerows(normalized)
+    atomic_write_csv("user.csv", normalized)
 
     print("user.csvを正規化しました。")
 
-def main():
-    parser = argparse.ArgumentParser(description="user.csvを初期化または提出状況を更新")
-    parser.add_argument("--init", action="store_true", help="user.csvを初期化します")
-    parser.add_argument("--clean", action="store_true", help="user.csvを正規化します")
-    parser.add_argument("--debug", action="store_true", help="デバッグ情報を表示します")
-    args = parser.parse_args()
+def load_watermarks(path: str, probs: List[str]) -> Dict[str, int]:
+    """
+    ユーザーごとの確認済み最新提出日時（ウォーターマーク）を読み込む。
+    問題セットが前回と異なる場合は、新しい問題の過去の提出を取りこぼさないよう空にする。
 
-    if args.init:
-        initialize_user_csv()
+    @param path ウォーターマークファイルのパス
+    @param probs 問題IDのリスト
+    @return ユーザーIDごとの最新提出日時（ミリ秒）
+    """
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (ValueError, OSError) as e:
+        print(f"警告: {path}を読み込めませんでした - {e}")
+        return {}
+    if data.get("problems") != probs:
+        print(f"問題セットが変更されたため、{path}を使用せずに全件取得します。")
+        return {}
+    return {uid: int(date) for uid, date in data.get("users", {}).items()}
+
+def save_watermarks(path: str, probs: List[str], watermarks: Dict[str, int]):
+    """
+    ユーザーごとの確認済み最新提出日時（ウォーターマーク）を保存する。
+
+    @param path ウォーターマークファイルのパス
+    @param probs 問題IDのリスト
+    @param watermarks ユーザーIDごとの最新提出日時（ミリ秒）
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"problems": probs, "users": watermarks}, f, ensure_ascii=False, indent=1)
+
+def choose_strategy(strategy: str, prob_count: int, pending_pairs: Optional[int] = None,
+                    pending_users: Optional[int] = None) -> str:
+    """
+    取得方法を決定する。
+    取得する組の数を指定した場合は、取得する組を含むユーザー1人あたりの組数で判断する。
+
+    @param strategy 指定された取得方法（auto/pair/user）
+    @param prob_count 問題数
+    @param pending_pairs 取得する組の数（省略時は全ての組）
+    @param pending_users 取得する組を含むユーザー数
+    @return 実際に使用する取得方法（pair/user）
+    """
+    if strategy != STRATEGY_AUTO:
+        return strategy
+    if pending_pairs is not None and pending_users:
+        if pending_pairs >= pending_users * USER_STRATEGY_MIN_PROBLEMS:
+            return STRATEGY_USER
+        return STRATEGY_PAIR
+    if prob_count >= USER_STRATEGY_MIN_PROBLEMS:
+        return STRATEGY_USER
+    return STRATEGY_PAIR
+
+def fetch_results(user_ids: List[str], probs: List[str], workers: int = 1, debug: bool = False,
+                  client: Optional[AOJClient] = None, strategy: str = STRATEGY_AUTO,
+                  watermarks: Optional[Dict[str, int]] = None,
+                  done: Optional[Dict[Tuple[str, str], Tuple[int, int, int]]] = None,
+                  history: Optional[SubmissionHistory] = None
+                  ) -> Iterator[Optional[Tuple[int, int, int]]]:
+    """
+    各ユーザー・各問題の最新情報を取得し、(ユーザー, 問題)の順に結果を返す。
+
+    watermarksを指定した場合は増分取得となり、ユーザーごとに
+    ウォーターマーク以降の提出のみを取得して、取得後にwatermarksを更新する。
+    doneを指定した場合（中断した実行の再開時・満点の組の固定時）は、含まれる組を取得せずにその値を返す。
+    ユーザー単位の取得では、全問題がdoneに含まれるユーザーだけを取得しない。
+
+    @param user_ids AOJユーザーIDのリスト（user.csvの行順）
+    @param probs 問題IDのリスト
+    @param workers 並列実行数
+    @param debug デバッグ情報を表示するか
+    @param client 使用するAPIクライアント（省略時は共有クライアント）
+    @param strategy 取得方法（auto/pair/user）
+    @param watermarks ユーザーIDごとの確認済み最新提出日時（増分取得時のみ）
+    @param done 取得済みの(ユーザーID, 問題ID)ごとの結果
+    @param history 取得した提出記録を保存する履歴
+    @return (max_score, submission_timestamp, judge_id)またはNoneのイテレータ
+    """
+    done = done or {}
+    pending = [uid for uid in user_ids if any((uid, pid) not in done for pid in probs)]
+    pending_set = set(pending)
+    pending_pairs = sum(1 for uid in user_ids for pid in probs if (uid, pid) not in done)
+
+    if watermarks is not None:
+        since = dict(watermarks)
+        per_user = map_ordered(
+            lambda uid: fetch_user_submissions(uid, probs, debug, client, since=since.get(uid, 0),
+                                               history=history),
+            pending, workers)
+        for uid in user_ids:
+            if uid not in pending_set:
+                yield from [done[(uid, pid)] for pid in probs]
+                continue
+            fetched = next(per_user)
+            if fetched is None:
+                yield from [done.get((uid, pid)) for pid in probs]
+                continue
+            infos, newest = fetched
+            watermarks[uid] = newest
+            for pid in probs:
+                yield done.get((uid, pid), infos[pid])
         return
 
-    if args.clean:
-        clean_user_csv()
+    if choose_strategy(strategy, len(probs), pending_pairs, len(pending)) == STRATEGY_USER:
+        per_user = map_ordered(lambda uid: fetch_user_max_info(uid, probs, debug, client,
+                                                               history=history),
+                               pending, workers)
+        for uid in user_ids:
+            infos = next(per_user) if uid in pending_set else None
+            for pid in probs:
+                yield done.get((uid, pid), None if infos is None else infos[pid])
         return
 
-    # バックアップ作成
-    bak = backup_user_csv()
-    print(f"バックアップを作成しました: {bak}")
+    pairs = [(uid, pid) for uid in user_ids for pid in probs if (uid, pid) not in done]
+    fetched = map_ordered(lambda p: fetch_max_info(p[0], p[1], debug, client, history=history),
+                          pairs, workers)
+    for uid in user_ids:
+        for pid in probs:
+            yield done[(uid, pid)] if (uid, pid) in done else next(fetched)
 
-    # CSV読み込み
-    with open("user.csv", "r", newline="") as f:
-        rows = list(csv.reader(f))
-    with open("prob.csv", "r", newline="") as f:
-        probs = next(csv.reader(f))
+def plan_fetch(roster: Roster, strategy: str = STRATEGY_AUTO, incremental: bool = False,
+               skip: Optional[Dict[Tuple[str, str], Tuple[int, int, int]]] = None,
+               full_verify: bool = False) -> FetchPlan:
+    """
+    取得する組の数とリクエスト数を求める（fetch_resultsと同じ判断で取得方法を決める）
+
+    @param roster 学生一覧と提出記録
+    @param strategy 取得方法（auto/pair/user）
+    @param incremental 増分取得か（ユーザー単位で取得する）
+    @param skip 取得を省略する組
+    @param full_verify 満点の組も確認する実行か
+    @return FetchPlan
+    """
+    skip = skip or {}
+    user_ids = [st.user_id for st in roster.students]
+    probs = roster.problems
+    pending_pairs = sum(1 for uid in user_ids for pid in probs if (uid, pid) not in skip)
+    pending_users = sum(1 for uid in user_ids if any((uid, pid) not in skip for pid in probs))
+    per_user = incremental or choose_strategy(strategy, len(probs), pending_pairs,
+                                              pending_users) == STRATEGY_USER
+    return FetchPlan(len(user_ids) * len(probs), pending_pairs, pending_users, skip, per_user,
+                     full_verify)
+
+def update_roster(roster: Roster, workers: int = 1, debug: bool = False,
+                  client: Optional[AOJClient] = None, strategy: str = STRATEGY_AUTO,
+                  watermarks: Optional[Dict[str, int]] = None,
+                  changes: Optional[List[Dict]] = None,
+                  journal: Optional[CheckJournal] = None,
+                  skip: Optional[Dict[Tuple[str, str], Tuple[int, int, int]]] = None,
+                  history: Optional[SubmissionHistory] = None
+                  ) -> Tuple[Dict[str, List[str]], List[Tuple[str, str]]]:
+    """
+    各学生・各問題についてAOJ APIから最新情報を取得し、rosterを更新する。
+    取得に失敗した組は現在の値を保持する。
+    API応答の待ち時間を処理段階fetch、それ以外の反映処理をmergeとして計測する。
+
+    @param roster 学生一覧と提出記録（その場で更新する）
+    @param workers 並列実行数
+    @param debug デバッグ情報を表示するか
+    @param client 使用するAPIクライアント（省略時は共有クライアント）
+    @param strategy 取得方法（auto/pair/user）
+    @param watermarks ユーザーIDごとの確認済み最新提出日時（増分取得時のみ）
+    @param changes 更新したセルごとの変更ログの行を追加するリスト
+    @param journal 取得結果を1件ずつ記録する進捗ジャーナル（記録済みの組は取得しない）
+    @param skip 取得を省略する組と、その値として使う結果（fetch_planner.frozen_pairs）
+    @param history 取得した提出記録を保存する履歴
+    @return (問題IDごとの更新があった学籍番号, 取得に失敗した(学籍番号, 問題ID))
+    """
+    probs = roster.problems
+    start = time.perf_counter()
+    done = dict(skip or {})
+    if journal is not None:
+        done.update(journal.done)
+    if journal is not None and watermarks is not None:
+        # 全問題を記録済みのユーザーは、中断した実行で確認した位置まで進める
+        watermarks.update(journal.watermarks)
+    results = TimedIterator(fetch_results([st.user_id for st in roster.students], probs, workers,
+                                          debug, client, strategy, watermarks, done,
+                                          history))
 
-    updated = []
     problem_updates = {}  # 問題IDごとの更新情報を記録
-    for row in rows:
-        student_id = row[0]  # 学籍番号
-        print(f"{student_id}\t{row[1]}\t{row[2]}\t{row[3]}", end="")
-        uid = row[3]
-        new_row = row[:4]  # 基本情報
+    failures = []  # 取得に失敗した組
+    for s, student in enumerate(roster.students):
+        student_id = student.student_id  # 学籍番号
+        print(f"{student_id}\t{student.surname}\t{student.name}\t{student.user_id}", end="")
 
-        # 1問題につき3列(score,date,judgeId)
         for i, pid in enumerate(probs):
-            base_idx = 4 + i * 3  # 各問題の開始インデックス
-            # CSVの列が足りない場合は拡張
-            while len(row) < base_idx + 3:
-                row.extend(["0", "0", str(NO_SUBMISSION)])
-
-            # 現在の値を取得（CSVから）
-            cur_score = row[base_idx]
-            cur_date = row[base_idx + 1]
-            cur_jid = row[base_idx + 2]
+            # 現在の値
+            cur_score, cur_date, cur_jid = roster.cell(s, i)
 
             # AOJ APIから最新情報を取得
-            max_score, max_date, max_jid = get_max_info(uid, pid, args.debug)
-
-            # 現在のCSVの値を数値に変換
-            try:
-                cur_score_int = int(cur_score)
-            except (ValueError, TypeError):
-                cur_score_int = 0
-
-            try:
-                cur_date_int = int(cur_date)
-            except (ValueError, TypeError):
-                cur_date_int = 0
-
-            try:
-                cur_jid_int = int(cur_jid)
-            except (ValueError, TypeError):
-                cur_jid_int = NO_SUBMISSION
+            info = next(results)
+            if info is None:
+                # 取得失敗時は現在の値を保持
+                failures.append((student_id, pid))
+                print(f"\t{cur_score}({cur_date},{cur_jid})?", end="")
+                continue
+            max_score, max_date, max_jid = info
+            if journal is not None and (student.user_id, pid) not in done:
+                journal.record(student.user_id, pid, info)
 
             # より良い提出があれば更新
-            if (max_score > cur_score_int or 
-                (max_score == cur_score_int and max_date > cur_date_int)):
-                new_row.extend([str(max_score), str(max_date), str(max_jid)])
+            if is_better(max_score, max_date, cur_score, cur_date):
+                roster.set_cell(s, i, max_score, max_date, max_jid)
+                if changes is not None:
+                    changes.append(make_entry(student_id, student.user_id, pid,
+                                              (cur_score, cur_date, cur_jid), info))
                 print(f"\t{max_score}({max_date},{max_jid})", end="")
                 if pid not in problem_updates:
                     problem_updates[pid] = []
                 problem_updates[pid].append(student_id)
             else:
                 # 現在の値を保持
-                new_row.extend([str(cur_score_int), str(cur_date_int), str(cur_jid_int)])
-                print(f"\t{cur_score_int}({cur_date_int},{cur_jid_int})", end="")
+                print(f"\t{cur_score}({cur_date},{cur_jid})", end="")
 
-        updated.append(new_row)
         print()
+        if journal is not None and watermarks is not None and student.user_id in watermarks:
+            journal.record_watermark(student.user_id, watermarks[student.user_id])
+
+    metrics = get_metrics()
+    metrics.add_phase("fetch", results.elapsed)
+    metrics.add_phase("merge", time.perf_counter() - start - results.elapsed)
+    return problem_updates, failures
 
-    # 上書き保存
-    with open("user.csv", "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerows(updated)
-    print("user.csvを更新しました。")
+def watch(roster: Roster, client: AOJClient, args: argparse.Namespace):
+    """
+    常駐して提出状況を監視する（--watch）。
+    常に増分取得を行い、ウォーターマークは更新内容の保存時に併せて保存する。
+
+    @param roster 学生一覧と提出記録
+    @param client 使用するAPIクライアント
+    @param args コマンドライン引数
+    """
+    from submission_watcher import PollScheduler, SubmissionWatcher
+
+    probs = roster.problems
+    watermarks = load_watermarks(args.watermark_file, probs)
+
+    def save():
+        with get_metrics().phase("write"):
+            save_roster(roster, db=args.db)
+            # 変更ログは提出記録の保存後に追記する
+            if not args.db:
+                watcher.changes.append(make_source_entry())
+            append_changes(args.change_log, watcher.changes)
+            watcher.changes.clear()
+            save_watermarks(args.watermark_file, probs, watermarks)
+        print(f"{args.db or 'user.csv'}を更新しました。")
+
+    scheduler = PollScheduler(len(roster.students), args.poll_min, args.poll_max,
+                              args.poll_solved, time.monotonic())
+    history = SubmissionHistory(args.history) if args.history else None
+    watcher = SubmissionWatcher(roster, client, save, watermarks, scheduler, args.workers,
+                                args.flush_interval, args.debug, history=history)
+    print(f"{len(roster.students)}人の提出状況を監視します（Ctrl+Cで終了）。")
+    try:
+        watcher.run()
+    finally:
+        if history is not None:
+            history.close()
+    watcher.print_stats()
+    client.rate_limiter.print_stats()
+
+def add_data_arguments(parser: argparse.ArgumentParser):
+    """
+    データの保存先に関する引数を追加する（初期化・正規化・更新で共通）
+
+    @param parser 引数パーサー
+    """
+    parser.add_argument("--db", help="user.csvの代わりに使用するSQLiteデータベース")
+    parser.add_argument("--watermark-file", default=WATERMARK_FILE,
+                        help=f"増分取得の状態ファイル（デフォルト: {WATERMARK_FILE}）")
+    parser.add_argument("--change-log", default=CHANGE_LOG_FILE,
+                        help=f"更新内容を追記する変更ログ（デフォルト: {CHANGE_LOG_FILE}）")
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """
+    提出状況の更新の引数を追加する
+
+    @param parser 引数パーサー
+    """
+    add_data_arguments(parser)
+    parser.add_argument("--debug", action="store_true", help="デバッグ情報を表示します")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="APIリクエストの並列実行数（デフォルト: 1）")
+    parser.add_argument("--retries", type=int, default=3,
+                        help="APIリクエスト失敗時の再試行回数（デフォルト: 3）")
+    parser.add_argument("--strategy", choices=[STRATEGY_AUTO, STRATEGY_PAIR, STRATEGY_USER],
+                        default=STRATEGY_AUTO,
+                        help="取得方法: pair=問題ごと, user=ユーザーごとに全提出記録, "
+                             "auto=問題数で自動選択（デフォルト: auto）")
+    parser.add_argument("--incremental", action="store_true",
+                        help="前回確認した提出より新しい提出のみを取得します")
+    parser.add_argument("--keep-backups", type=int, default=DEFAULT_KEEP,
+                        help=f"保持するバックアップ数（デフォルト: {DEFAULT_KEEP}）")
+    parser.add_argument("--resume", action="store_true",
+                        help="中断した実行の続きから再開します（取得済みの組は取得しません）")
+    parser.add_argument("--journal", default=JOURNAL_FILE,
+                        help=f"取得結果を1件ずつ記録する進捗ジャーナル（デフォルト: {JOURNAL_FILE}）")
+    parser.add_argument("--history", nargs="?", const=HISTORY_FILE, metavar="PATH",
+                        help="取得した提出記録を全件、履歴に保存します"
+                             f"（PATH省略時: {HISTORY_FILE}、満点での打ち切りは行いません）")
+    parser.add_argument("--freeze-solved", action="store_true",
+                        help="満点を記録済みの組は取得を省略します（定期的に全件を確認）")
+    parser.add_argument("--verify-days", type=float, default=DEFAULT_VERIFY_DAYS,
+                        help="--freeze-solved指定時に全件を確認する間隔（日、0なら確認しない、"
+                             f"デフォルト: {DEFAULT_VERIFY_DAYS:g}）")
+    parser.add_argument("--plan-state", default=PLAN_STATE_FILE,
+                        help=f"前回の全件確認の時刻を記録するファイル（デフォルト: {PLAN_STATE_FILE}）")
+    parser.add_argument("--plan", action="store_true",
+                        help="取得せずに、リクエスト数と推定時間を表示します")
+    parser.add_argument("--watch", action="store_true",
+                        help="常駐して提出状況を監視します（Ctrl+Cで終了）")
+    parser.add_argument("--poll-min", type=float, default=30.0,
+                        help="監視時、新しい提出があった学生の確認間隔（秒、デフォルト: 30）")
+    parser.add_argument("--poll-max", type=float, default=600.0,
+                        help="監視時、提出のない学生の確認間隔の上限（秒、デフォルト: 600）")
+    parser.add_argument("--poll-solved", type=float, default=1800.0,
+                        help="監視時、全問題を解き終えた学生の確認間隔（秒、デフォルト: 1800）")
+    parser.add_argument("--flush-interval", type=float, default=60.0,
+                        help="監視時、更新内容を保存する間隔（秒、デフォルト: 60）")
+    add_cache_arguments(parser)
+    add_rate_arguments(parser)
+
+def run_init(args: argparse.Namespace, roster: Optional[Roster] = None) -> Optional[Roster]:
+    """
+    user.csv（またはデータベース）を初期化する
+
+    @param args コマンドライン引数（add_data_argumentsの引数）
+    @param roster 読み込み済みのデータ（使用しない）
+    @return None（読み込み済みのデータは無効になる）
+    """
+    if args.db:
+        store = SubmissionStore(args.db)
+        store.reset()
+        store.close()
+        if os.path.exists(args.watermark_file):
+            os.remove(args.watermark_file)
+        print(f"{args.db}を初期化しました。")
+    else:
+        initialize_user_csv(args.watermark_file)
+    # それ以前の変更ログからは状態を再現できない
+    append_changes(args.change_log, [make_reset_entry()])
+    return None
+
+def run_clean(args: argparse.Namespace, roster: Optional[Roster] = None) -> Optional[Roster]:
+    """
+    user.csvを正規化する
+
+    @param args コマンドライン引数（add_data_argumentsの引数）
+    @param roster 読み込み済みのデータ（使用しない）
+    @return None（読み込み済みのデータは無効になる）
+    """
+    if args.db:
+        # データベースは型付きで保存しているため正規化は不要
+        print(f"{args.db}は正規化済みです。")
+    else:
+        clean_user_csv()
+        append_changes(args.change_log, [make_reset_entry()])
+    return None
+
+def run_check(args: argparse.Namespace, roster: Optional[Roster] = None) -> Roster:
+    """
+    提出状況を取得してuser.csv（またはデータベース）を更新する
+
+    @param args コマンドライン引数（add_argumentsの引数）
+    @param roster 読み込み済みのデータ（省略時は読み込む）
+    @return 更新後のデータ
+    """
+    metrics = get_metrics()
+    with metrics.phase("load"):
+        if not args.db and not args.plan:
+            # バックアップ作成
+            bak, created = backup_user_csv(args.keep_backups)
+            if created:
+                print(f"バックアップを作成しました: {bak}")
+            else:
+                print(f"前回のバックアップと同じ内容のため作成を省略しました: {bak}")
+
+        # データ読み込み
+        if roster is None:
+            roster = load_roster(db=args.db)
+        probs = roster.problems
+
+    if args.watch and args.cache:
+        # キャッシュした提出記録を返すと新しい提出を見逃すため、監視中はキャッシュを使わない
+        print("監視中はレスポンスキャッシュを使用しません（--cacheは無視されます）。")
+    cache = None if args.watch else cache_from_args(args)
+    client = AOJClient(pool_size=max(args.workers, DEFAULT_POOL_SIZE), max_retries=args.retries,
+                       cache=cache, rate_limiter=rate_limiter_from_args(args, ENDPOINT))
+
+    if args.watch:
+        watch(roster, client, args)
+        return roster
+
+    # 満点の組は取得を省略する（前回の全件確認から期間が経過した実行では全件を確認）
+    full_verify = args.freeze_solved and verify_due(args.plan_state, args.verify_days)
+    skip = frozen_pairs(roster) if args.freeze_solved and not full_verify else {}
+    done = read_journal(args.journal)[0] if args.resume else {}
+    plan = plan_fetch(roster, args.strategy, args.incremental, {**skip, **done}, full_verify)
+    print(plan.describe(args.workers, args.rate, args.max_rate))
+    if args.plan:
+        return roster
+
+    watermarks = load_watermarks(args.watermark_file, probs) if args.incremental else None
+    if args.resume:
+        journal = CheckJournal(args.journal, resume=True)
+        print(f"中断した実行の続きから再開します（取得済み: {len(journal.done)}件）。")
+    else:
+        if journal_exists(args.journal):
+            print(f"中断した実行の記録{args.journal}を破棄します（続きから再開するには--resume）。")
+        journal = CheckJournal(args.journal)
+
+    history = SubmissionHistory(args.history) if args.history else None
+    changes = []
+    try:
+        problem_updates, failures = update_roster(roster, args.workers, args.debug, client,
+                                                  args.strategy, watermarks, changes, journal,
+                                                  skip, history)
+    except KeyboardInterrupt:
+        print(f"\n中断しました。取得済みの結果は{args.journal}に記録されています"
+              "（--resumeで続きから再開できます）。")
+        raise
+    finally:
+        journal.close()
+        if history is not None:
+            history.close()
+            print(f"{args.history}に提出記録を{history.added}件追加しました。")
+
+    with metrics.phase("write"):
+        count = save_roster(roster, db=args.db)
+        if args.db:
+            # 変更のあったセルのみ1トランザクションで更新
+            print(f"{args.db}を更新しました（{count}件）。")
+        else:
+            # 上書き保存（一時ファイル経由で置き換え）
+            print("user.csvを更新しました。")
+
+        # 提出記録の保存後に変更ログへ追記する
+        if not args.db:
+            changes.append(make_source_entry())
+        append_changes(args.change_log, changes)
+
+        # 提出記録の保存後にウォーターマークを進める
+        if watermarks is not None:
+            save_watermarks(args.watermark_file, probs, watermarks)
+
+        # 全ての結果を保存したため、再開用の記録は不要
+        journal.remove()
+
+        if full_verify and not failures:
+            save_last_verified(args.plan_state)
 
     # 更新情報の表示
     if problem_updates:
@@ -287,5 +934,39 @@ def main():
     else:
         print("\n提出の更新はありませんでした。")
 
+    # 取得失敗の表示（失敗した組は値を変更していない）
+    if failures:
+        print(f"\n取得に失敗した提出: {len(failures)}件（値は変更していません）")
+        for student_id, pid in failures:
+            print(f"{student_id} {pid}")
+
+    client.rate_limiter.print_stats()
+    if cache is not None:
+        cache.print_stats()
+    return roster
+
+def main():
+    parser = argparse.ArgumentParser(description="user.csvを初期化または提出状況を更新")
+    parser.add_argument("--init", action="store_true", help="user.csvを初期化します")
+    parser.add_argument("--clean", action="store_true", help="user.csvを正規化します")
+    add_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    if args.init:
+        run_init(args)
+        return
+
+    if args.clean:
+        run_clean(args)
+        return
+
+    metrics = get_metrics()
+    metrics.script = "check_submission"
+    run_check(args)
+    if not args.watch:
+        metrics.print_summary()
+    write_metrics_from_args(args, metrics)
+
 if __name__ == "__main__":
     main()
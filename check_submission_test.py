@@ -6,13 +6,33 @@
 @brief check_submission.pyのテストコード
 """
 
+import argparse
 import unittest
 import os
 import csv
 import shutil
-from check_submission import get_max_info, normalize_submission_data, NO_SUBMISSION
+from unittest import mock
+from aoj_client import AOJClient, FetchResult, STATUS_OK, set_default_client
+import check_submission
+from check_submission import (get_max_info, fetch_max_info, fetch_user_max_info,
+                              normalize_submission_data, update_roster, run_check, NO_SUBMISSION)
+from rate_limiter import RateLimiter
+from roster import Roster
+from stub_server import StubAOJServer
 
 class TestCheckSubmission(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """実際のAOJの代わりにスタブサーバーを使用する"""
+        cls.server = StubAOJServer(["test1", "test2", "test3"],
+                                   ["ITP1_1_A", "ITP1_1_B", "ITP1_1_C"]).start()
+        set_default_client(AOJClient(cls.server.url, rate_limiter=RateLimiter(1000, max_rate=1000)))
+
+    @classmethod
+    def tearDownClass(cls):
+        set_default_client(None)
+        cls.server.stop()
+
     def setUp(self):
         """テスト前の準備"""
         # テストデータのパス
@@ -44,6 +64,82 @@ class TestCheckSubmission(unittest.TestCase):
         self.assertGreaterEqual(date, 0)
         self.assertGreaterEqual(judge_id, NO_SUBMISSION)
 
+    def test_get_max_info_matches_records(self):
+        """スタブサーバーの提出記録から最高スコアの提出を選ぶことのテスト"""
+        records = self.server.data.records["test1"]
+        pid = next(r["problemId"] for r in records if r["problemId"].startswith("ITP1"))
+        best = max((r for r in records if r["problemId"] == pid),
+                   key=lambda r: (r["score"], r["submissionDate"]))
+        self.assertEqual(get_max_info("test1", pid),
+                         (best["score"], best["submissionDate"], best["judgeId"]))
+
+    def test_fetch_max_info_stops_at_full_score(self):
+        """ページ単位で取得し、新しい順で最初の満点の提出に達したら打ち切ることのテスト"""
+        pages = [
+            [{"score": 50, "submissionDate": 1683936500000, "judgeId": 5},
+             {"score": 0, "submissionDate": 1683936400000, "judgeId": 4}],
+            [{"score": 100, "submissionDate": 1683936300000, "judgeId": 3},
+             {"score": 100, "submissionDate": 1683936200000, "judgeId": 2}],
+            [{"score": 100, "submissionDate": 1683936100000, "judgeId": 1}],
+        ]
+        client = mock.Mock()
+        client.stream_json.side_effect = [FetchResult(STATUS_OK, iter(page)) for page in pages]
+        self.assertEqual(fetch_max_info("test1", "ITP1_1_A", client=client, page_size=2),
+                         (100, 1683936300000, 3))
+        self.assertEqual([c.kwargs["params"] for c in client.stream_json.call_args_list],
+                         [{"page": 0, "size": 2}, {"page": 1, "size": 2}])
+
+        # 満点がなければ最後のページ（件数がページサイズ未満）まで取得する
+        pages[1][0]["score"] = pages[1][1]["score"] = pages[2][0]["score"] = 50
+        client.stream_json.reset_mock()
+        client.stream_json.side_effect = [FetchResult(STATUS_OK, iter(page)) for page in pages]
+        self.assertEqual(fetch_max_info("test1", "ITP1_1_A", client=client, page_size=2),
+                         (50, 1683936500000, 5))
+        self.assertEqual(client.stream_json.call_count, 3)
+
+    def test_fetch_max_info_ignored_paging(self):
+        """ページ指定を無視して同じページを返すサーバー・古い順の記録でも正しく終わることのテスト"""
+        page = [{"score": 100, "submissionDate": 1683936100000, "judgeId": 1},
+                {"score": 100, "submissionDate": 1683936200000, "judgeId": 2}]
+        client = mock.Mock()
+        client.stream_json.side_effect = lambda *args, **kwargs: FetchResult(STATUS_OK, iter(page))
+        # 古い順のため最初の満点で打ち切らず、同じページを2回目に受信した時点で終える
+        self.assertEqual(fetch_max_info("test1", "ITP1_1_A", client=client, page_size=2),
+                         (100, 1683936200000, 2))
+        self.assertEqual(client.stream_json.call_count, 2)
+
+        # 同じ日時の記録だけを返し続ける場合も先頭のjudgeIdの重複で終える
+        page[1]["submissionDate"] = page[0]["submissionDate"]
+        page[0]["score"] = page[1]["score"] = 50
+        client.stream_json.reset_mock()
+        self.assertEqual(fetch_max_info("test1", "ITP1_1_A", client=client, page_size=2),
+                         (50, 1683936100000, 1))
+        self.assertEqual(client.stream_json.call_count, 2)
+
+        # 毎回異なる記録を返し続けてもMAX_PAGESで打ち切る
+        pages = ([{"score": 0, "submissionDate": 10 ** 9 - n, "judgeId": n}] for n in range(10 ** 9))
+        client.stream_json.reset_mock()
+        client.stream_json.side_effect = lambda *args, **kwargs: FetchResult(STATUS_OK,
+                                                                             iter(next(pages)))
+        with mock.patch.object(check_submission, "MAX_PAGES", 5):
+            fetch_max_info("test1", "ITP1_1_A", client=client, page_size=1)
+        self.assertEqual(client.stream_json.call_count, 5)
+
+    def test_fetch_max_info_unordered_pages(self):
+        """新しい順でない記録を返すサーバーでも、続きのページを最後まで取得することのテスト"""
+        pages = [
+            [{"score": 0, "submissionDate": 1683936100000, "judgeId": 1},
+             {"score": 100, "submissionDate": 1683936200000, "judgeId": 2}],
+            [{"score": 50, "submissionDate": 1683936300000, "judgeId": 3},
+             {"score": 100, "submissionDate": 1683936400000, "judgeId": 4}],
+            [{"score": 0, "submissionDate": 1683936500000, "judgeId": 5}],
+        ]
+        client = mock.Mock()
+        client.stream_json.side_effect = [FetchResult(STATUS_OK, iter(page)) for page in pages]
+        self.assertEqual(fetch_max_info("test1", "ITP1_1_A", client=client, page_size=2),
+                         (100, 1683936400000, 4))
+        self.assertEqual(client.stream_json.call_count, 3)
+
     def test_get_max_info_invalid_user(self):
         """存在しないユーザーでのテスト"""
         score, date, judge_id = get_max_info("invalid_user", "ITP1_1_A")
@@ -142,5 +238,99 @@ class TestCheckSubmission(unittest.TestCase):
         
         self.assertEqual(len(updated_entries), 2)  # 更新されないことを確認
 
+    def test_update_roster_parallel_matches_serial(self):
+        """並列取得時も直列実行と同じ結果になることのテスト"""
+        rows = [
+            ["123456", "テスト", "太郎", "test1", "80", "1683936000000", "12345"],
+            ["234567", "テスト", "花子", "test2"],
+            ["345678", "テスト", "三郎", "test3", "100", "1683936200000", "12347",
+             "0", "0", str(NO_SUBMISSION)],
+        ]
+        probs = ["ITP1_1_A", "ITP1_1_B"]
+
+        def fake_fetch_max_info(uid, pid, debug=False, client=None, history=None):
+            if uid == "test3":
+                return 0, 0, NO_SUBMISSION
+            return 100, 1683936100000 + len(pid), 20000 + int(uid[-1])
+
+        with mock.patch("check_submission.fetch_max_info", side_effect=fake_fetch_max_info), \
+                mock.patch("builtins.print"):
+            serial = Roster.from_rows(rows, probs)
+            serial_updates = update_roster(serial, workers=1)
+            parallel = Roster.from_rows(rows, probs)
+            parallel_updates = update_roster(parallel, workers=4)
+
+        self.assertEqual(serial.to_rows(), parallel.to_rows())
+        self.assertEqual(serial_updates, parallel_updates)
+        problem_updates, failures = parallel_updates
+        self.assertEqual(failures, [])
+        self.assertEqual(parallel.to_rows()[2][4:], ["100", "1683936200000", "12347",
+                                          "0", "0", str(NO_SUBMISSION)])
+        self.assertEqual(problem_updates, {"ITP1_1_A": ["123456", "234567"],
+                                           "ITP1_1_B": ["123456", "234567"]})
+
+    def test_update_roster_keeps_value_on_failure(self):
+        """取得失敗時に現在の値を保持することのテスト"""
+        roster = Roster.from_rows([["123456", "テスト", "太郎", "test1", "100", "1683936000000",
+                                    "12345"]], ["ITP1_1_A"])
+        with mock.patch("check_submission.fetch_max_info", return_value=None), \
+                mock.patch("builtins.print"):
+            problem_updates, failures = update_roster(roster)
+        self.assertEqual(roster.to_rows()[0][4:], ["100", "1683936000000", "12345"])
+        self.assertEqual(problem_updates, {})
+        self.assertEqual(failures, [("123456", "ITP1_1_A")])
+
+    def test_fetch_user_max_info_pagination(self):
+        """ユーザー単位取得でページをまたいで集計するテスト"""
+        pages = [
+            [{"problemId": "ITP1_1_A", "score": 50, "submissionDate": 1683936300000, "judgeId": 3},
+             {"problemId": "ITP2_1_A", "score": 100, "submissionDate": 1683936200000, "judgeId": 2}],
+            [{"problemId": "ITP1_1_A", "score": 100, "submissionDate": 1683936100000, "judgeId": 1},
+             {"problemId": "ITP1_1_A", "score": 100, "submissionDate": 1683936000000, "judgeId": 0}],
+            [],
+        ]
+        client = mock.Mock()
+        client.get_json.side_effect = [FetchResult(STATUS_OK, page) for page in pages]
+
+        result = fetch_user_max_info("test1", ["ITP1_1_A", "ITP1_1_B"], client=client, page_size=2)
+
+        self.assertEqual(client.get_json.call_count, 3)
+        self.assertEqual(result, {"ITP1_1_A": (100, 1683936100000, 1),
+                                  "ITP1_1_B": (0, 0, NO_SUBMISSION)})
+
+    def test_update_roster_incremental(self):
+        """ウォーターマーク以降の提出のみを取得して反映するテスト"""
+        roster = Roster.from_rows([["123456", "テスト", "太郎", "test1", "100", "1683936000000",
+                                    "12345"]], ["ITP1_1_A"])
+        page = [
+            {"problemId": "ITP1_1_A", "score": 100, "submissionDate": 1683936500000, "judgeId": 12350},
+            {"problemId": "ITP1_1_A", "score": 100, "submissionDate": 1683936000000, "judgeId": 12345},
+            {"problemId": "ITP1_1_A", "score": 50, "submissionDate": 1683935000000, "judgeId": 12340},
+        ]
+        client = mock.Mock()
+        client.get_json.return_value = FetchResult(STATUS_OK, page)
+        watermarks = {"test1": 1683936000000}
+
+        with mock.patch("builtins.print"):
+            problem_updates, _ = update_roster(roster, client=client, watermarks=watermarks)
+
+        self.assertEqual(roster.to_rows()[0][4:], ["100", "1683936500000", "12350"])
+        self.assertEqual(problem_updates, {"ITP1_1_A": ["123456"]})
+        self.assertEqual(watermarks, {"test1": 1683936500000})
+        # 確認済みの提出に到達したため次のページは取得しない
+        self.assertEqual(client.get_json.call_count, 1)
+
+    def test_watch_ignores_cache(self):
+        """監視中は古い提出記録を返さないようレスポンスキャッシュを使わないことのテスト"""
+        parser = argparse.ArgumentParser()
+        check_submission.add_arguments(parser)
+        args = parser.parse_args(["--watch", "--cache", "--db", "unused.sqlite"])
+        roster = Roster(["ITP1_1_A"], [], [], [], [])
+        with mock.patch.object(check_submission, "watch") as watch, \
+                mock.patch.object(check_submission, "cache_from_args") as cache_from_args:
+            run_check(args, roster)
+        self.assertIsNone(watch.call_args[0][1].cache)
+        cache_from_args.assert_not_called()
+
 if __name__ == "__main__":
     unittest.main()
@@ -7,21 +7,34 @@
 
 user.csvから読み取ったjudgeIdを使用して、受講生全員の100点提出を
 「学籍番号_問題ID.py」の形式でdownloadsディレクトリにダウンロードします。
+ダウンロードしたファイルのjudgeIdと内容のハッシュをdownloads/manifest.jsonに記録し、
+再実行時はjudgeIdが変わった提出とファイルが変更・削除された提出のみ取得します。
+--archiveを指定すると、.pyファイルの代わりにsource_archive.pyのアーカイブに保存します。
 """
 
-import csv
+import argparse
 import os
-import requests
-import urllib3
-
-# SSL警告を抑制
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from aoj_client import DEFAULT_POOL_SIZE, ENDPOINT, AOJClient, get_default_client
+from backup_store import atomic_write_bytes
+from metrics import TimedIterator, add_metrics_arguments, get_metrics, write_metrics_from_args
+from parallel import map_ordered
+from rate_limiter import add_rate_arguments, rate_limiter_from_args
+from response_cache import add_cache_arguments, cache_from_args
+from roster import Roster, load_roster
+from source_archive import (ARCHIVE_FILE, DOWNLOAD_DIR, MANIFEST_FILE, SourceArchive,
+                            content_hash, load_manifest, save_manifest)
 
 class AOJSubmissionDownloader:
     """AOJの提出プログラムをダウンロードするクラス"""
 
-    def __init__(self):
-        self.judge_api = 'https://judgeapi.u-aizu.ac.jp'
+    def __init__(self, client: Optional[AOJClient] = None):
+        """
+        :param client: 使用するAPIクライアント（省略時は共有クライアント）
+        """
+        self.client = client or get_default_client()
 
     def get_source_code(self, submission_id: int) -> dict:
         """
@@ -30,57 +43,179 @@ class AOJSubmissionDownloader:
         :param submission_id: 提出ID（judgeId）
         :return: ソースコード情報の辞書（取得失敗時はNone）
         """
-        url = f"{self.judge_api}/reviews/{submission_id}"
-        try:
-            response = requests.get(url, verify=False, timeout=10)
-            if response.status_code == 200:
-                return response.json()
-        except Exception as e:
-            print(f"エラー: {submission_id}の取得中にエラーが発生しました - {e}")
-        return None
+        result = self.client.get_json(f"/reviews/{submission_id}")
+        if not result.ok:
+            print(f"エラー: {submission_id}の取得中にエラーが発生しました - {result.error}")
+        return result.data
+
+def iter_accepted(roster: Roster) -> Iterator[Tuple[str, str, int]]:
+    """
+    100点の提出を学生順・問題順に列挙する
+
+    :param roster: 学生一覧と提出記録
+    :return: (学籍番号, 問題ID, judgeId)のイテレータ
+    """
+    for s, p, score, _, judge_id in roster.iter_cells():
+        if score == 100 and judge_id != 0:
+            yield roster.students[s].student_id, roster.problems[p], judge_id
+
+def is_up_to_date(manifest: Dict[str, Dict], directory: str, filename: str, judge_id: int) -> bool:
+    """
+    ファイルがダウンロード済みで、judgeIdも内容も変わっていないか判定する
+
+    :param manifest: ダウンロード済みファイルの一覧
+    :param directory: 保存先ディレクトリ
+    :param filename: ファイル名
+    :param judge_id: 現在のjudgeId
+    :return: 再取得が不要ならTrue
+    """
+    entry = manifest.get(filename)
+    if entry is None or entry.get("judgeId") != judge_id:
+        return False
+    try:
+        with open(os.path.join(directory, filename), "rb") as f:
+            return content_hash(f.read()) == entry.get("sha256")
+    except OSError:
+        return False
+
+def download_all(roster: Roster, downloader: AOJSubmissionDownloader, directory: str = DOWNLOAD_DIR,
+                 workers: int = 1, force: bool = False,
+                 archive: Optional[SourceArchive] = None) -> Tuple[int, int, List[str]]:
+    """
+    100点の提出のうち、新しいものと変更されたものをダウンロードする
+
+    :param roster: 学生一覧と提出記録
+    :param downloader: ダウンローダー
+    :param directory: 保存先ディレクトリ（archive指定時は使用しない）
+    :param workers: 並列実行数
+    :param force: Trueならダウンロード済みの提出もすべて取得する
+    :param archive: 指定した場合は.pyファイルの代わりにこのアーカイブに保存する
+    :return: (ダウンロード件数, スキップ件数, 失敗した提出の説明のリスト)
+    """
+    if archive is None:
+        os.makedirs(directory, exist_ok=True)
+        manifest_path = os.path.join(directory, MANIFEST_FILE)
+        manifest = {} if force else load_manifest(manifest_path)
+
+    tasks = []
+    skipped = 0
+    failures = []
+    for student_id, prob_id, submission_id in iter_accepted(roster):
+        if submission_id <= 0:
+            failures.append(f"{student_id} {prob_id}: judgeId不正 ({submission_id})")
+            continue
+        filename = f"{student_id}_{prob_id}.py"
+        if archive is not None:
+            up_to_date = not force and archive.judge_id(student_id, prob_id) == submission_id
+        else:
+            up_to_date = is_up_to_date(manifest, directory, filename, submission_id)
+        if up_to_date:
+            skipped += 1
+            continue
+        tasks.append((student_id, prob_id, submission_id, filename))
+
+    def fetch(task):
+        return downloader.get_source_code(task[2])
+
+    downloaded = 0
+    start = time.perf_counter()
+    results = TimedIterator(map_ordered(fetch, tasks, workers))
+    try:
+        # 取得は並列、ファイルの書き込みとマニフェストの更新は入力順にこのスレッドで行う
+        for (student_id, prob_id, submission_id, filename), data in zip(tasks, results):
+            if not data or "sourceCode" not in data:
+                failures.append(f"{student_id} {prob_id}: ソースコード取得失敗 (judgeId={submission_id})")
+                continue
 
-def main():
-    # CSV読み込み
-    with open('user.csv', 'r', newline='') as f:
-        users = list(csv.reader(f))
-    with open('prob.csv', 'r', newline='') as f:
-        problems = next(csv.reader(f))
-
-    downloader = AOJSubmissionDownloader()
-    os.makedirs("downloads", exist_ok=True)
-
-    for user in users:
-        student_id = user[0]  # 学籍番号
-        fields = user[4:]     # データフィールド（スコア・日時・judgeId）
-
-        # 1問題につき3列
-        for i, prob_id in enumerate(problems):
-            base_idx = i * 3
-            if base_idx + 2 >= len(fields):  # インデックスチェック
+            if archive is not None:
+                archive.put(student_id, prob_id, submission_id, data["sourceCode"])
+                downloaded += 1
+                print(f"{filename} をアーカイブに保存しました。")
                 continue
 
-            score = fields[base_idx]
-            judge_id = fields[base_idx + 2]
-
-            # 100点の提出のみダウンロード
-            if score == "100" and judge_id and judge_id != "0":
-                try:
-                    submission_id = int(judge_id)
-                except ValueError:
-                    print(f"{student_id} {prob_id}: judgeId不正 ({judge_id})")
-                    continue
-
-                # ソースコード取得
-                data = downloader.get_source_code(submission_id)
-                if not data or "sourceCode" not in data:
-                    print(f"{student_id} {prob_id}: ソースコード取得失敗 (judgeId={submission_id})")
-                    continue
-
-                # ファイル保存
-                filename = f"downloads/{student_id}_{prob_id}.py"
-                with open(filename, "w", encoding="utf-8") as f:
-                    f.write(data["sourceCode"])
-                print(f"{filename} をダウンロードしました。")
+            # ファイル保存（中断しても書きかけのファイルが残らないよう一時ファイル経由で置き換え、
+            # 書き込みが完了してからマニフェストに記録する）
+            content = data["sourceCode"].encode("utf-8")
+            path = os.path.join(directory, filename)
+            atomic_write_bytes(path, content)
+            manifest[filename] = {"judgeId": submission_id, "sha256": content_hash(content)}
+            downloaded += 1
+            print(f"{path} をダウンロードしました。")
+    finally:
+        # 中断された場合も、それまでにダウンロードした分を記録する
+        if archive is not None:
+            archive.commit()
+        else:
+            save_manifest(manifest_path, manifest)
+        metrics = get_metrics()
+        metrics.add_phase("fetch", results.elapsed)
+        metrics.add_phase("write", time.perf_counter() - start - results.elapsed)
+
+    return downloaded, skipped, failures
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """
+    ダウンロードの引数を追加する
+
+    :param parser: 引数パーサー
+    """
+    parser.add_argument("--db", help="user.csvの代わりに読み込むSQLiteデータベース")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="並列ダウンロード数（デフォルト: 1）")
+    parser.add_argument("--force", action="store_true",
+                        help="ダウンロード済みの提出もすべて再取得します")
+    parser.add_argument("--archive", nargs="?", const=ARCHIVE_FILE,
+                        help=f"downloads/の代わりにアーカイブに保存します（デフォルト: {ARCHIVE_FILE}）")
+    add_cache_arguments(parser)
+    add_rate_arguments(parser)
+
+def run_download(args: argparse.Namespace, roster: Optional[Roster] = None) -> Roster:
+    """
+    コマンドライン引数に従って100点の提出をダウンロードする
+
+    :param args: コマンドライン引数（add_argumentsの引数）
+    :param roster: 読み込み済みのデータ（省略時はuser.csvから読み込む）
+    :return: ダウンロードに使用したデータ
+    """
+    metrics = get_metrics()
+
+    # データ読み込み
+    if roster is None:
+        with metrics.phase("load"):
+            roster = load_roster(db=args.db)
+
+    cache = cache_from_args(args)
+    client = AOJClient(pool_size=max(args.workers, DEFAULT_POOL_SIZE), cache=cache,
+                       rate_limiter=rate_limiter_from_args(args, ENDPOINT))
+    downloader = AOJSubmissionDownloader(client)
+
+    archive = SourceArchive(args.archive) if args.archive else None
+    try:
+        downloaded, skipped, failures = download_all(roster, downloader, DOWNLOAD_DIR,
+                                                     args.workers, args.force, archive)
+    finally:
+        if archive is not None:
+            archive.close()
+
+    print(f"\nダウンロード: {downloaded}件, スキップ（変更なし）: {skipped}件, 失敗: {len(failures)}件")
+    for failure in failures:
+        print(f"  {failure}")
+    client.rate_limiter.print_stats()
+    if cache is not None:
+        cache.print_stats()
+    return roster
+
+def main():
+    parser = argparse.ArgumentParser(description="受講生全員の100点提出をダウンロード")
+    add_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    metrics = get_metrics()
+    metrics.script = "download_all_submissions"
+    run_download(args)
+    metrics.print_summary()
+    write_metrics_from_args(args, metrics)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file download_all_submissions_test.py
+@brief download_all_submissions.pyのテストコード
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+
+from aoj_client import STATUS_ERROR, STATUS_OK, FetchResult
+from backup_store import atomic_write_bytes
+from download_all_submissions import AOJSubmissionDownloader, download_all, load_manifest
+from roster import Roster
+from source_archive import SourceArchive
+
+class TestDownloadAll(unittest.TestCase):
+    def setUp(self):
+        """テスト用のデータと一時ディレクトリを作成"""
+        self.dir = tempfile.mkdtemp()
+        self.probs = ["ITP1_1_A", "ITP1_1_B"]
+        self.rows = [
+            ["123456", "テスト", "太郎", "test1", "100", "1683936000000", "11", "0", "0", "-1"],
+            ["234567", "テスト", "花子", "test2", "100", "1683936100000", "21", "100",
+             "1683936200000", "22"],
+        ]
+        self.client = Mock()
+        self.client.get_json.side_effect = lambda path: FetchResult(
+            STATUS_OK, {"sourceCode": f"print({path.rsplit('/', 1)[1]})\n"}, None)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def run_download(self, rows, workers=1):
+        roster = Roster.from_rows(rows, self.probs)
+        return download_all(roster, AOJSubmissionDownloader(self.client), self.dir, workers)
+
+    def test_incremental(self):
+        """再実行時は新しい提出と変更されたファイルのみ取得することのテスト"""
+        self.assertEqual(self.run_download(self.rows, workers=4), (3, 0, []))
+        with open(os.path.join(self.dir, "234567_ITP1_1_B.py"), encoding="utf-8") as f:
+            self.assertEqual(f.read(), "print(22)\n")
+        self.assertEqual(load_manifest(os.path.join(self.dir, "manifest.json"))
+                         ["123456_ITP1_1_A.py"]["judgeId"], 11)
+
+        # 変更なし
+        self.client.get_json.reset_mock()
+        self.assertEqual(self.run_download(self.rows), (0, 3, []))
+        self.client.get_json.assert_not_called()
+
+        # judgeIdの変更と、ファイルの書き換え
+        self.rows[0][6] = "12"
+        with open(os.path.join(self.dir, "234567_ITP1_1_A.py"), "w", encoding="utf-8") as f:
+            f.write("edited\n")
+        self.assertEqual(self.run_download(self.rows), (2, 1, []))
+        self.assertEqual(sorted(c.args[0] for c in self.client.get_json.call_args_list),
+                         ["/reviews/12", "/reviews/21"])
+
+    def test_interrupted_write(self):
+        """書き込み中に中断しても、書き込みが完了したファイルだけをマニフェストに記録することのテスト"""
+        written = []
+
+        def interrupt_second(path, data):
+            if written:
+                raise KeyboardInterrupt
+            atomic_write_bytes(path, data)
+            written.append(os.path.basename(path))
+
+        with patch("download_all_submissions.atomic_write_bytes", side_effect=interrupt_second):
+            with self.assertRaises(KeyboardInterrupt):
+                self.run_download(self.rows)
+        manifest = load_manifest(os.path.join(self.dir, "manifest.json"))
+        self.assertEqual(list(manifest), written)
+        self.assertEqual(sorted(os.listdir(self.dir)), sorted(written + ["manifest.json"]))
+
+    def test_archive(self):
+        """アーカイブに保存し、再実行時はjudgeIdが変わった提出のみ取得することのテスト"""
+        archive = SourceArchive(os.path.join(self.dir, "sources.sqlite"))
+        roster = Roster.from_rows(self.rows, self.probs)
+        downloader = AOJSubmissionDownloader(self.client)
+        self.assertEqual(download_all(roster, downloader, workers=2, archive=archive), (3, 0, []))
+        self.assertEqual(archive.get("234567", "ITP1_1_B"), "print(22)\n")
+
+        roster.set_cell(0, 0, 100, 1683936000000, 12)
+        self.assertEqual(download_all(roster, downloader, archive=archive), (1, 2, []))
+        self.assertEqual(archive.get("123456", "ITP1_1_A"), "print(12)\n")
+        archive.close()
+        self.assertFalse(os.path.exists(os.path.join(self.dir, "manifest.json")))
+
+    def test_failures(self):
+        """取得失敗と不正なjudgeIdが失敗として数えられ、記録されないことのテスト"""
+        self.rows[0][6] = "-1"
+        self.client.get_json.side_effect = lambda path: (
+            FetchResult(STATUS_ERROR, None, "HTTP 500") if path == "/reviews/21"
+            else FetchResult(STATUS_OK, {"sourceCode": "x"}, None))
+        downloaded, skipped, failures = self.run_download(self.rows)
+        self.assertEqual((downloaded, skipped, len(failures)), (1, 0, 2))
+        self.assertEqual(list(load_manifest(os.path.join(self.dir, "manifest.json"))),
+                         ["234567_ITP1_1_B.py"])
+
+if __name__ == "__main__":
+    unittest.main()
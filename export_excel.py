@@ -9,24 +9,39 @@
 Excel用のタブ区切りTSVファイルとして出力します。
 各行は「学籍番号 氏名 問題1スコア 問題1提出日時 問題2スコア...」という形式です。
 日時は「2025/4/22 14:23:45」のような読みやすい形式で出力されます。
+出力ファイルの拡張子が.xlsx（または--format xlsx）の場合は、日時を
+Excelの日時セルとして持つ.xlsxファイルを一定のメモリで直接出力します。
 """
 
-import csv
-from datetime import datetime
 import argparse
+import os
+from typing import List, Optional
 
-def convert_timestamp(ms: int) -> str:
+from metrics import add_metrics_arguments, get_metrics, write_metrics_from_args
+from roster import Roster
+from roster_snapshot import load_report_roster
+from timestamps import convert_timestamp, excel_serial
+from xlsx_writer import DateCell, XlsxWriter
+
+# 出力形式
+FORMAT_TSV = "tsv"
+FORMAT_XLSX = "xlsx"
+
+# .xlsxの列幅
+NAME_WIDTH = 16
+DATE_WIDTH = 20
+
+def get_header_cells(problems: list) -> List[str]:
     """
-    UNIXタイムスタンプ（ミリ秒）を読みやすい日時文字列に変換
+    ヘッダー行の各セルを生成
 
-    @param ms UNIXタイムスタンプ（ミリ秒）
-    @return 「YYYY/MM/DD HH:MM:SS」形式の文字列
+    @param problems 問題IDのリスト
+    @return ヘッダーのセルのリスト
     """
-    try:
-        dt = datetime.fromtimestamp(int(ms)/1000)
-        return dt.strftime('%Y/%m/%d %H:%M:%S')
-    except (ValueError, TypeError, OSError):
-        return "未提出"
+    header = ["学籍番号", "氏名"]
+    for pid in problems:
+        header.extend([f"{pid}得点", f"{pid}提出日時"])
+    return header
 
 def get_header_row(problems: list) -> str:
     """
@@ -35,95 +50,167 @@ def get_header_row(problems: list) -> str:
     @param problems 問題IDのリスト
     @return タブ区切りのヘッダー行
     """
-    header = ["学籍番号", "氏名"]
-    for pid in problems:
-        header.extend([f"{pid}得点", f"{pid}提出日時"])
-    return "\t".join(header)
+    return "\t".join(get_header_cells(problems))
 
-def format_user_data(user: list, problems: list) -> str:
+def format_student_data(roster: Roster, student_index: int) -> str:
     """
     1ユーザーの情報を整形
 
-    @param user user.csvの1行（学籍番号,姓,名,ユーザーID,データ...）
-    @param problems 問題IDのリスト
+    @param roster 学生一覧と提出記録
+    @param student_index 学生の位置
     @return タブ区切りの1行データ
     """
     # 基本情報
-    student_id = user[0]
-    name = f"{user[1]} {user[2]}"
-    result = [student_id, name]
+    student = roster.students[student_index]
+    result = [student.student_id, f"{student.surname} {student.name}"]
 
     # 各問題のスコアと提出日時
-    data_fields = user[4:]  # スコア・提出日時・judgeIdのデータ部分
-    for i in range(len(problems)):
-        base_idx = i * 3  # 1問題につき3列（スコア・提出日時・judgeId）
-        if base_idx + 1 >= len(data_fields):
-            # データが足りない場合
-            result.extend(["0", "未提出"])
-            continue
-
-        score = data_fields[base_idx]
-        timestamp = data_fields[base_idx + 1]
-
+    sl = roster.row_slice(student_index)
+    for score, timestamp in zip(roster.scores[sl], roster.dates[sl]):
         # スコアが0または不正な値の場合
-        try:
-            score_int = int(score)
-            if score_int <= 0:
-                result.extend(["0", "未提出"])
-                continue
-        except (ValueError, TypeError):
+        if score <= 0:
             result.extend(["0", "未提出"])
             continue
 
         # 正常な提出の場合
-        result.append(score)
+        result.append(str(score))
         result.append(convert_timestamp(timestamp))
 
     return "\t".join(result)
 
+def student_cells(roster: Roster, student_index: int) -> list:
+    """
+    1ユーザーの情報を.xlsxのセルとして整形（提出日時は日時セル）
+
+    @param roster 学生一覧と提出記録
+    @param student_index 学生の位置
+    @return セルの値のリスト
+    """
+    student = roster.students[student_index]
+    result = [student.student_id, f"{student.surname} {student.name}"]
+
+    sl = roster.row_slice(student_index)
+    for score, timestamp in zip(roster.scores[sl], roster.dates[sl]):
+        if score <= 0:
+            result.extend([0, "未提出"])
+        else:
+            result.extend([score, DateCell(excel_serial(timestamp))])
+    return result
+
+def write_xlsx(roster: Roster, output_file: str):
+    """
+    .xlsxファイルとして1行ずつ出力する
+
+    @param roster 学生一覧と提出記録
+    @param output_file 出力ファイル名
+    """
+    widths = {1: NAME_WIDTH}
+    widths.update({3 + 2 * i: DATE_WIDTH for i in range(len(roster.problems))})
+    with XlsxWriter(output_file, "scores", widths) as writer:
+        writer.write_row(get_header_cells(roster.problems))
+        for s in range(len(roster.students)):
+            writer.write_row(student_cells(roster, s))
+
+def write_report(roster: Roster, output_file: str, output_format: Optional[str] = None):
+    """
+    読み込み済みのデータをTSV（または.xlsx）で出力
+
+    @param roster 学生一覧と提出記録
+    @param output_file 出力ファイル名
+    @param output_format 出力形式（tsv/xlsx、省略時は出力ファイルの拡張子で判断）
+    """
+    if output_format is None:
+        is_xlsx = os.path.splitext(output_file)[1].lower() == ".xlsx"
+        output_format = FORMAT_XLSX if is_xlsx else FORMAT_TSV
+    if output_format == FORMAT_XLSX:
+        write_xlsx(roster, output_file)
+        return
+
+    # TSV形式で出力
+    with open(output_file, "w", encoding="utf-8") as f:
+        # ヘッダー行
+        f.write(get_header_row(roster.problems) + "\n")
+        # データ行
+        for s in range(len(roster.students)):
+            f.write(format_student_data(roster, s) + "\n")
+
 def export_as_excel(input_file: str = "user.csv", 
                    problems_file: str = "prob.csv",
-                   output_file: str = "scores_for_excel.tsv") -> None:
+                   output_file: str = "scores_for_excel.tsv",
+                   db: Optional[str] = None,
+                   output_format: Optional[str] = None,
+                   roster: Optional[Roster] = None,
+                   snapshot: bool = True) -> Optional[Roster]:
     """
-    user.csvのデータをExcel用のタブ区切り形式で出力
+    user.csvのデータをExcel用のタブ区切り形式（または.xlsx）で出力
 
     @param input_file 入力ファイル（user.csv）
     @param problems_file 問題定義ファイル（prob.csv）
     @param output_file 出力ファイル名
+    @param db 入力ファイルの代わりに読み込むSQLiteデータベース
+    @param output_format 出力形式（tsv/xlsx、省略時は出力ファイルの拡張子で判断）
+    @param roster 読み込み済みのデータ（省略時は入力ファイルから読み込む）
+    @param snapshot 入力ファイルの解析結果のスナップショット（roster_snapshot.py）を使用するか
+    @return 出力したデータ（読み込みに失敗した場合はNone）
     """
+    metrics = get_metrics()
     try:
-        # 問題ID一覧を読み込み
-        with open(problems_file, "r", newline="") as f:
-            problems = next(csv.reader(f))
-
-        # ユーザーデータを読み込み
-        with open(input_file, "r", newline="") as f:
-            users = list(csv.reader(f))
-
-        # TSV形式で出力
-        with open(output_file, "w", encoding="utf-8") as f:
-            # ヘッダー行
-            f.write(get_header_row(problems) + "\n")
-            # データ行
-            for user in users:
-                f.write(format_user_data(user, problems) + "\n")
+        # 問題ID一覧とユーザーデータを読み込み
+        if roster is None:
+            with metrics.phase("load"):
+                roster = load_report_roster(input_file, problems_file, db, snapshot)
+
+        with metrics.phase("write"):
+            write_report(roster, output_file, output_format)
 
         print(f"{output_file} を作成しました。")
 
     except Exception as e:
         print(f"エラー: ファイルの処理中にエラーが発生しました - {str(e)}")
+    return roster
 
-def main():
-    parser = argparse.ArgumentParser(description="スコアと提出日時をExcel用のタブ区切り形式で出力")
+def add_arguments(parser: argparse.ArgumentParser):
+    """
+    レポート出力の引数を追加する
+
+    @param parser 引数パーサー
+    """
     parser.add_argument("-i", "--input", default="user.csv",
                       help="入力ファイル（デフォルト: user.csv）")
     parser.add_argument("-p", "--problems", default="prob.csv",
                       help="問題定義ファイル（デフォルト: prob.csv）")
-    parser.add_argument("-o", "--output", default="scores_for_excel.tsv",
-                      help="出力ファイル（デフォルト: scores_for_excel.tsv）")
+    parser.add_argument("-o", "--output",
+                      help="出力ファイル（デフォルト: scores_for_excel.tsv、xlsx形式ではscores_for_excel.xlsx）")
+    parser.add_argument("--format", choices=[FORMAT_TSV, FORMAT_XLSX],
+                      help="出力形式（デフォルト: 出力ファイルの拡張子から判断、指定がなければtsv）")
+    parser.add_argument("--db",
+                      help="入力ファイルの代わりに読み込むSQLiteデータベース")
+    parser.add_argument("--no-snapshot", dest="snapshot", action="store_false",
+                      help="入力ファイルの解析結果のスナップショット（user.csv.snapshot）を使用しない")
+
+def run_export(args: argparse.Namespace, roster: Optional[Roster] = None) -> Optional[Roster]:
+    """
+    コマンドライン引数に従ってレポートを出力する
+
+    @param args コマンドライン引数（add_argumentsの引数）
+    @param roster 読み込み済みのデータ（省略時は入力ファイルから読み込む）
+    @return 出力したデータ
+    """
+    output = args.output
+    if output is None:
+        output = "scores_for_excel.xlsx" if args.format == FORMAT_XLSX else "scores_for_excel.tsv"
+    return export_as_excel(args.input, args.problems, output, args.db, args.format, roster,
+                           args.snapshot)
+
+def main():
+    parser = argparse.ArgumentParser(description="スコアと提出日時をExcel用のタブ区切り形式で出力")
+    add_arguments(parser)
+    add_metrics_arguments(parser)
     args = parser.parse_args()
 
-    export_as_excel(args.input, args.problems, args.output)
+    get_metrics().script = "export_excel"
+    run_export(args)
+    write_metrics_from_args(args)
 
 if __name__ == "__main__":
     main()
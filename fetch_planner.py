@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file fetch_planner.py
+@brief 提出状況の取得計画（check_submission.py --freeze-solved / --plan）
+
+満点（100点）を記録済みの(学生, 問題)の組は、それ以上スコアが上がらないため取得を省略できます
+（固定）。ただし満点の再提出で提出日時・judgeIdが新しくなる場合があるため、
+前回の全件確認から一定日数が経過した実行では固定せずに全件を確認します。
+取得する組の数・リクエスト数・所要時間の推定値を求め、--planでは取得せずに表示します。
+"""
+
+import json
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from backup_store import atomic_write_bytes
+from roster import Roster
+
+# 満点（これ以上スコアが上がらない値）
+MAX_SCORE = 100
+
+# 前回の全件確認の時刻を保存するファイル
+PLAN_STATE_FILE = "plan_state.json"
+
+# 全件確認の間隔（日）
+DEFAULT_VERIFY_DAYS = 7.0
+
+# 所要時間の推定に使う1リクエストあたりの応答時間（秒）
+DEFAULT_LATENCY = 0.3
+
+def frozen_pairs(roster: Roster) -> Dict[Tuple[str, str], Tuple[int, int, int]]:
+    """
+    満点を記録済みで取得を省略できる組を求める
+
+    @param roster 学生一覧と提出記録
+    @return (ユーザーID, 問題ID)ごとの現在の(スコア, 提出日時, judgeId)
+    """
+    frozen = {}
+    for s, p, score, date, judge_id in roster.iter_cells():
+        if score >= MAX_SCORE:
+            frozen[(roster.students[s].user_id, roster.problems[p])] = (score, date, judge_id)
+    return frozen
+
+def estimate_seconds(requests: int, workers: int, rate: float, max_rate: float,
+                     latency: float = DEFAULT_LATENCY) -> float:
+    """
+    リクエストの所要時間を推定する。
+    レートはrateから1秒ごとに1件/秒ずつmax_rateまで上がり（rate_limiter.pyと同じ）、
+    並列数workersでは1秒あたりworkers/latency件を超えないものとする。
+
+    @param requests リクエスト数
+    @param workers 並列実行数
+    @param rate 初期リクエストレート（件/秒）
+    @param max_rate 最高リクエストレート（件/秒）
+    @param latency 1リクエストあたりの応答時間（秒）
+    @return 推定所要時間（秒）
+    @throws ValueError レート・応答時間が正の値でない場合
+    """
+    if rate <= 0 or max_rate <= 0 or latency <= 0:
+        raise ValueError("レートと応答時間は正の値を指定してください")
+    limit = max(workers, 1) / latency
+    seconds = 0.0
+    remaining = float(requests)
+    current = min(rate, max_rate)
+    while remaining > 0:
+        per_second = min(current, limit)
+        if per_second >= remaining:
+            return seconds + remaining / per_second
+        remaining -= per_second
+        seconds += 1.0
+        current = min(current + 1.0, max_rate)
+    return seconds
+
+class FetchPlan:
+    """1回の実行で取得する組とリクエスト数"""
+
+    def __init__(self, total_pairs: int, pending_pairs: int, pending_users: int,
+                 skip: Dict[Tuple[str, str], Tuple[int, int, int]], per_user: bool,
+                 full_verify: bool = False):
+        """
+        @param total_pairs 全ての組の数
+        @param pending_pairs 取得する組の数
+        @param pending_users 取得する組を含むユーザー数
+        @param skip 取得を省略する組と、その値として使う(スコア, 提出日時, judgeId)
+        @param per_user ユーザー単位で取得するか（取得方法userまたは増分取得）
+        @param full_verify 固定せずに全件を確認する実行か（--freeze-solved指定時）
+        """
+        self.total_pairs = total_pairs
+        self.pending_pairs = pending_pairs
+        self.pending_users = pending_users
+        self.skip = skip
+        self.per_user = per_user
+        self.full_verify = full_verify
+
+    @property
+    def requests(self) -> int:
+        """リクエスト数（ユーザー単位の取得は1ユーザー1ページとして数える）"""
+        return self.pending_users if self.per_user else self.pending_pairs
+
+    def describe(self, workers: int, rate: float, max_rate: float) -> str:
+        """
+        計画を表示用の文字列にする
+
+        @param workers 並列実行数
+        @param rate 初期リクエストレート（件/秒）
+        @param max_rate 最高リクエストレート（件/秒）
+        @return 表示用の文字列
+        """
+        seconds = estimate_seconds(self.requests, workers, rate, max_rate)
+        unit = "ユーザー単位" if self.per_user else "組ごと"
+        text = (f"取得計画: {self.pending_pairs}/{self.total_pairs}組を{unit}に取得"
+                f"（省略 {self.total_pairs - self.pending_pairs}組）, "
+                f"リクエスト {self.requests}件, 推定時間 {seconds:.1f}秒")
+        if self.full_verify:
+            text += "\n全件確認の時期のため、満点の組も確認します。"
+        return text
+
+def load_last_verified(path: str = PLAN_STATE_FILE) -> Optional[float]:
+    """
+    前回の全件確認の時刻を読み込む
+
+    @param path 状態ファイルのパス
+    @return UNIX時刻（秒、記録がなければNone）
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return float(json.load(f)["verified"])
+    except (ValueError, KeyError, TypeError, OSError) as e:
+        print(f"警告: {path}を読み込めませんでした - {e}")
+        return None
+
+def save_last_verified(path: str = PLAN_STATE_FILE, when: Optional[float] = None):
+    """
+    全件確認の時刻を保存する
+
+    @param path 状態ファイルのパス
+    @param when UNIX時刻（秒、省略時は現在時刻）
+    """
+    data = {"verified": time.time() if when is None else when}
+    atomic_write_bytes(path, json.dumps(data).encode("utf-8"))
+
+def verify_due(path: str = PLAN_STATE_FILE, days: float = DEFAULT_VERIFY_DAYS,
+               now: Optional[float] = None) -> bool:
+    """
+    全件確認が必要か（記録がない場合、または前回からdays日以上経過した場合）
+
+    @param path 状態ファイルのパス
+    @param days 全件確認の間隔（日、0以下なら全件確認しない）
+    @param now 現在時刻（省略時は現在時刻）
+    @return 全件確認が必要ならTrue
+    """
+    if days <= 0:
+        return False
+    last = load_last_verified(path)
+    if last is None:
+        return True
+    return (time.time() if now is None else now) - last >= days * 86400
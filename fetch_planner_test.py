@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file fetch_planner_test.py
+@brief fetch_planner.pyのテストコード
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from check_submission import STRATEGY_PAIR, plan_fetch, update_roster
+from fetch_planner import estimate_seconds, frozen_pairs, save_last_verified, verify_due
+from roster import Roster
+
+PROBS = ["ITP1_1_A", "ITP1_1_B", "ITP1_1_C"]
+
+class TestFetchPlanner(unittest.TestCase):
+    def setUp(self):
+        # test1は全問題、test2は1問だけ満点
+        self.rows = [
+            ["123456", "テスト", "太郎", "test1", "100", "1683936000000", "1",
+             "100", "1683936100000", "2", "100", "1683936200000", "3"],
+            ["234567", "テスト", "花子", "test2", "100", "1683936000000", "4",
+             "50", "1683936100000", "5"],
+        ]
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_freeze_solved_skips_full_score_pairs(self):
+        """満点の組を取得せず、値を変えないことのテスト"""
+        roster = Roster.from_rows(self.rows, PROBS)
+        skip = frozen_pairs(roster)
+        self.assertEqual(len(skip), 4)
+
+        plan = plan_fetch(roster, STRATEGY_PAIR, skip=skip)
+        self.assertEqual((plan.total_pairs, plan.pending_pairs, plan.pending_users), (6, 2, 1))
+        self.assertEqual(plan.requests, 2)
+
+        before = roster.to_rows()
+        with mock.patch("check_submission.fetch_max_info",
+                        return_value=(100, 1683936900000, 9)) as fetch, \
+                mock.patch("builtins.print"):
+            problem_updates, _ = update_roster(roster, strategy=STRATEGY_PAIR, skip=skip)
+        self.assertEqual(sorted(c.args[:2] for c in fetch.call_args_list),
+                         [("test2", "ITP1_1_B"), ("test2", "ITP1_1_C")])
+        self.assertEqual(roster.to_rows()[0], before[0])
+        self.assertEqual(problem_updates, {"ITP1_1_B": ["234567"], "ITP1_1_C": ["234567"]})
+
+    def test_verify_due(self):
+        """記録がない場合と、期間が経過した場合に全件確認することのテスト"""
+        path = os.path.join(self.dir, "plan_state.json")
+        self.assertTrue(verify_due(path, 7))
+        save_last_verified(path, 1000.0)
+        self.assertFalse(verify_due(path, 7, now=1000.0 + 6 * 86400))
+        self.assertTrue(verify_due(path, 7, now=1000.0 + 7 * 86400))
+        self.assertFalse(verify_due(path, 0, now=1e12))
+
+    def test_estimate_seconds(self):
+        """レートの上昇と並列数による上限を考慮した推定のテスト"""
+        # 10件/秒から1秒ごとに1件/秒ずつ上がる
+        self.assertAlmostEqual(estimate_seconds(21, 100, 10, 50, latency=0.01), 2.0)
+        # 1並列・応答0.5秒では2件/秒が上限
+        self.assertAlmostEqual(estimate_seconds(10, 1, 10, 50, latency=0.5), 5.0)
+        self.assertEqual(estimate_seconds(0, 1, 10, 50), 0.0)
+
+    def test_estimate_seconds_invalid(self):
+        """レート・応答時間が0以下の場合は終わらずに待つのではなく例外になることのテスト"""
+        for rate, max_rate, latency in ((0, 50, 0.3), (10, 0, 0.3), (-1, 50, 0.3), (10, 50, 0)):
+            with self.assertRaises(ValueError):
+                estimate_seconds(10, 1, rate, max_rate, latency=latency)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,128 +6,113 @@ AOJ Submission Ranking Generator
 This script reads user submission data from user.csv and problem definitions from prob.csv,
 calculates total score rankings and per-problem submission time rankings,
 and outputs the results as TSV files.
+
+With --incremental, the rankings are kept in a saved state and only the entries
+appended to the change log (changes.jsonl) since the last run are applied, so a
+refresh with few changes does not re-read user.csv or re-sort every ranking.
 """
 
+import argparse
 import csv
 import os
 from datetime import datetime
 
-def convert_timestamp(ms):
-    """
-    Convert UNIX timestamp (milliseconds) to readable date string.
-    @param ms: UNIX timestamp in milliseconds
-    @return: Formatted string in 'YYYY/MM/DD HH:MM:SS' format or '未提出' if invalid
-    """
-    try:
-        dt = datetime.fromtimestamp(int(ms) / 1000)
-        return dt.strftime('%Y/%m/%d %H:%M:%S')
-    except (ValueError, TypeError, OSError):
-        return "未提出"
-
-def read_user_data(filename):
-    """
-    Read user submission data from CSV file.
-    All rows are treated as student data (no header).
-    @param filename: Path to user.csv
-    @return: List of user data rows
-    """
-    users = []
-    with open(filename, 'r', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        for row in reader:
-            users.append(row)
-    return None, users
-
-def read_problem_ids(filename):
-    """
-    Read problem IDs from CSV file.
-    @param filename: Path to prob.csv
-    @return: List of problem IDs
-    """
-    with open(filename, 'r', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        return next(reader)  # First row contains problem IDs
-
-def calculate_total_ranking(users):
-    """
-    Calculate ranking based on total score.
-    Exclude users with total score of 0.
-    For ties, sort by account name alphabetically.
-    @param users: List of user data rows
-    @return: Sorted list of (rank, total_score, account, surname, name)
-    """
-    rankings = []
-    debug_log = []
-    for user in users:
-        account = user[3]  # D列: アカウント
-        surname = user[1]  # B列: 姓
-        name = user[2]     # C列: 名
-        total_score = 0
-        for i in range(4, len(user), 3):  # Score columns start at index 4, step by 3
-            try:
-                score = int(user[i])
-                total_score += score
-            except (ValueError, IndexError):
-                continue
-        if total_score > 0:
-            rankings.append((total_score, account, surname, name))
-            debug_log.append(f"Included: {account} ({surname} {name}), Total Score: {total_score}")
-        else:
-            debug_log.append(f"Excluded: {account} ({surname} {name}), Total Score: {total_score}")
-    
+from change_log import CHANGE_LOG_FILE, log_size, read_changes
+from metrics import add_metrics_arguments, get_metrics, write_metrics_from_args
+from ranking_state import STATE_FILE, RankingState, load_state
+from roster import load_problems
+from roster_snapshot import load_report_roster, source_stamp, verify_stamp
+from timestamps import convert_timestamps
+
+def competition_ranks(values):
+    """
+    Assign competition ranks ("1, 1, 3") to an already sorted sequence.
+    @param values: Sort keys in ranking order; equal neighbours share a rank
+    @return: List of ranks
+    """
+    ranks = []
+    previous = object()
+    rank = 0
+    for i, value in enumerate(values, 1):
+        if value != previous:
+            rank = i
+            previous = value
+        ranks.append(rank)
+    return ranks
+
+def calculate_rankings(roster):
+    """
+    Calculate the total ranking and every per-problem ranking in one batched pass
+    over the roster's score and timestamp matrices.
+    Total ranking: users with total score 0 are excluded; sorted by total score
+    descending, ties broken by account name, equal scores share a rank.
+    Problem ranking: users who haven't submitted (score=0 or invalid timestamp)
+    are excluded; sorted by submission time ascending.
+    @param roster: Roster holding students and their score matrix
+    @return: (total, problems, totals) where total is a list of
+             (rank, total_score, account, surname, name), problems is a list per
+             problem of (rank, submission_time_str, account, surname, name), and
+             totals is every student's total score in roster order
+    """
+    students = roster.students
+    prob_count = len(roster.problems)
+    scores = roster.scores
+    dates = roster.dates
+    keys = [(st.user_id, st.surname, st.name) for st in students]
+    accounts = [st.user_id for st in students]
+    surnames = [st.surname for st in students]
+    names = [st.name for st in students]
+
+    # Row sums of the score matrix
+    if prob_count:
+        totals = [sum(scores[k:k + prob_count]) for k in range(0, len(scores), prob_count)]
+    else:
+        totals = [0] * len(students)
+
     # Sort by total score descending, then by account name ascending for ties
-    rankings.sort(key=lambda x: (-x[0], x[1]))
-    result = []
-    current_rank = 1
-    current_score = None
-    for i, (score, account, surname, name) in enumerate(rankings):
-        if current_score is None or score != current_score:
-            current_rank = i + 1
-            current_score = score
-        result.append((current_rank, score, account, surname, name))
-    
-    # Write debug log
-    os.makedirs('rankings', exist_ok=True)
-    with open('rankings/debug_log_total_ranking.txt', 'w', encoding='utf-8') as f:
+    order = sorted((s for s, total in enumerate(totals) if total > 0),
+                   key=lambda s: (-totals[s], accounts[s]))
+    ranks = competition_ranks([totals[s] for s in order])
+    total = [(rank, totals[s]) + keys[s] for rank, s in zip(ranks, order)]
+
+    # Students sorted once by account/surname/name; a stable sort by timestamp
+    # per problem then breaks ties exactly like sorting (timestamp, key) tuples
+    key_order = sorted(range(len(students)), key=keys.__getitem__)
+
+    # Per-problem columns are strided slices of the matrices
+    problems = []
+    for p in range(prob_count):
+        col_scores = scores[p::prob_count]
+        col_dates = dates[p::prob_count]
+        order = [s for s in key_order if col_scores[s] > 0 and col_dates[s] > 0]
+        order.sort(key=col_dates.__getitem__)
+        time_strs = convert_timestamps([col_dates[s] for s in order])
+        problems.append(list(zip(range(1, len(order) + 1), time_strs,
+                                 map(accounts.__getitem__, order),
+                                 map(surnames.__getitem__, order),
+                                 map(names.__getitem__, order))))
+
+    return total, problems, totals
+
+def write_total_debug_log(roster, totals, total_ranking, output_dir='rankings'):
+    """
+    Write the inclusion decisions and final total ranking to a debug log.
+    @param roster: Roster holding students
+    @param totals: Total score of every student in roster order
+    @param total_ranking: Result of calculate_rankings
+    @param output_dir: Directory for the log file
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    with open(f'{output_dir}/debug_log_total_ranking.txt', 'w', encoding='utf-8') as f:
         f.write("Total Ranking Debug Log\n")
         f.write("=======================\n")
-        for log_entry in debug_log:
-            f.write(log_entry + "\n")
+        for student, total_score in zip(roster.students, totals):
+            status = "Included" if total_score > 0 else "Excluded"
+            f.write(f"{status}: {student.user_id} ({student.surname} {student.name}), "
+                    f"Total Score: {total_score}\n")
         f.write("\nFinal Rankings:\n")
-        for entry in result:
+        for entry in total_ranking:
             f.write(f"Rank {entry[0]}: {entry[2]} ({entry[3]} {entry[4]}), Score: {entry[1]}\n")
-    
-    return result
-
-def calculate_problem_ranking(users, problem_index, problem_id):
-    """
-    Calculate ranking for a specific problem based on submission time.
-    Exclude users who haven't submitted (score=0 or invalid timestamp).
-    @param users: List of user data rows
-    @param problem_index: Index of the problem in prob.csv list
-    @param problem_id: Problem ID for naming
-    @return: Sorted list of (rank, submission_time_str, account, surname, name)
-    """
-    base_index = 4 + problem_index * 3  # Start index of problem data in user.csv
-    rankings = []
-    for user in users:
-        account = user[3]
-        surname = user[1]
-        name = user[2]
-        try:
-            score = int(user[base_index])  # Score
-            timestamp = int(user[base_index + 1])  # Submission timestamp
-            if score > 0 and timestamp > 0:
-                time_str = convert_timestamp(timestamp)
-                rankings.append((timestamp, time_str, account, surname, name))
-        except (ValueError, IndexError):
-            continue
-    
-    rankings.sort()  # Sort by timestamp ascending
-    result = []
-    for rank, (_, time_str, account, surname, name) in enumerate(rankings, 1):
-        result.append((rank, time_str, account, surname, name))
-    return result
 
 def write_tsv(filename, header, data):
     """
@@ -143,27 +128,210 @@ def write_tsv(filename, header, data):
         for row in data:
             writer.writerow(row)
 
-def main():
-    """Main function to generate rankings."""
+def state_rankings(state, problem_indices=None):
+    """
+    Build ranking rows from an incremental ranking state.
+    @param state: RankingState holding the sorted orders
+    @param problem_indices: Positions of the problems to build (defaults to all)
+    @return: (total, problems) in the same row format as calculate_rankings, where
+             problems is a list of (problem_index, rows)
+    """
+    students = state.students
+    totals = state.totals
+    order = state.total_order
+    ranks = competition_ranks([totals[s] for s in order])
+    total = [(rank, totals[s], students[s].user_id, students[s].surname, students[s].name)
+             for rank, s in zip(ranks, order)]
+
+    if problem_indices is None:
+        problem_indices = range(len(state.problems))
+    problems = []
+    for p in sorted(problem_indices):
+        order = state.problem_orders[p]
+        time_strs = convert_timestamps(state.problem_dates(p))
+        problems.append((p, [(rank, time_str, students[s].user_id, students[s].surname,
+                              students[s].name)
+                             for rank, time_str, s in zip(range(1, len(order) + 1), time_strs, order)]))
+    return total, problems
+
+def write_outputs(roster, totals, total_ranking, problem_rankings, output_dir, timestamp):
+    """
+    Write the debug log, the total ranking and the given per-problem rankings.
+    @param roster: Roster (or RankingState) holding students
+    @param totals: Total score of every student in roster order
+    @param total_ranking: Total ranking rows, or None to leave the files as they are
+    @param problem_rankings: List of (problem_id, rows) to write
+    @param output_dir: Directory for the output files
+    @param timestamp: Date suffix of the file names (YYYYMMDD)
+    """
+    if total_ranking is not None:
+        write_total_debug_log(roster, totals, total_ranking, output_dir)
+
+        # Output total ranking
+        total_header = ['順位', '全得点', 'AIZU ID', '姓', '名']
+        write_tsv(f'{output_dir}/total_ranking_{timestamp}.tsv', total_header, total_ranking)
+
+    # Output ranking for each problem
+    for problem_id, problem_ranking in problem_rankings:
+        problem_header = ['順位', problem_id, 'AIZU ID', '姓', '名']
+        write_tsv(f'{output_dir}/{problem_id}_ranking_{timestamp}.tsv', problem_header, problem_ranking)
+
+def write_rankings(roster, output_dir='rankings', timestamp=None):
+    """
+    Calculate every ranking and write the debug log and TSV files.
+    @param roster: Roster holding students and their score matrix
+    @param output_dir: Directory for the output files
+    @param timestamp: Date suffix of the file names (defaults to today, YYYYMMDD)
+    """
+    metrics = get_metrics()
+    timestamp = timestamp or datetime.now().strftime('%Y%m%d')
+
+    # Calculate every ranking in one pass
+    with metrics.phase("rank"):
+        total_ranking, problem_rankings, totals = calculate_rankings(roster)
+
+    with metrics.phase("write"):
+        write_outputs(roster, totals, total_ranking, zip(roster.problems, problem_rankings),
+                      output_dir, timestamp)
+
+def update_rankings(user_file='user.csv', prob_file='prob.csv', db=None, output_dir='rankings',
+                    state_file=STATE_FILE, change_log=CHANGE_LOG_FILE, rebuild=False,
+                    timestamp=None, snapshot=True):
+    """
+    Bring the saved ranking state up to date with the change log and rewrite only
+    the rankings that changed. The state is rebuilt from user.csv (or the database)
+    when it is missing, the problem set changed, the log was truncated, the log
+    contains a reset or an entry for an unknown student, or user.csv no longer
+    matches the last save recorded in the log (e.g. after a restore or a manual edit).
+    @param user_file: Path of user.csv
+    @param prob_file: Path of prob.csv
+    @param db: SQLite database to read instead of user.csv on a rebuild
+    @param output_dir: Directory for the output files
+    @param state_file: Path of the saved ranking state
+    @param change_log: Path of the change log appended by check_submission.py
+    @param rebuild: Rebuild the state even if it is up to date
+    @param timestamp: Date suffix of the file names (defaults to today, YYYYMMDD)
+    @param snapshot: Use the parsed snapshot of user.csv (see roster_snapshot.py)
+    @return: (number of log entries applied, whether the state was rebuilt)
+    """
+    metrics = get_metrics()
+    timestamp = timestamp or datetime.now().strftime('%Y%m%d')
+
+    with metrics.phase("load"):
+        problems = load_problems(prob_file)
+        state = None if rebuild else load_state(state_file)
+        if state is not None and (state.problems != problems
+                                  or state.log_offset > log_size(change_log)):
+            state = None
+
+    applied = 0
+    with metrics.phase("rank"):
+        if state is not None:
+            entries, offset = read_changes(change_log, state.log_offset)
+            for entry in entries:
+                if not state.apply(entry):
+                    state = None
+                    break
+                if "source" not in entry:
+                    applied += 1
+            if state is not None:
+                state.log_offset = offset
+        if state is not None and not db:
+            # user.csv must still be the file the state was built from or last logged
+            source = verify_stamp(user_file, state.source) if state.source else None
+            if source is None:
+                state = None
+            else:
+                state.source = source
+
+    rebuilt = state is None
+    if rebuilt:
+        # user.csv is saved before its changes are logged, so it already
+        # reflects every entry up to the current end of the log
+        offset = log_size(change_log)
+        with metrics.phase("load"):
+            # Stamped before loading so that a concurrent rewrite forces another rebuild
+            source = None if db else source_stamp(user_file)
+            roster = load_report_roster(user_file, prob_file, db, snapshot)
+        with metrics.phase("rank"):
+            state = RankingState.from_roster(roster, offset)
+            state.source = source
+        applied = 0
+
+    with metrics.phase("write"):
+        if rebuilt or state.written != timestamp:
+            # Every file is (re)written on a rebuild and on the first run of a day
+            total, problem_rows = state_rankings(state)
+        else:
+            total, problem_rows = state_rankings(state, state.changed_problems)
+            if not state.total_changed:
+                total = None
+        write_outputs(state, state.totals, total,
+                      [(state.problems[p], rows) for p, rows in problem_rows],
+                      output_dir, timestamp)
+        state.mark_written(timestamp)
+        state.save(state_file)
+    return applied, rebuilt
+
+def add_arguments(parser):
+    """
+    Add the ranking options to an argument parser.
+    @param parser: argparse.ArgumentParser
+    """
+    parser.add_argument("--db", help="SQLite database to read instead of user.csv")
+    parser.add_argument("--no-snapshot", dest="snapshot", action="store_false",
+                        help="Parse user.csv instead of using its cached snapshot (user.csv.snapshot)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Apply only new change log entries to the saved ranking state")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="With --incremental, rebuild the saved state from user.csv")
+    parser.add_argument("--change-log", default=CHANGE_LOG_FILE,
+                        help=f"Change log written by check_submission.py (default: {CHANGE_LOG_FILE})")
+    parser.add_argument("--state", default=STATE_FILE,
+                        help=f"Saved ranking state (default: {STATE_FILE})")
+
+def run_rankings(args, roster=None):
+    """
+    Generate the rankings as requested by the command line options.
+    @param args: argparse.Namespace with the options of add_arguments
+    @param roster: Already loaded Roster (read from user.csv if omitted)
+    @return: The Roster the rankings were computed from (None with --incremental
+             when no roster was given)
+    """
+    metrics = get_metrics()
     user_file = 'user.csv'
     prob_file = 'prob.csv'
     output_dir = 'rankings'
-    timestamp = datetime.now().strftime('%Y%m%d')
-    
+
+    if args.incremental:
+        applied, rebuilt = update_rankings(user_file, prob_file, args.db, output_dir, args.state,
+                                           args.change_log, args.rebuild,
+                                           snapshot=args.snapshot)
+        if rebuilt:
+            print(f"Rebuilt the ranking state from {args.db or user_file}.")
+        else:
+            print(f"Applied {applied} change log entries.")
+        return roster
+
     # Read data
-    _, users = read_user_data(user_file)
-    problem_ids = read_problem_ids(prob_file)
-    
-    # Calculate and output total ranking
-    total_ranking = calculate_total_ranking(users)
-    total_header = ['順位', '全得点', 'AIZU ID', '姓', '名']
-    write_tsv(f'{output_dir}/total_ranking_{timestamp}.tsv', total_header, total_ranking)
-    
-    # Calculate and output ranking for each problem
-    for idx, problem_id in enumerate(problem_ids):
-        problem_ranking = calculate_problem_ranking(users, idx, problem_id)
-        problem_header = ['順位', problem_id, 'AIZU ID', '姓', '名']
-        write_tsv(f'{output_dir}/{problem_id}_ranking_{timestamp}.tsv', problem_header, problem_ranking)
+    if roster is None:
+        with metrics.phase("load"):
+            roster = load_report_roster(user_file, prob_file, args.db, args.snapshot)
+
+    write_rankings(roster, output_dir)
+    return roster
+
+def main():
+    """Main function to generate rankings."""
+    parser = argparse.ArgumentParser(description="Generate total and per-problem rankings")
+    add_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    metrics = get_metrics()
+    metrics.script = "generate_rankings"
+
+    run_rankings(args)
+    write_metrics_from_args(args, metrics)
 
 if __name__ == '__main__':
     main()
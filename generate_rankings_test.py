@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file generate_rankings_test.py
+@brief generate_rankings.pyのテストコード
+"""
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from change_log import append_changes, make_entry, make_reset_entry, make_source_entry
+from check_submission import is_better
+from generate_rankings import calculate_rankings, state_rankings, update_rankings
+from ranking_state import RankingState, load_state
+from roster import Roster, save_roster
+from timestamps import convert_timestamp
+
+class TestGenerateRankings(unittest.TestCase):
+    def setUp(self):
+        """テスト用のデータを作成"""
+        self.probs = ["ITP1_1_A", "ITP1_1_B"]
+        self.rows = [
+            ["1", "テスト", "太郎", "userc", "100", "1683936200000", "1", "0", "0", "-1"],
+            ["2", "テスト", "花子", "usera", "100", "1683936100000", "2", "0", "0", "-1"],
+            ["3", "テスト", "次郎", "userb", "100", "1683936100000", "3", "100", "1683936000000", "4"],
+            ["4", "テスト", "三郎", "userd", "0", "0", "-1", "0", "0", "-1"],
+        ]
+
+    def test_total_ranking(self):
+        """合計点の降順、同点はアカウント名順で同順位になることのテスト"""
+        total, _, totals = calculate_rankings(Roster.from_rows(self.rows, self.probs))
+        self.assertEqual(totals, [100, 100, 200, 0])
+        self.assertEqual([(r[0], r[1], r[2]) for r in total],
+                         [(1, 200, "userb"), (2, 100, "usera"), (2, 100, "userc")])
+
+    def test_problem_ranking(self):
+        """提出日時の昇順、同時刻はアカウント名順になることのテスト"""
+        _, problems, _ = calculate_rankings(Roster.from_rows(self.rows, self.probs))
+        self.assertEqual([(r[0], r[2]) for r in problems[0]],
+                         [(1, "usera"), (2, "userb"), (3, "userc")])
+        self.assertEqual([r[2] for r in problems[1]], ["userb"])
+        self.assertEqual(problems[1][0][1], convert_timestamp(1683936000000))
+
+class TestIncrementalRankings(unittest.TestCase):
+    def setUp(self):
+        """ランダムな提出記録と一時ディレクトリを作成"""
+        self.dir = tempfile.mkdtemp()
+        self.rnd = random.Random(0)
+        self.probs = ["P1", "P2", "P3"]
+        rows = []
+        for s in range(40):
+            # 同点・同時刻・同じアカウント名を含むように値の範囲を狭くする
+            row = [str(s), "姓", f"名{s % 3}", f"user{s % 15}"]
+            for _ in self.probs:
+                score = self.rnd.choice((0, 50, 100))
+                row += [str(score), str(self.rnd.randrange(1, 5) * 1000 if score else 0), str(s)]
+            rows.append(row)
+        self.roster = Roster.from_rows(rows, self.probs)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def random_changes(self, count):
+        """rosterを改善方向に更新し、変更ログの行を返す"""
+        changes = []
+        for _ in range(count):
+            s = self.rnd.randrange(len(self.roster.students))
+            i = self.rnd.randrange(len(self.probs))
+            current = self.roster.cell(s, i)
+            new = (self.rnd.choice((50, 100)), self.rnd.randrange(1, 8) * 1000, 99)
+            if is_better(new[0], new[1], current[0], current[1]):
+                self.roster.set_cell(s, i, *new)
+                student = self.roster.students[s]
+                changes.append(make_entry(student.student_id, student.user_id,
+                                          self.probs[i], current, new))
+        return changes
+
+    def assert_same_rankings(self, state):
+        total, problems, _ = calculate_rankings(self.roster)
+        state_total, state_problems = state_rankings(state)
+        self.assertEqual(state_total, total)
+        self.assertEqual([rows for _, rows in state_problems], problems)
+
+    def test_apply_matches_full_calculation(self):
+        """差分の反映結果が全体の再計算と一致することのテスト"""
+        state = RankingState.from_roster(self.roster)
+        self.assert_same_rankings(state)
+        for entry in self.random_changes(60):
+            self.assertTrue(state.apply(entry))
+        self.assert_same_rankings(state)
+        # 反映済みの行を再度読んでも値は戻らない
+        old = make_entry("0", "user0", "P1", (0, 0, -1), (50, 1000, 1))
+        self.assertTrue(state.apply(old))
+        self.assert_same_rankings(state)
+        self.assertFalse(state.apply(make_reset_entry()))
+
+    def test_update_rankings(self):
+        """保存した状態に変更ログの差分だけを反映することのテスト"""
+        user_csv = os.path.join(self.dir, "user.csv")
+        prob_csv = os.path.join(self.dir, "prob.csv")
+        log = os.path.join(self.dir, "changes.jsonl")
+        state_file = os.path.join(self.dir, "rankings", "state.json")
+        out = os.path.join(self.dir, "rankings")
+        with open(prob_csv, "w", encoding="utf-8") as f:
+            f.write(",".join(self.probs) + "\n")
+        save_roster(self.roster, user_csv)
+
+        def update():
+            return update_rankings(user_csv, prob_csv, None, out, state_file, log,
+                                   timestamp="20250101")
+
+        self.assertEqual(update(), (0, True))
+        self.assertEqual(update(), (0, False))
+
+        changes = self.random_changes(20)
+        save_roster(self.roster, user_csv)
+        append_changes(log, changes + [make_source_entry(user_csv)])
+        os.remove(os.path.join(out, "total_ranking_20250101.tsv"))
+        self.assertEqual(update(), (len(changes), False))
+        self.assert_same_rankings(load_state(state_file))
+        self.assertTrue(os.path.exists(os.path.join(out, "total_ranking_20250101.tsv")))
+
+        # 更新時刻だけが変わった場合はそのまま、ログに記録されない書き換えは全体を再計算する
+        os.utime(user_csv)
+        self.assertEqual(update(), (0, False))
+        self.random_changes(20)
+        save_roster(self.roster, user_csv)
+        self.assertEqual(update(), (0, True))
+        self.assert_same_rankings(load_state(state_file))
+
+        # resetの行があれば全体を再計算する
+        append_changes(log, [make_reset_entry()])
+        self.assertEqual(update(), (0, True))
+
+if __name__ == "__main__":
+    unittest.main()
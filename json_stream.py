@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file json_stream.py
+@brief JSON配列を受信しながら1要素ずつ取り出すデコーダー（標準ライブラリのみ）
+
+APIの応答（提出記録の配列）を全て受信してリストにする代わりに、受信したチャンクから
+要素を1つずつ復元して返します。呼び出し側は必要な値だけを集計して要素を捨てられるため、
+配列がどれだけ長くてもメモリ使用量は1要素とチャンク1つ分に収まり、
+途中で打ち切れば残りは受信・解析しません。
+"""
+
+import codecs
+import json
+from typing import Any, Iterable, Iterator
+
+# 未解析の部分がこの文字数を超え、解析済みの部分が半分以上になったらバッファを詰める
+COMPACT_SIZE = 1 << 16
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = _WHITESPACE + ",]"
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """
+    JSON配列のバイト列（任意の位置で分割されたチャンク）から要素を順に返す。
+    最上位がnullの場合は要素なしとして扱う。
+
+    @param chunks UTF-8のバイト列のイテラブル
+    @return 配列の要素のイテレータ
+    @throws ValueError JSONの配列として解析できない場合
+    """
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buf = ""
+    pos = 0
+    finished = False
+
+    def more() -> bool:
+        """次のチャンクをバッファに追加する（入力が終われば False）"""
+        nonlocal buf, pos, finished
+        if finished:
+            return False
+        chunk = next(chunks, None)
+        if chunk is None:
+            buf += utf8.decode(b"", final=True)
+            finished = True
+        else:
+            buf += utf8.decode(chunk)
+        if pos > COMPACT_SIZE and pos * 2 > len(buf):
+            buf = buf[pos:]
+            pos = 0
+        return True
+
+    def skip_whitespace() -> str:
+        """空白を読み飛ばして次の文字を返す（入力の終わりなら空文字列）"""
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if not more():
+                return ""
+
+    def close_array():
+        """配列の終わりを読み、後ろに空白以外がないことを確認する"""
+        nonlocal pos
+        pos += 1
+        if skip_whitespace():
+            raise ValueError("JSONの配列の後に余分なデータがあります")
+
+    first = skip_whitespace()
+    if first == "n":
+        while len(buf) - pos < 4 and more():
+            pass
+        if buf[pos:pos + 4] == "null" and not buf[pos + 4:].strip():
+            return
+    if first != "[":
+        raise ValueError("JSONの配列ではありません")
+    pos += 1
+    if skip_whitespace() == "]":
+        close_array()
+        return
+
+    scan = _decoder.scan_once
+    while True:
+        if (pos >= len(buf) or buf[pos] in _WHITESPACE) and not skip_whitespace():
+            raise ValueError("JSONの配列が途中で終わっています")
+        # 要素の途中でバッファが終わっていれば、続きを受信して解析し直す
+        while True:
+            try:
+                value, end = scan(buf, pos)
+            except (StopIteration, json.JSONDecodeError):
+                if more():
+                    continue
+                raise ValueError("JSONの配列の要素を解析できません")
+            # 数値はチャンクの境界で切れていても解析できてしまうため、区切りを受信してから確定する
+            if (end < len(buf) and buf[end] in _DELIMITERS) or finished or not more():
+                break
+        pos = end
+        yield value
+
+        # 要素の直後の「,」はそのまま読み進める（空白や「]」の場合のみ読み飛ばしを行う）
+        if pos < len(buf) and buf[pos] == ",":
+            pos += 1
+            continue
+        delimiter = skip_whitespace()
+        if delimiter == "]":
+            close_array()
+            return
+        if delimiter != ",":
+            raise ValueError("JSONの配列の区切りが不正です")
+        pos += 1
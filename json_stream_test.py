@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file json_stream_test.py
+@brief json_stream.pyのテストコード
+"""
+
+import json
+import unittest
+
+from json_stream import iter_json_array
+
+def split(raw: bytes, size: int):
+    """バイト列をsizeバイトずつのチャンクに分割する"""
+    return [raw[i:i + size] for i in range(0, len(raw), size)]
+
+class TestJsonStream(unittest.TestCase):
+    def test_any_chunk_boundary(self):
+        """チャンクの境界（マルチバイト文字・数値・文字列の途中）によらず同じ要素を返すことのテスト"""
+        data = [{"judgeId": i, "userId": "テスト", "score": i % 101, "memo": "a,]\"b"}
+                for i in range(200)] + [12345, -3.5e3, 0.125, True, None, [], "日本語"]
+        raw = json.dumps(data, ensure_ascii=False, indent=1).encode("utf-8")
+        for size in (1, 2, 3, 7, 64, len(raw)):
+            self.assertEqual(list(iter_json_array(split(raw, size))), data, size)
+
+    def test_empty_and_null(self):
+        """空の配列とnullは要素なしとして扱うことのテスト"""
+        self.assertEqual(list(iter_json_array([b" [ ", b"] "])), [])
+        self.assertEqual(list(iter_json_array([b"nu", b"ll"])), [])
+
+    def test_stops_reading_when_abandoned(self):
+        """途中で打ち切った場合に残りのチャンクを読まないことのテスト"""
+        read = []
+
+        def chunks():
+            for chunk in split(json.dumps(list(range(1000))).encode("utf-8"), 16):
+                read.append(chunk)
+                yield chunk
+
+        for value in iter_json_array(chunks()):
+            if value == 10:
+                break
+        self.assertLess(len(read), 5)
+
+    def test_malformed(self):
+        """配列として解析できない入力でValueErrorを送出することのテスト"""
+        for raw in (b"", b"{}", b"[", b"[1,", b"[1 2]", b"[1,]", b"[1]x", b'["abc'):
+            with self.assertRaises(ValueError, msg=raw):
+                list(iter_json_array(split(raw, 2)))
+
+if __name__ == "__main__":
+    unittest.main()
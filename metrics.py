@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file metrics.py
+@brief 実行時間・APIリクエストの計測と出力
+
+各スクリプトで共有する計測器です。
+- APIリクエストごとの応答時間のヒストグラム、HTTPステータス別の件数、受信バイト数、再試行回数
+- 処理段階（load/fetch/merge/writeなど）ごとの経過時間
+を集計し、JSON、またはnode exporterのtextfileコレクターが読み込める
+Prometheusのテキスト形式で出力します。
+"""
+
+import argparse
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, Optional
+
+from backup_store import atomic_write_bytes, file_mode
+
+# 応答時間のヒストグラムの区切り（秒）
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Prometheusのメトリクス名の接頭辞
+PREFIX = "aoj"
+
+# textfileに必ず付ける読み取り権限（所有者・グループ・その他）
+PROM_READABLE = 0o444
+
+class TimedIterator:
+    """要素を取り出すのにかかった時間を合計するイテレータ"""
+
+    def __init__(self, iterable: Iterable):
+        """
+        @param iterable 元のイテラブル
+        """
+        self.iterator = iter(iterable)
+        self.elapsed = 0.0
+
+    def __iter__(self) -> "TimedIterator":
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            return next(self.iterator)
+        finally:
+            self.elapsed += time.perf_counter() - start
+
+class Metrics:
+    """APIリクエストと処理段階の計測値"""
+
+    def __init__(self, script: str = ""):
+        """
+        @param script 計測対象のスクリプト名（Prometheusのラベルに使用）
+        """
+        self.script = script
+        self.lock = threading.Lock()
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)  # 最後は+Inf
+        self.latency_sum = 0.0
+        self.status_counts: Dict[str, int] = {}
+        self.bytes_received = 0
+        self.retries = 0
+        self.phases: Dict[str, float] = {}
+
+    def observe_request(self, status: str, seconds: float, nbytes: int = 0):
+        """
+        APIリクエスト1回の結果を記録する
+
+        @param status HTTPステータス（接続エラー時は"error"）
+        @param seconds 応答時間（秒）
+        @param nbytes 受信バイト数
+        """
+        index = len(LATENCY_BUCKETS)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                index = i
+                break
+        with self.lock:
+            self.bucket_counts[index] += 1
+            self.latency_sum += seconds
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+            self.bytes_received += nbytes
+
+    def observe_retry(self):
+        """再試行を1回記録する"""
+        with self.lock:
+            self.retries += 1
+
+    def add_phase(self, name: str, seconds: float):
+        """
+        処理段階の経過時間を加算する
+
+        @param name 処理段階の名前
+        @param seconds 経過時間（秒）
+        """
+        with self.lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        withブロックの経過時間を処理段階として記録する
+
+        @param name 処理段階の名前
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - start)
+
+    def requests(self) -> int:
+        """記録したリクエスト数"""
+        with self.lock:
+            return sum(self.bucket_counts)
+
+    def to_dict(self) -> Dict:
+        """
+        計測値を辞書として返す
+
+        @return JSONに変換できる辞書
+        """
+        with self.lock:
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip(list(LATENCY_BUCKETS) + ["+Inf"], self.bucket_counts):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            return {
+                "script": self.script,
+                "requests": {
+                    "count": cumulative,
+                    "latency_seconds_sum": round(self.latency_sum, 6),
+                    "latency_seconds_buckets": buckets,
+                    "status": dict(sorted(self.status_counts.items())),
+                    "bytes_received": self.bytes_received,
+                    "retries": self.retries,
+                },
+                "phases_seconds": {k: round(v, 6) for k, v in self.phases.items()},
+            }
+
+    def to_prometheus(self) -> str:
+        """
+        計測値をPrometheusのテキスト形式で返す
+
+        @return テキスト形式のメトリクス
+        """
+        data = self.to_dict()
+        req = data["requests"]
+        script = f'script="{self.script}"'
+        lines = [
+            f"# HELP {PREFIX}_request_duration_seconds AOJ APIの応答時間",
+            f"# TYPE {PREFIX}_request_duration_seconds histogram",
+        ]
+        for bound, count in req["latency_seconds_buckets"].items():
+            lines.append(f'{PREFIX}_request_duration_seconds_bucket{{{script},le="{bound}"}} {count}')
+        lines.append(f"{PREFIX}_request_duration_seconds_sum{{{script}}} {req['latency_seconds_sum']}")
+        lines.append(f"{PREFIX}_request_duration_seconds_count{{{script}}} {req['count']}")
+
+        lines.append(f"# HELP {PREFIX}_requests_total HTTPステータス別のAOJ APIリクエスト数")
+        lines.append(f"# TYPE {PREFIX}_requests_total counter")
+        for status, count in req["status"].items():
+            lines.append(f'{PREFIX}_requests_total{{{script},status="{status}"}} {count}')
+
+        lines.append(f"# HELP {PREFIX}_response_bytes_total AOJ APIからの受信バイト数")
+        lines.append(f"# TYPE {PREFIX}_response_bytes_total counter")
+        lines.append(f"{PREFIX}_response_bytes_total{{{script}}} {req['bytes_received']}")
+
+        lines.append(f"# HELP {PREFIX}_retries_total AOJ APIリクエストの再試行回数")
+        lines.append(f"# TYPE {PREFIX}_retries_total counter")
+        lines.append(f"{PREFIX}_retries_total{{{script}}} {req['retries']}")
+
+        lines.append(f"# HELP {PREFIX}_phase_seconds 処理段階ごとの経過時間")
+        lines.append(f"# TYPE {PREFIX}_phase_seconds gauge")
+        for name, seconds in data["phases_seconds"].items():
+            lines.append(f'{PREFIX}_phase_seconds{{{script},phase="{name}"}} {seconds}')
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path: str):
+        """
+        計測値をJSONファイルに書き込む
+
+        @param path 出力ファイル
+        """
+        data = json.dumps(self.to_dict(), ensure_ascii=False, indent=1)
+        atomic_write_bytes(path, data.encode("utf-8"))
+
+    def write_prometheus(self, path: str):
+        """
+        計測値をPrometheusのtextfile（.prom）に書き込む
+        （収集中に読まれても壊れないよう一時ファイル経由で置き換える）。
+        別のユーザーで動くnode_exporterが読めるよう、誰でも読み取れるパーミッションにする。
+
+        @param path 出力ファイル
+        """
+        atomic_write_bytes(path, self.to_prometheus().encode("utf-8"),
+                           mode=file_mode(path) | PROM_READABLE)
+
+    def print_summary(self):
+        """処理段階ごとの経過時間とリクエストの概要を表示する"""
+        data = self.to_dict()
+        req = data["requests"]
+        phases = ", ".join(f"{k} {v:.2f}秒" for k, v in data["phases_seconds"].items())
+        print(f"処理時間: {phases}")
+        if req["count"]:
+            status = ", ".join(f"{k}: {v}件" for k, v in req["status"].items())
+            print(f"APIリクエスト: {req['count']}件 ({status}), 平均応答時間 "
+                  f"{req['latency_seconds_sum'] / req['count']:.3f}秒, "
+                  f"受信 {req['bytes_received']}バイト, 再試行 {req['retries']}回")
+
+_metrics = Metrics()
+
+def get_metrics() -> Metrics:
+    """
+    プロセス内で共有する計測器を返す
+
+    @return Metrics
+    """
+    return _metrics
+
+def add_metrics_arguments(parser: argparse.ArgumentParser):
+    """
+    計測値の出力関連のコマンドライン引数を追加する
+
+    @param parser 引数パーサー
+    """
+    parser.add_argument("--metrics-json", metavar="PATH",
+                        help="計測値をJSONで出力するファイル")
+    parser.add_argument("--metrics-prom", metavar="PATH",
+                        help="計測値をPrometheusのtextfile形式で出力するファイル（*.prom）")
+
+def write_metrics_from_args(args: argparse.Namespace, metrics: Optional[Metrics] = None):
+    """
+    コマンドライン引数で指定されたファイルに計測値を出力する
+
+    @param args add_metrics_argumentsで追加した引数を含む解析結果
+    @param metrics 出力する計測器（省略時は共有の計測器）
+    """
+    metrics = metrics or get_metrics()
+    if args.metrics_json:
+        metrics.write_json(args.metrics_json)
+    if args.metrics_prom:
+        metrics.write_prometheus(args.metrics_prom)
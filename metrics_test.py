@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file metrics_test.py
+@brief metrics.pyのテストコード
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from check_submission import debug_print
+from metrics import Metrics, TimedIterator
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        """一時ディレクトリを作成"""
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_histogram_and_counts(self):
+        """応答時間のヒストグラムが累積で、ステータス別に数えられることのテスト"""
+        metrics = Metrics("test")
+        metrics.observe_request("200", 0.005, 100)
+        metrics.observe_request("200", 0.3, 200)
+        metrics.observe_request("500", 20.0)
+        metrics.observe_retry()
+        req = metrics.to_dict()["requests"]
+        self.assertEqual(req["latency_seconds_buckets"]["0.01"], 1)
+        self.assertEqual(req["latency_seconds_buckets"]["0.25"], 1)
+        self.assertEqual(req["latency_seconds_buckets"]["0.5"], 2)
+        self.assertEqual(req["latency_seconds_buckets"]["+Inf"], 3)
+        self.assertEqual(req["status"], {"200": 2, "500": 1})
+        self.assertEqual((req["bytes_received"], req["retries"]), (300, 1))
+
+    def test_phases_and_output(self):
+        """処理段階の時間がJSONとPrometheus形式で出力されることのテスト"""
+        metrics = Metrics("test")
+        with metrics.phase("load"):
+            pass
+        timed = TimedIterator(iter([1, 2, 3]))
+        self.assertEqual(list(timed), [1, 2, 3])
+        metrics.add_phase("fetch", timed.elapsed)
+        metrics.add_phase("fetch", 1.5)
+        metrics.observe_request("200", 0.02, 10)
+
+        path = os.path.join(self.dir, "metrics.json")
+        metrics.write_json(path)
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        self.assertEqual(list(data["phases_seconds"]), ["load", "fetch"])
+        self.assertGreaterEqual(data["phases_seconds"]["fetch"], 1.5)
+
+        path = os.path.join(self.dir, "metrics.prom")
+        metrics.write_prometheus(path)
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        self.assertIn('aoj_request_duration_seconds_bucket{script="test",le="0.025"} 1', text)
+        self.assertIn('aoj_requests_total{script="test",status="200"} 1', text)
+        self.assertIn('aoj_phase_seconds{script="test",phase="fetch"}', text)
+
+        # umaskが厳しい場合も、既存ファイルが読み取り不可の場合も誰でも読めるようにする
+        os.chmod(path, 0o600)
+        umask = os.umask(0o077)
+        try:
+            metrics.write_prometheus(path)
+        finally:
+            os.umask(umask)
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o644)
+
+    def test_debug_print_lazy(self):
+        """デバッグモードでなければメッセージを組み立てないことのテスト"""
+        value = mock.MagicMock()
+        with mock.patch("builtins.print") as printed:
+            debug_print(False, "%s", value)
+            value.__str__.assert_not_called()
+            printed.assert_not_called()
+            debug_print(True, "%s: %d", "ITP1_1_A", 3)
+            printed.assert_called_once_with("DEBUG: ITP1_1_A: 3")
+
+if __name__ == "__main__":
+    unittest.main()
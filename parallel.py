@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file parallel.py
+@brief APIリクエストの並列実行
+
+各スクリプトで共有する、スレッドプールで関数を並列に適用し結果を入力順に返す処理です。
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List
+
+def map_ordered(func: Callable, items: List, workers: int = 1) -> Iterator:
+    """
+    各要素にfuncを適用し、結果を入力順に返す。
+    workersが2以上の場合はスレッドプールで並列に実行する。
+
+    @param func 各要素に適用する関数
+    @param items 入力のリスト
+    @param workers 並列実行数
+    @return funcの結果のイテレータ（itemsと同じ順序）
+    """
+    if workers <= 1:
+        yield from map(func, items)
+        return
+
+    # Executor.mapは完了順ではなく入力順に結果を返すため、直列実行と同じ順序でマージできる
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(func, items)
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file ranking_state.py
+@brief ランキングの並び順を保存し、変更ログの差分だけを反映する（generate_rankings.py --incremental）
+
+学生ごとのスコア・提出日時と、総合ランキング・問題ごとのランキングの並び順
+（学生の位置のリスト）をJSONで保存します。
+変更ログ（change_log.py）の1行を反映するときは、該当する学生を並び順から二分探索で取り除き、
+新しい値の位置に挿入するだけなので、user.csvの読み込みや全体の並べ替えは行いません。
+
+状態にはuser.csvの内容の記録（サイズ・更新時刻・ハッシュ）も保存し、変更ログのsourceの行で更新します。
+generate_rankings.pyは反映後の記録が現在のuser.csvと一致しない場合に状態を作り直します。
+
+並び順はgenerate_rankings.calculate_rankingsと同じです。
+- 総合: 合計点の降順、同点はアカウント名順（合計点0は除外）
+- 問題ごと: 提出日時の昇順、同時刻はアカウント名・姓・名の順（未提出は除外）
+"""
+
+import json
+import os
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+from backup_store import atomic_write_bytes
+from roster import Roster, Student
+
+# デフォルトの状態ファイル
+STATE_FILE = os.path.join("rankings", "ranking_state.json")
+
+# 状態ファイルの形式のバージョン
+STATE_VERSION = 1
+
+class RankingState:
+    """ランキングの並び順と、差分の反映に必要な学生ごとの値"""
+
+    def __init__(self, problems: List[str], students: List[Student], scores: List[int],
+                 dates: List[int], total_order: List[int], problem_orders: List[List[int]],
+                 log_offset: int = 0, written: str = "", source: Optional[Dict] = None):
+        """
+        @param problems 問題IDのリスト
+        @param students 学生のリスト（user.csvの行順）
+        @param scores スコア（行優先、長さ 学生数×問題数）
+        @param dates 提出日時（UNIXタイムスタンプミリ秒）
+        @param total_order 総合ランキングの並び順（学生の位置のリスト）
+        @param problem_orders 問題ごとのランキングの並び順
+        @param log_offset 変更ログの反映済みの位置（バイト）
+        @param written 最後にランキングを出力した日付（YYYYMMDD）
+        @param source 状態と一致するuser.csvの記録（roster_snapshot.source_stamp、不明ならNone）
+        """
+        self.problems = problems
+        self.students = students
+        self.scores = scores
+        self.dates = dates
+        self.total_order = total_order
+        self.problem_orders = problem_orders
+        self.log_offset = log_offset
+        self.written = written
+        self.source = source
+
+        prob_count = len(problems)
+        self.totals = [sum(scores[k:k + prob_count]) for k in range(0, len(scores), prob_count)] \
+            if prob_count else [0] * len(students)
+        self.positions = {(st.student_id, st.user_id): s for s, st in enumerate(students)}
+        self.problem_positions = {pid: p for p, pid in enumerate(problems)}
+
+        # 反映後に出力し直す必要があるランキング
+        self.total_changed = False
+        self.changed_problems: Set[int] = set()
+
+    @classmethod
+    def from_roster(cls, roster: Roster, log_offset: int = 0) -> "RankingState":
+        """
+        Rosterから全体を計算して生成する
+
+        @param roster 学生一覧と提出記録
+        @param log_offset rosterに反映済みの変更ログの位置
+        @return RankingState
+        """
+        students = roster.students
+        state = cls(roster.problems, students, list(roster.scores), list(roster.dates),
+                    [], [[] for _ in roster.problems], log_offset)
+        state.total_order = sorted((s for s, total in enumerate(state.totals) if total > 0),
+                                   key=state.total_key)
+        for p in range(len(roster.problems)):
+            state.problem_orders[p] = sorted(
+                (s for s in range(len(students)) if state.is_ranked(s, p)),
+                key=lambda s, p=p: state.problem_key(s, p))
+        return state
+
+    def total_key(self, s: int) -> tuple:
+        """総合ランキングの並べ替えキー"""
+        return -self.totals[s], self.students[s].user_id, s
+
+    def problem_key(self, s: int, p: int) -> tuple:
+        """問題ごとのランキングの並べ替えキー"""
+        st = self.students[s]
+        return self.dates[s * len(self.problems) + p], st.user_id, st.surname, st.name, s
+
+    def is_ranked(self, s: int, p: int) -> bool:
+        """問題ごとのランキングの対象か（スコアと提出日時が正）"""
+        k = s * len(self.problems) + p
+        return self.scores[k] > 0 and self.dates[k] > 0
+
+    def _remove(self, order: List[int], s: int, key):
+        """並び順から学生を取り除く（現在の値のキーで二分探索）"""
+        i = bisect_left(order, key(s), key=key)
+        if i < len(order) and order[i] == s:
+            del order[i]
+
+    def apply(self, entry: Dict) -> bool:
+        """
+        変更ログの1行を反映する
+
+        @param entry 変更ログの1行
+        @return 反映できたか（resetの行・未知の学生や問題の場合はFalse）
+        """
+        if entry.get("reset"):
+            return False
+        if "source" in entry:
+            # user.csvの保存の記録（ランキングは変わらない）
+            self.source = entry["source"]
+            return True
+        s = self.positions.get((entry.get("student_id"), entry.get("user_id")))
+        p = self.problem_positions.get(entry.get("problem"))
+        if s is None or p is None:
+            return False
+
+        score, date = entry["new"][0], entry["new"][1]
+        k = s * len(self.problems) + p
+        # 変更ログには改善のみが記録されるため、反映済みの行を再度読んでも値が戻らないよう
+        # 現在より良い場合だけ反映する（check_submission.is_betterと同じ判定）
+        if not (score > self.scores[k] or (score == self.scores[k] and date > self.dates[k])):
+            return True
+
+        def problem_key(t: int) -> tuple:
+            return self.problem_key(t, p)
+
+        # 現在の位置から取り除いてから値を更新し、新しい位置に挿入する
+        if self.totals[s] > 0:
+            self._remove(self.total_order, s, self.total_key)
+        if self.is_ranked(s, p):
+            self._remove(self.problem_orders[p], s, problem_key)
+
+        self.totals[s] += score - self.scores[k]
+        self.scores[k] = score
+        self.dates[k] = date
+
+        if self.totals[s] > 0:
+            insort(self.total_order, s, key=self.total_key)
+        if self.is_ranked(s, p):
+            insort(self.problem_orders[p], s, key=problem_key)
+
+        self.total_changed = True
+        self.changed_problems.add(p)
+        return True
+
+    def problem_dates(self, p: int) -> List[int]:
+        """
+        問題ごとのランキング順の提出日時
+
+        @param p 問題の位置
+        @return 提出日時のリスト
+        """
+        prob_count = len(self.problems)
+        return [self.dates[s * prob_count + p] for s in self.problem_orders[p]]
+
+    def to_dict(self) -> Dict:
+        """状態ファイルに保存する内容"""
+        return {"version": STATE_VERSION, "problems": self.problems, "log_offset": self.log_offset,
+                "written": self.written, "students": [st.fields() for st in self.students],
+                "scores": self.scores, "dates": self.dates, "total_order": self.total_order,
+                "problem_orders": self.problem_orders, "source": self.source}
+
+    def save(self, path: str = STATE_FILE):
+        """
+        状態ファイルに保存する（一時ファイル経由で置き換え）
+
+        @param path 状態ファイルのパス
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        atomic_write_bytes(path, json.dumps(self.to_dict(), ensure_ascii=False,
+                                            separators=(",", ":")).encode("utf-8"))
+
+    def mark_written(self, date: Optional[str] = None):
+        """
+        ランキングを出力したことを記録する
+
+        @param date 出力した日付（YYYYMMDD、省略時は今日）
+        """
+        self.written = date or datetime.now().strftime("%Y%m%d")
+        self.total_changed = False
+        self.changed_problems.clear()
+
+def load_state(path: str = STATE_FILE) -> Optional[RankingState]:
+    """
+    状態ファイルを読み込む
+
+    @param path 状態ファイルのパス
+    @return RankingState（存在しない・読み込めない・形式が異なる場合はNone）
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (ValueError, OSError) as e:
+        print(f"警告: {path}を読み込めませんでした - {e}")
+        return None
+    if data.get("version") != STATE_VERSION:
+        return None
+    students = [Student(*fields) for fields in data["students"]]
+    return RankingState(data["problems"], students, data["scores"], data["dates"],
+                        data["total_order"], data["problem_orders"], data["log_offset"],
+                        data.get("written", ""), data.get("source"))
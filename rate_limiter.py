@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file rate_limiter.py
+@brief AOJ APIへのリクエスト速度を調整するレートリミッター
+
+トークンバケット方式でリクエスト速度を制限します。
+正常な応答が続けば速度を少しずつ上げ（加算的増加）、
+429/503などの抑制応答を受けたら速度を半分に下げます（乗算的減少, AIMD）。
+Retry-Afterヘッダーが指定された場合は、その時間だけすべてのリクエストを止めます。
+同じエンドポイントに対するリクエストは1つのリミッターを共有します。
+"""
+
+import argparse
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+# デフォルト設定（リクエスト/秒）
+DEFAULT_RATE = 10.0
+DEFAULT_MIN_RATE = 0.5
+DEFAULT_MAX_RATE = 50.0
+DEFAULT_BURST = 5.0
+DEFAULT_INCREASE = 1.0       # 1秒分の正常応答ごとに増やすレート
+DEFAULT_DECREASE = 0.5       # 抑制応答時にレートに掛ける係数
+THROTTLE_COOLDOWN = 1.0      # 連続する抑制応答で何度も減速しないための間隔（秒）
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Retry-Afterヘッダーの値を待機秒数に変換する
+
+    @param value ヘッダーの値（秒数またはHTTP日付）
+    @return 待機秒数（解釈できない場合はNone）
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def check_rates(**rates: float):
+    """
+    レートが正の値であることを確認する（0以下では待機時間・レートの更新で0除算になる）
+
+    @param rates 名前ごとのレート（リクエスト/秒）
+    @throws ValueError 正の値でないレートがある場合
+    """
+    for name, value in rates.items():
+        if not value > 0:
+            raise ValueError(f"{name}は正の値を指定してください: {value}")
+
+def positive_rate(value: str) -> float:
+    """
+    コマンドライン引数のレートを解釈する（argparseのtype）
+
+    @param value 引数の文字列
+    @return レート（リクエスト/秒）
+    @throws argparse.ArgumentTypeError 数値でない、または正の値でない場合
+    """
+    try:
+        rate = float(value)
+        check_rates(rate=rate)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"正の数値を指定してください: {value}")
+    return rate
+
+class RateLimiter:
+    """AIMDで速度を調整するトークンバケット"""
+
+    def __init__(self, rate: float = DEFAULT_RATE, min_rate: float = DEFAULT_MIN_RATE,
+                 max_rate: float = DEFAULT_MAX_RATE, burst: float = DEFAULT_BURST,
+                 increase: float = DEFAULT_INCREASE, decrease: float = DEFAULT_DECREASE):
+        """
+        @param rate 初期レート（リクエスト/秒）
+        @param min_rate 最低レート
+        @param max_rate 最高レート
+        @param burst 連続して送れるリクエスト数の上限
+        @param increase 加算的増加の幅
+        @param decrease 乗算的減少の係数
+        @throws ValueError レートが正の値でない場合
+        """
+        check_rates(rate=rate, min_rate=min_rate, max_rate=max_rate)
+        self.rate = min(max(rate, min_rate), max_rate)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.settings = (rate, max_rate)
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self.lock = threading.Lock()
+
+        now = time.monotonic()
+        self.tokens = burst
+        self.updated = now
+        self.paused_until = 0.0
+        self.last_throttle = 0.0
+
+        # 統計情報
+        self.requests = 0
+        self.throttled = 0
+        self.first_request = None
+        self.last_request = None
+        self.peak_rate = self.rate
+
+    def configure(self, rate: float, max_rate: float):
+        """
+        初期レート・最高レートを設定し直す（同じ設定なら調整済みのレートをそのまま使う）
+
+        @param rate 初期レート（リクエスト/秒）
+        @param max_rate 最高レート
+        @throws ValueError レートが正の値でない場合
+        """
+        check_rates(rate=rate, max_rate=max_rate)
+        with self.lock:
+            if (rate, max_rate) == self.settings:
+                return
+            self.settings = (rate, max_rate)
+            self.max_rate = max_rate
+            self.rate = min(max(rate, self.min_rate), max_rate)
+            self.peak_rate = max(self.peak_rate, self.rate)
+
+    def acquire(self):
+        """トークンを1つ取得する（取得できるまで待機する）"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        self.requests += 1
+                        if self.first_request is None:
+                            self.first_request = now
+                        self.last_request = now
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def on_success(self):
+        """正常応答を受けたときにレートを加算的に増やす"""
+        with self.lock:
+            # 1秒あたりincreaseだけ増えるよう、1応答あたりincrease/rateを加える
+            self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+            self.peak_rate = max(self.peak_rate, self.rate)
+
+    def on_throttle(self, retry_after: Optional[float] = None):
+        """
+        抑制応答（429/503）を受けたときにレートを乗算的に減らす
+
+        @param retry_after Retry-Afterで指定された待機秒数
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.throttled += 1
+            if now - self.last_throttle >= THROTTLE_COOLDOWN:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self.last_throttle = now
+            self.tokens = 0.0
+            if retry_after is not None:
+                self.paused_until = max(self.paused_until, now + retry_after)
+            self.updated = max(now, self.paused_until)
+
+    def observed_rate(self) -> float:
+        """
+        実際に送信したリクエストの平均レートを返す
+
+        @return リクエスト/秒
+        """
+        with self.lock:
+            if self.first_request is None or self.last_request == self.first_request:
+                return 0.0
+            return (self.requests - 1) / (self.last_request - self.first_request)
+
+    def print_stats(self):
+        """レートの統計情報を表示する"""
+        print(f"リクエストレート: 目標 {self.rate:.1f}件/秒 (最高 {self.peak_rate:.1f}件/秒), "
+              f"実測 {self.observed_rate():.1f}件/秒, "
+              f"送信 {self.requests}件, 抑制応答 {self.throttled}件")
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+def get_rate_limiter(endpoint: str) -> RateLimiter:
+    """
+    エンドポイントごとに共有するリミッターを返す
+
+    @param endpoint APIのベースURL
+    @return RateLimiter
+    """
+    with _limiters_lock:
+        if endpoint not in _limiters:
+            _limiters[endpoint] = RateLimiter()
+        return _limiters[endpoint]
+
+def set_rate_limiter(endpoint: str, limiter: RateLimiter):
+    """
+    エンドポイントで共有するリミッターを差し替える
+
+    @param endpoint APIのベースURL
+    @param limiter 新しいリミッター
+    """
+    with _limiters_lock:
+        _limiters[endpoint] = limiter
+
+def add_rate_arguments(parser: argparse.ArgumentParser):
+    """
+    レート制御関連のコマンドライン引数を追加する
+
+    @param parser 引数パーサー
+    """
+    parser.add_argument("--rate", type=positive_rate, default=DEFAULT_RATE,
+                        help=f"初期リクエストレート（件/秒、デフォルト: {DEFAULT_RATE}）")
+    parser.add_argument("--max-rate", type=positive_rate, default=DEFAULT_MAX_RATE,
+                        help=f"最高リクエストレート（件/秒、デフォルト: {DEFAULT_MAX_RATE}）")
+
+def rate_limiter_from_args(args: argparse.Namespace, endpoint: str) -> RateLimiter:
+    """
+    コマンドライン引数の設定でエンドポイントの共有リミッターを構成して返す
+    （同じプロセス内の全てのクライアントが1つのリミッターを使う）
+
+    @param args add_rate_argumentsで追加した引数を含む解析結果
+    @param endpoint APIのベースURL
+    @return RateLimiter
+    """
+    limiter = get_rate_limiter(endpoint)
+    limiter.configure(args.rate, args.max_rate)
+    return limiter
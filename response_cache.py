@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file response_cache.py
+@brief AOJ APIのレスポンスをディスクに保存するキャッシュ
+
+aoj_client.AOJClientから利用される永続キャッシュです。
+- 判定済みのソースコード（/reviews/{judgeId}）は変化しないため無期限に保持
+- 提出記録（/submission_records/...）は指定した秒数（TTL）で失効
+- 合計サイズが上限を超えたら最も長く使われていないものから削除（LRU）
+キャッシュの1エントリは1つのJSONファイルで、最終利用時刻はファイルの更新時刻で管理します。
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Optional
+
+# デフォルト設定
+CACHE_DIR = ".aoj_cache"
+DEFAULT_TTL = 3600                     # 提出記録の有効期間（秒）
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # キャッシュ全体の上限（バイト）
+
+class ResponseCache:
+    """TTLとサイズ上限付きのディスクキャッシュ"""
+
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES,
+                 ttl: Optional[float] = DEFAULT_TTL):
+        """
+        @param directory キャッシュを保存するディレクトリ
+        @param max_bytes キャッシュ全体のサイズ上限（バイト）
+        @param ttl 提出記録の有効期間（秒）
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.lock = threading.Lock()
+
+        # 統計情報
+        self.hits = 0
+        self.misses = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.evictions = 0
+
+        # ファイル名 → (サイズ, 最終利用時刻)
+        os.makedirs(directory, exist_ok=True)
+        self.entries = {}
+        for name in os.listdir(directory):
+            if name.endswith(".json"):
+                st = os.stat(os.path.join(directory, name))
+                self.entries[name] = (st.st_size, st.st_mtime)
+        self.total_bytes = sum(size for size, _ in self.entries.values())
+
+    def ttl_for(self, path: str) -> Optional[float]:
+        """
+        パスに応じた有効期間を返す
+
+        @param path APIのパス
+        @return 有効期間（秒）、無期限ならNone
+        """
+        if path.startswith("/reviews/"):
+            return None
+        return self.ttl
+
+    @staticmethod
+    def make_key(path: str, params: Optional[dict] = None) -> str:
+        """
+        パスとクエリパラメータからキャッシュのファイル名を作る
+
+        @param path APIのパス
+        @param params クエリパラメータ
+        @return ファイル名
+        """
+        query = "&".join(f"{k}={v}" for k, v in sorted((params or {}).items()))
+        return hashlib.sha1(f"{path}?{query}".encode("utf-8")).hexdigest() + ".json"
+
+    def get(self, path: str, params: Optional[dict] = None) -> Optional[Any]:
+        """
+        キャッシュからデータを取得する
+
+        @param path APIのパス
+        @param params クエリパラメータ
+        @return キャッシュされたデータ（ない場合や失効した場合はNone）
+        """
+        name = self.make_key(path, params)
+        file = os.path.join(self.directory, name)
+        ttl = self.ttl_for(path)
+        with self.lock:
+            if name not in self.entries:
+                self.misses += 1
+                return None
+            try:
+                with open(file, "r", encoding="utf-8") as f:
+                    raw = f.read()
+                entry = json.loads(raw)
+            except (OSError, ValueError):
+                self._remove(name)
+                self.misses += 1
+                return None
+            if ttl is not None and time.time() - entry.get("fetched", 0) > ttl:
+                self._remove(name)
+                self.misses += 1
+                return None
+
+            # 最終利用時刻を更新（LRU用）
+            now = time.time()
+            os.utime(file, (now, now))
+            self.entries[name] = (self.entries[name][0], now)
+            self.hits += 1
+            self.bytes_read += len(raw.encode("utf-8"))
+            return entry.get("data")
+
+    def put(self, path: str, params: Optional[dict], data: Any):
+        """
+        データをキャッシュに保存する
+
+        @param path APIのパス
+        @param params クエリパラメータ
+        @param data 保存するデータ
+        """
+        name = self.make_key(path, params)
+        file = os.path.join(self.directory, name)
+        raw = json.dumps({"path": path, "params": params, "fetched": time.time(), "data": data},
+                         ensure_ascii=False).encode("utf-8")
+        with self.lock:
+            if name in self.entries:
+                self._remove(name)
+            tmp = f"{file}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(raw)
+            os.replace(tmp, file)
+            self.entries[name] = (len(raw), time.time())
+            self.total_bytes += len(raw)
+            self.bytes_written += len(raw)
+            self._evict()
+
+    def _remove(self, name: str):
+        """エントリを削除する（ロック取得済みで呼ぶこと）"""
+        size, _ = self.entries.pop(name, (0, 0))
+        self.total_bytes -= size
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except OSError:
+            pass
+
+    def _evict(self):
+        """サイズ上限を超えた分を最終利用時刻の古い順に削除する（ロック取得済みで呼ぶこと）"""
+        if self.total_bytes <= self.max_bytes:
+            return
+        for name, _ in sorted(self.entries.items(), key=lambda item: item[1][1]):
+            if self.total_bytes <= self.max_bytes:
+                break
+            self._remove(name)
+            self.evictions += 1
+
+    def print_stats(self):
+        """キャッシュの統計情報を表示する"""
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        print(f"キャッシュ: ヒット {self.hits}件 / ミス {self.misses}件 (ヒット率 {rate:.1f}%), "
+              f"読込 {self.bytes_read}バイト, 書込 {self.bytes_written}バイト, "
+              f"削除 {self.evictions}件, 合計 {self.total_bytes}バイト")
+
+def add_cache_arguments(parser: argparse.ArgumentParser):
+    """
+    キャッシュ関連のコマンドライン引数を追加する
+
+    @param parser 引数パーサー
+    """
+    parser.add_argument("--cache", action="store_true",
+                        help="APIレスポンスをディスクにキャッシュします")
+    parser.add_argument("--cache-dir", default=CACHE_DIR,
+                        help=f"キャッシュディレクトリ（デフォルト: {CACHE_DIR}）")
+    parser.add_argument("--cache-ttl", type=float, default=DEFAULT_TTL,
+                        help=f"提出記録のキャッシュ有効期間（秒、デフォルト: {DEFAULT_TTL}）")
+    parser.add_argument("--cache-max-mb", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="キャッシュ全体の上限（MB、デフォルト: "
+                             f"{DEFAULT_MAX_BYTES // (1024 * 1024)}）")
+
+def cache_from_args(args: argparse.Namespace) -> Optional[ResponseCache]:
+    """
+    コマンドライン引数からキャッシュを生成する
+
+    @param args add_cache_argumentsで追加した引数を含む解析結果
+    @return ResponseCache（--cache未指定ならNone）
+    """
+    if not args.cache:
+        return None
+    return ResponseCache(args.cache_dir, args.cache_max_mb * 1024 * 1024, args.cache_ttl)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file response_cache_test.py
+@brief response_cache.pyのテストコード
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from response_cache import ResponseCache
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        """テスト用のキャッシュディレクトリを作成"""
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """テスト用のキャッシュディレクトリを削除"""
+        shutil.rmtree(self.directory)
+
+    def test_hit_and_miss(self):
+        """保存したデータを取得できることのテスト"""
+        cache = ResponseCache(self.directory)
+        self.assertIsNone(cache.get("/reviews/1"))
+        cache.put("/reviews/1", None, {"sourceCode": "print(1)"})
+        self.assertEqual(cache.get("/reviews/1"), {"sourceCode": "print(1)"})
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        # 別インスタンス（再実行）からも読める
+        cache = ResponseCache(self.directory)
+        self.assertEqual(cache.get("/reviews/1"), {"sourceCode": "print(1)"})
+
+    def test_ttl(self):
+        """提出記録は失効し、ソースコードは失効しないことのテスト"""
+        cache = ResponseCache(self.directory, ttl=0)
+        cache.put("/submission_records/users/test1", {"page": 0}, [])
+        cache.put("/reviews/1", None, {"sourceCode": "print(1)"})
+        time.sleep(0.01)
+        self.assertIsNone(cache.get("/submission_records/users/test1", {"page": 0}))
+        self.assertIsNotNone(cache.get("/reviews/1"))
+
+    def test_lru_eviction(self):
+        """サイズ上限を超えたら最も古く使われたものから削除することのテスト"""
+        cache = ResponseCache(self.directory)
+        cache.put("/reviews/1", None, {"sourceCode": "a" * 100})
+        cache.put("/reviews/2", None, {"sourceCode": "b" * 100})
+        cache.max_bytes = cache.total_bytes + 50  # 2件分（fetchedの桁数の差を許容）
+
+        # 1を参照してから3を追加すると、2が削除される
+        cache.get("/reviews/1")
+        cache.put("/reviews/3", None, {"sourceCode": "c" * 100})
+        self.assertIsNotNone(cache.get("/reviews/1"))
+        self.assertIsNone(cache.get("/reviews/2"))
+        self.assertIsNotNone(cache.get("/reviews/3"))
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file roster.py
+@brief user.csvとprob.csvを読み込み、型付きの配列として保持する共通モジュール
+
+user.csvの「基本情報4列 + 問題ごとに3列（スコア・提出日時・judgeId）」の形式を一度だけ解析し、
+スコア・提出日時・judgeIdをそれぞれ(学生数 × 問題数)の整数配列（array('q')）として保持します。
+各スクリプトはこのモジュールを通してデータを読み書きし、セルごとの文字列解析を繰り返しません。
+"""
+
+import csv
+from array import array
+from mmap import mmap
+from typing import Iterator, List, Optional, Tuple
+
+from backup_store import atomic_write_csv
+from submission_store import SubmissionStore
+
+# 未設定時の値（check_submission.NO_SUBMISSIONと同じ）
+NO_SUBMISSION = -1
+
+class Student:
+    """学生1人の基本情報"""
+    __slots__ = ("student_id", "surname", "name", "user_id")
+
+    def __init__(self, student_id: str, surname: str, name: str, user_id: str):
+        """
+        @param student_id 学籍番号
+        @param surname 姓
+        @param name 名
+        @param user_id AOJユーザーID
+        """
+        self.student_id = student_id
+        self.surname = surname
+        self.name = name
+        self.user_id = user_id
+
+    def fields(self) -> List[str]:
+        """user.csvの基本情報4列を返す"""
+        return [self.student_id, self.surname, self.name, self.user_id]
+
+def to_int(value: str, default: int) -> int:
+    """
+    文字列を整数に変換する（変換失敗時はdefault）
+
+    @param value 変換する文字列
+    @param default 変換失敗時の値
+    @return 整数
+    """
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return default
+
+class Roster:
+    """学生一覧と(学生数 × 問題数)のスコア・提出日時・judgeIdの配列"""
+
+    def __init__(self, problems: List[str], students: List[Student],
+                 scores: array, dates: array, judge_ids: array, mapping: Optional[mmap] = None):
+        """
+        @param problems 問題IDのリスト
+        @param students 学生のリスト
+        @param scores スコア（行優先、長さ 学生数×問題数）
+        @param dates 提出日時（UNIXタイムスタンプミリ秒）
+        @param judge_ids judgeId
+        @param mapping 配列（memoryview）が参照するスナップショットのメモリマップ（roster_snapshot.py）
+        """
+        self.problems = problems
+        self.students = students
+        self.scores = scores
+        self.dates = dates
+        self.judge_ids = judge_ids
+        self.mapping = mapping
+
+    def release(self):
+        """
+        配列がスナップショットのメモリマップを参照している場合は、配列を複製してマップを閉じる
+        （以降もそのまま使え、スナップショットファイルとファイル記述子は保持しない）
+        """
+        if self.mapping is None:
+            return
+        views = (self.scores, self.dates, self.judge_ids)
+        copies = []
+        for view in views:
+            values = array("q")
+            with view.cast("B") as raw:
+                values.frombytes(raw)
+            copies.append(values)
+        self.scores, self.dates, self.judge_ids = copies
+        for view in views:
+            view.release()
+        self.mapping.close()
+        self.mapping = None
+
+    @classmethod
+    def from_rows(cls, rows: List[List[str]], problems: List[str]) -> "Roster":
+        """
+        user.csv形式の行から生成する（不足・不正な値は初期値）
+
+        @param rows user.csvの全行
+        @param problems 問題IDのリスト
+        @return Roster
+        """
+        prob_count = len(problems)
+        students = []
+        scores = array("q")
+        dates = array("q")
+        judge_ids = array("q")
+        for row in rows:
+            if len(row) < 4:
+                continue
+            students.append(Student(row[0], row[1], row[2], row[3]))
+            for i in range(prob_count):
+                base_idx = 4 + i * 3
+                if base_idx + 2 >= len(row):
+                    scores.append(0)
+                    dates.append(0)
+                    judge_ids.append(NO_SUBMISSION)
+                    continue
+                scores.append(to_int(row[base_idx], 0))
+                dates.append(to_int(row[base_idx + 1], 0))
+                judge_ids.append(to_int(row[base_idx + 2], NO_SUBMISSION))
+        return cls(problems, students, scores, dates, judge_ids)
+
+    def index(self, student_index: int, problem_index: int) -> int:
+        """
+        配列上の位置を返す
+
+        @param student_index 学生の位置
+        @param problem_index 問題の位置
+        @return 配列の添字
+        """
+        return student_index * len(self.problems) + problem_index
+
+    def cell(self, student_index: int, problem_index: int) -> Tuple[int, int, int]:
+        """
+        1セルの値を返す
+
+        @param student_index 学生の位置
+        @param problem_index 問題の位置
+        @return (score, date, judge_id)
+        """
+        k = self.index(student_index, problem_index)
+        return self.scores[k], self.dates[k], self.judge_ids[k]
+
+    def set_cell(self, student_index: int, problem_index: int, score: int, date: int,
+                 judge_id: int):
+        """
+        1セルの値を更新する
+
+        @param student_index 学生の位置
+        @param problem_index 問題の位置
+        @param score スコア
+        @param date 提出日時
+        @param judge_id judgeId
+        """
+        k = self.index(student_index, problem_index)
+        self.scores[k] = score
+        self.dates[k] = date
+        self.judge_ids[k] = judge_id
+
+    def row_slice(self, student_index: int) -> slice:
+        """
+        1学生分のセルの範囲を返す
+
+        @param student_index 学生の位置
+        @return 配列のスライス
+        """
+        start = student_index * len(self.problems)
+        return slice(start, start + len(self.problems))
+
+    def iter_cells(self) -> Iterator[Tuple[int, int, int, int, int]]:
+        """
+        全セルを学生順・問題順に返す
+
+        @return (学生の位置, 問題の位置, score, date, judge_id)のイテレータ
+        """
+        prob_count = len(self.problems)
+        for k, (score, date, jid) in enumerate(zip(self.scores, self.dates, self.judge_ids)):
+            yield k // prob_count, k % prob_count, score, date, jid
+
+    def to_rows(self) -> List[List[str]]:
+        """
+        user.csv形式の行に変換する
+
+        @return user.csvの全行
+        """
+        rows = []
+        for s, student in enumerate(self.students):
+            row = student.fields()
+            sl = self.row_slice(s)
+            for score, date, jid in zip(self.scores[sl], self.dates[sl], self.judge_ids[sl]):
+                row.extend([str(score), str(date), str(jid)])
+            rows.append(row)
+        return rows
+
+def load_problems(prob_csv: str = "prob.csv") -> List[str]:
+    """
+    prob.csvから問題IDの一覧を読み込む
+
+    @param prob_csv 問題定義ファイル
+    @return 問題IDのリスト
+    """
+    with open(prob_csv, "r", newline="", encoding="utf-8") as f:
+        return next(csv.reader(f))
+
+def load_roster(user_csv: str = "user.csv", prob_csv: str = "prob.csv",
+                db: Optional[str] = None) -> Roster:
+    """
+    user.csv（またはSQLiteデータベース）とprob.csvを読み込む
+
+    @param user_csv user.csvのパス
+    @param prob_csv 問題定義ファイル
+    @param db user.csvの代わりに読み込むSQLiteデータベース
+    @return Roster
+    """
+    problems = load_problems(prob_csv)
+    if db:
+        store = SubmissionStore(db)
+        rows = store.load_rows(problems)
+        store.close()
+    else:
+        with open(user_csv, "r", newline="", encoding="utf-8") as f:
+            rows = list(csv.reader(f))
+    return Roster.from_rows(rows, problems)
+
+def save_roster(roster: Roster, user_csv: str = "user.csv", db: Optional[str] = None) -> int:
+    """
+    user.csv（またはSQLiteデータベース）に保存する。
+    user.csvは一時ファイル経由で置き換え、データベースは変更のあったセルのみ更新する。
+
+    @param roster 保存するRoster
+    @param user_csv user.csvのパス
+    @param db user.csvの代わりに保存するSQLiteデータベース
+    @return データベースで更新した件数（user.csvの場合は行数）
+    """
+    rows = roster.to_rows()
+    if db:
+        store = SubmissionStore(db)
+        count = store.save_rows(rows, roster.problems)
+        store.close()
+        return count
+    atomic_write_csv(user_csv, rows)
+    return len(rows)
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file roster_snapshot.py
+@brief 解析済みのuser.csvをバイナリで保存し、レポート出力の起動時にそのまま読み込むキャッシュ
+
+export_excel.pyやgenerate_rankings.pyは実行のたびにuser.csvの全セルを文字列から解析します。
+このモジュールは解析結果（学生一覧とスコア・提出日時・judgeIdの配列）をuser.csvの隣の
+スナップショットファイル（user.csv.snapshot）に保存し、次回からは配列をメモリマップで
+コピーせずに参照します（mmap + memoryview）。
+
+スナップショットはuser.csv・prob.csvのサイズ・更新時刻・SHA-256を記録し、
+サイズと更新時刻が一致すればそのまま使用します。一致しない場合（または更新時刻が
+作成時刻に近く変更を見逃すおそれがある場合）は内容のハッシュを比較し、
+内容が変わっていればuser.csvを解析して作り直します。
+
+ファイル形式:
+  MAGIC（8バイト）, ヘッダー長（4バイト）, ヘッダー（JSON）, 8バイト境界までの詰め物,
+  スコア・提出日時・judgeIdの配列（それぞれ 学生数×問題数 個の符号付き64ビット整数、ネイティブのバイト順）
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from typing import Dict, Optional, Tuple
+
+from backup_store import atomic_write_bytes
+from roster import Roster, Student, load_roster
+
+# スナップショットファイルの拡張子（user.csvのパスに付ける）
+SNAPSHOT_SUFFIX = ".snapshot"
+
+# ファイル形式の識別子とヘッダー長の形式
+MAGIC = b"AOJSNAP1"
+_PREFIX = struct.Struct("<8sI")
+
+# 配列の要素の型（array・memoryviewの型コード）と大きさ
+TYPECODE = "q"
+ITEMSIZE = 8
+
+# 更新時刻がスナップショットの作成時刻からこの範囲内なら、ハッシュも比較する（ナノ秒）
+# （更新時刻の精度が粗いファイルシステムでは、作成直後の書き換えで更新時刻が変わらないため）
+RACY_NS = 2 * 10 ** 9
+
+def snapshot_path(user_csv: str) -> str:
+    """
+    user.csvに対応するスナップショットファイルのパスを返す
+
+    @param user_csv user.csvのパス
+    @return スナップショットファイルのパス
+    """
+    return user_csv + SNAPSHOT_SUFFIX
+
+def file_stat(path: str) -> Dict:
+    """
+    ファイルのサイズと更新時刻を返す
+
+    @param path ファイルのパス
+    @return {"size": バイト数, "mtime_ns": 更新時刻（ナノ秒）}
+    """
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+def file_digest(path: str) -> str:
+    """
+    ファイル内容のハッシュを返す
+
+    @param path ファイルのパス
+    @return SHA-256の16進文字列
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def source_stamp(path: str) -> Dict:
+    """
+    ファイルの変更を検出するための記録（サイズ・更新時刻・ハッシュ・記録時刻）を作る
+
+    @param path ファイルのパス
+    @return {"size", "mtime_ns", "sha256", "recorded_ns"}
+    """
+    recorded_ns = time.time_ns()
+    return dict(file_stat(path), sha256=file_digest(path), recorded_ns=recorded_ns)
+
+def verify_stamp(path: str, stamp: Dict) -> Optional[Dict]:
+    """
+    ファイルがsource_stampの記録時から変わっていないか確認する。
+    サイズと更新時刻が同じならハッシュは比較しない（更新時刻が記録時刻に近い場合を除く）。
+
+    @param path ファイルのパス
+    @param stamp source_stampの戻り値
+    @return 変わっていなければ現在の更新時刻で記録し直した値、変わっていればNone
+    """
+    try:
+        stat = file_stat(path)
+    except OSError:
+        return None
+    if stat["size"] != stamp.get("size"):
+        return None
+    if stat["mtime_ns"] == stamp.get("mtime_ns") and \
+            stat["mtime_ns"] < stamp.get("recorded_ns", 0) - RACY_NS:
+        return stamp
+    if file_digest(path) != stamp.get("sha256"):
+        return None
+    return dict(stat, sha256=stamp["sha256"], recorded_ns=time.time_ns())
+
+def write_snapshot(path: str, roster: Roster, sources: Dict[str, Dict]):
+    """
+    スナップショットを保存する（一時ファイル経由で置き換え）
+
+    @param path スナップショットファイルのパス
+    @param roster 保存するRoster
+    @param sources 元ファイルの種類（user/prob）ごとのサイズ・更新時刻・ハッシュ
+    """
+    header = json.dumps({
+        "sources": sources,
+        "built_ns": time.time_ns(),
+        "byteorder": sys.byteorder,
+        "problems": roster.problems,
+        "students": [st.fields() for st in roster.students],
+    }, ensure_ascii=False).encode("utf-8")
+    offset = _PREFIX.size + len(header)
+    padding = -offset % ITEMSIZE
+    parts = [_PREFIX.pack(MAGIC, len(header)), header, b"\0" * padding]
+    for values in (roster.scores, roster.dates, roster.judge_ids):
+        parts.append(values.tobytes())
+    atomic_write_bytes(path, b"".join(parts))
+
+def read_header(f) -> Tuple[Dict, int]:
+    """
+    スナップショットのヘッダーを読み込む
+
+    @param f バイナリモードで開いたスナップショットファイル
+    @return (ヘッダー, 配列の開始位置)
+    @throws ValueError 形式が正しくない場合
+    """
+    prefix = f.read(_PREFIX.size)
+    if len(prefix) != _PREFIX.size:
+        raise ValueError("ファイルが短すぎます")
+    magic, length = _PREFIX.unpack(prefix)
+    if magic != MAGIC:
+        raise ValueError("スナップショットの形式ではありません")
+    header = json.loads(f.read(length).decode("utf-8"))
+    if header.get("byteorder") != sys.byteorder:
+        raise ValueError("バイト順が異なります")
+    offset = _PREFIX.size + length
+    return header, offset + (-offset % ITEMSIZE)
+
+def map_snapshot(path: str) -> Tuple[Dict, Roster]:
+    """
+    スナップショットを読み込む。配列はファイルをメモリマップした領域をそのまま参照する
+    （書き込み時コピーのため、set_cellによる変更はファイルに反映されない）。
+    マップは配列を使い終えたらRoster.releaseで閉じる。
+
+    @param path スナップショットファイルのパス
+    @return (ヘッダー, Roster)
+    @throws ValueError 形式が正しくない場合
+    """
+    with open(path, "rb") as f:
+        header, offset = read_header(f)
+        problems = header["problems"]
+        students = [Student(*fields) for fields in header["students"]]
+        count = len(students) * len(problems)
+        size = count * ITEMSIZE
+        if os.fstat(f.fileno()).st_size != offset + 3 * size:
+            raise ValueError("配列の大きさが一致しません")
+        if size == 0:
+            empty = array(TYPECODE)
+            return header, Roster(problems, students, empty, array(TYPECODE), array(TYPECODE))
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    with memoryview(mapping) as view:
+        scores, dates, judge_ids = (view[offset + i * size:offset + (i + 1) * size].cast(TYPECODE)
+                                    for i in range(3))
+    return header, Roster(problems, students, scores, dates, judge_ids, mapping)
+
+def load_roster_snapshot(user_csv: str = "user.csv", prob_csv: str = "prob.csv",
+                         path: Optional[str] = None) -> Roster:
+    """
+    user.csvとprob.csvを読み込む。スナップショットが最新ならそれを使い、
+    古い・存在しない場合はuser.csvを解析してスナップショットを作り直す。
+
+    @param user_csv user.csvのパス
+    @param prob_csv 問題定義ファイル
+    @param path スナップショットファイルのパス（省略時はuser.csvの隣）
+    @return Roster
+    """
+    path = path or snapshot_path(user_csv)
+    files = {"user": user_csv, "prob": prob_csv}
+    stats = {kind: file_stat(name) for kind, name in files.items()}
+
+    roster = None
+    recorded = {}
+    if os.path.exists(path):
+        try:
+            header, roster = map_snapshot(path)
+            recorded = {kind: header["sources"][kind] for kind in files}
+            racy = any(recorded[kind]["mtime_ns"] >= header["built_ns"] - RACY_NS
+                       for kind in files)
+        except (ValueError, KeyError, TypeError, OSError) as e:
+            print(f"警告: {path}を読み込めませんでした（作り直します） - {e}")
+            if roster is not None:
+                roster.release()
+            roster = None
+        else:
+            if not racy and all(recorded[kind]["size"] == stats[kind]["size"] and
+                                recorded[kind]["mtime_ns"] == stats[kind]["mtime_ns"]
+                                for kind in files):
+                return roster
+
+    # 以降はスナップショットを作り直す（置き換える）ため、マップしたファイルを保持しない
+    if roster is not None:
+        roster.release()
+    digests = {kind: file_digest(name) for kind, name in files.items()}
+    if roster is None or any(recorded[kind].get("size") != stats[kind]["size"] or
+                             recorded[kind].get("sha256") != digests[kind] for kind in files):
+        roster = load_roster(user_csv, prob_csv)
+    # 内容が同じ（更新時刻だけが変わった）場合も記録し直し、次回はハッシュの比較を省く
+    sources = {kind: dict(stats[kind], sha256=digests[kind]) for kind in files}
+    try:
+        write_snapshot(path, roster, sources)
+    except OSError as e:
+        print(f"警告: {path}を保存できませんでした - {e}")
+    return roster
+
+def load_report_roster(user_csv: str = "user.csv", prob_csv: str = "prob.csv",
+                       db: Optional[str] = None, snapshot: bool = True) -> Roster:
+    """
+    レポート出力用にデータを読み込む（データベース指定時・snapshot=False時はスナップショットを使わない）
+
+    @param user_csv user.csvのパス
+    @param prob_csv 問題定義ファイル
+    @param db user.csvの代わりに読み込むSQLiteデータベース
+    @param snapshot スナップショットを使用するか
+    @return Roster
+    """
+    if db or not snapshot:
+        return load_roster(user_csv, prob_csv, db)
+    return load_roster_snapshot(user_csv, prob_csv)
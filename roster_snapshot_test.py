@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file roster_snapshot_test.py
+@brief roster_snapshot.pyのテストコード
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import roster_snapshot
+from roster import load_roster
+from roster_snapshot import load_roster_snapshot, snapshot_path
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+class TestRosterSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.user = os.path.join(self.dir, "user.csv")
+        self.prob = os.path.join(self.dir, "prob.csv")
+        shutil.copy(os.path.join(HERE, "test_data", "user_test.csv"), self.user)
+        shutil.copy(os.path.join(HERE, "test_data", "prob_test.csv"), self.prob)
+        self.backdate()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def backdate(self):
+        """更新時刻を過去にして、スナップショットの作成直後でも更新時刻だけで判定させる"""
+        past = time.time() - 3600
+        for path in (self.user, self.prob):
+            os.utime(path, (past, past))
+
+    def load(self):
+        """load_rosterの呼び出し回数を数えながら読み込む"""
+        with mock.patch.object(roster_snapshot, "load_roster", wraps=load_roster) as parse:
+            roster = load_roster_snapshot(self.user, self.prob)
+        return roster, parse.call_count
+
+    def test_reuse(self):
+        """2回目以降は解析せず、スナップショットの配列を参照することのテスト"""
+        expected = load_roster(self.user, self.prob)
+        first, parsed = self.load()
+        self.assertEqual(parsed, 1)
+        self.assertTrue(os.path.exists(snapshot_path(self.user)))
+        second, parsed = self.load()
+        self.assertEqual(parsed, 0)
+        self.assertIsInstance(second.scores, memoryview)
+        self.assertEqual(second.to_rows(), expected.to_rows())
+        self.assertEqual(first.to_rows(), expected.to_rows())
+        # 変更は読み込んだデータだけに反映され、スナップショットは変わらない
+        second.set_cell(0, 0, 0, 0, 0)
+        self.assertEqual(self.load()[0].to_rows(), expected.to_rows())
+
+        # 解放後も変更を含めてそのまま使え、メモリマップは閉じている
+        mapping = second.mapping
+        changed = second.to_rows()
+        second.release()
+        self.assertTrue(mapping.closed)
+        self.assertIsNone(second.mapping)
+        self.assertEqual(second.to_rows(), changed)
+        second.set_cell(0, 0, 100, 1, 1)
+        self.assertEqual(second.cell(0, 0), (100, 1, 1))
+
+    def test_rebuild_on_change(self):
+        """user.csvの内容が変わると作り直し、更新時刻だけが変わった場合は解析しないことのテスト"""
+        self.load()
+        rows = load_roster(self.user, self.prob).to_rows()
+        rows[0][4] = "0" if rows[0][4] != "0" else "100"
+        with open(self.user, "w", encoding="utf-8") as f:
+            f.write("\n".join(",".join(map(str, row)) for row in rows) + "\n")
+        self.backdate()
+        mapped = []
+        original = roster_snapshot.map_snapshot
+
+        def map_snapshot(path):
+            header, roster = original(path)
+            mapped.append(roster)
+            return header, roster
+
+        with mock.patch.object(roster_snapshot, "map_snapshot", side_effect=map_snapshot):
+            roster, parsed = self.load()
+        self.assertEqual(parsed, 1)
+        self.assertEqual(roster.to_rows(), load_roster(self.user, self.prob).to_rows())
+
+        os.utime(self.user)
+        with mock.patch.object(roster_snapshot, "map_snapshot", side_effect=map_snapshot):
+            roster, parsed = self.load()
+        self.assertEqual(parsed, 0)
+        # 作り直す前に古いスナップショットのマップを閉じ、内容が同じなら複製したデータを返す
+        self.assertEqual([r.mapping for r in mapped], [None, None])
+        self.assertIs(roster, mapped[1])
+
+    def test_corrupt_snapshot(self):
+        """壊れたスナップショットは作り直すことのテスト"""
+        self.load()
+        with open(snapshot_path(self.user), "r+b") as f:
+            f.truncate(os.path.getsize(snapshot_path(self.user)) - 8)
+        roster, parsed = self.load()
+        self.assertEqual(parsed, 1)
+        self.assertEqual(roster.to_rows(), load_roster(self.user, self.prob).to_rows())
+        self.assertEqual(self.load()[1], 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file roster_test.py
+@brief roster.pyのテストコード
+"""
+
+import unittest
+
+from roster import Roster, NO_SUBMISSION
+
+class TestRoster(unittest.TestCase):
+    def setUp(self):
+        """テスト用のデータを作成"""
+        self.probs = ["ITP1_1_A", "ITP1_1_B"]
+        self.rows = [
+            ["123456", "テスト", "太郎", "test1", "100", "1683936000000", "12345", "0", "0", "-1"],
+            ["234567", "テスト", "花子", "test2", "80", "1683936100000", "12346", "100",
+             "1683936200000", "12347"],
+        ]
+
+    def test_round_trip(self):
+        """user.csv形式の行と相互に変換できることのテスト"""
+        roster = Roster.from_rows(self.rows, self.probs)
+        self.assertEqual(len(roster.students), 2)
+        self.assertEqual(roster.students[1].user_id, "test2")
+        self.assertEqual(roster.to_rows(), self.rows)
+
+    def test_invalid_and_missing_values(self):
+        """不正な値・不足した列が初期値になることのテスト"""
+        rows = [["123456", "テスト", "太郎", "test1", "abc", "", "x"], ["234567", "テスト", "花子", "test2"]]
+        roster = Roster.from_rows(rows, self.probs)
+        for s in range(2):
+            for p in range(2):
+                self.assertEqual(roster.cell(s, p), (0, 0, NO_SUBMISSION))
+
+    def test_set_cell(self):
+        """セルの更新のテスト"""
+        roster = Roster.from_rows(self.rows, self.probs)
+        roster.set_cell(0, 1, 100, 1683936300000, 12348)
+        self.assertEqual(roster.cell(0, 1), (100, 1683936300000, 12348))
+        self.assertEqual(roster.to_rows()[0][7:], ["100", "1683936300000", "12348"])
+        self.assertEqual(list(roster.scores[roster.row_slice(0)]), [100, 100])
+
+if __name__ == "__main__":
+    unittest.main()
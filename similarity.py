@@ -0,0 +1,526 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file similarity.py
+@brief ダウンロードした提出プログラムから、互いによく似た（コピーの疑いがある）提出を検出する
+
+問題ごとに全ての組を比較する代わりに、次の手順で似た提出の候補だけを比較します。
+
+1. ソースコードをトークンに分割し、識別子・リテラルを抽象化する
+   （変数名の変更・文字列や数値の書き換え・空白やコメントの違いを無視する）
+2. 連続するトークンの組（シングル）の集合からMinHashの署名を作る
+3. 署名を帯（band）に分けたLSHの索引で、いずれかの帯が一致する提出だけを候補にする
+4. 候補の推定類似度（Jaccard係数）がしきい値以上なら同じグループにまとめる
+
+署名はjudgeIdをキーとしてSQLiteファイルにキャッシュするため、
+再実行時は新しくダウンロードした提出だけを処理します。
+
+使用方法:
+  python3 similarity.py                          # downloads/の提出を検査
+  python3 similarity.py --archive sources.sqlite # アーカイブの提出を検査
+  python3 similarity.py --threshold 0.9 -o similar.tsv
+"""
+
+import argparse
+import builtins
+import csv
+import io
+import json
+import keyword
+import operator
+import os
+import random
+import re
+import sqlite3
+import token
+import tokenize
+import zlib
+from array import array
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from roster import Roster
+from source_archive import ARCHIVE_FILE, DOWNLOAD_DIR, MANIFEST_FILE, SourceArchive, load_manifest
+
+# デフォルト設定
+SIGNATURE_CACHE_FILE = "signatures.sqlite"
+DEFAULT_NUM_PERM = 128      # MinHashの署名の長さ
+DEFAULT_BANDS = 32          # LSHの帯の数（1帯あたり NUM_PERM / BANDS 個）
+DEFAULT_SHINGLE = 5         # シングルのトークン数
+DEFAULT_THRESHOLD = 0.8     # 類似とみなす推定Jaccard係数
+DEFAULT_MIN_TOKENS = 30     # これより短いプログラムは比較しない（Hello Worldなど）
+SEED = 1
+
+# 正規化方法を変更したら上げる（キャッシュした署名を作り直す）
+TOKENIZER_VERSION = 1
+
+MASK64 = (1 << 64) - 1
+
+# 抽象化せずに残す名前（予約語と組み込み関数）
+KEEP_NAMES = frozenset(keyword.kwlist) | frozenset(dir(builtins))
+
+# f文字列の内部のトークン（Python 3.12以降）
+FSTRING_TYPES = frozenset(getattr(token, name) for name in
+                          ("FSTRING_START", "FSTRING_MIDDLE", "FSTRING_END") if hasattr(token, name))
+
+# tokenizeで解析できないソースコード用の簡易トークン
+FALLBACK_TOKEN = re.compile(r"""[A-Za-z_]\w*|\d[\w.]*|"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|\S""")
+
+def normalize_tokens(source: str) -> List[str]:
+    """
+    ソースコードをトークンに分割して正規化する。
+    予約語・組み込み関数以外の識別子はN、数値は0、文字列はSに置き換え、
+    コメント・空行・空白の違いは無視する（インデントの増減は残す）。
+
+    @param source ソースコード
+    @return 正規化したトークンのリスト
+    """
+    tokens = []
+    try:
+        for tok in tokenize.generate_tokens(io.StringIO(source).readline):
+            if tok.type == token.NAME:
+                tokens.append(tok.string if tok.string in KEEP_NAMES else "N")
+            elif tok.type == token.NUMBER:
+                tokens.append("0")
+            elif tok.type == token.STRING or tok.type in FSTRING_TYPES:
+                if not tokens or tokens[-1] != "S":
+                    tokens.append("S")
+            elif tok.type in (token.NEWLINE, token.INDENT, token.DEDENT):
+                tokens.append(token.tok_name[tok.type])
+            elif tok.type == token.OP:
+                tokens.append(tok.string)
+        return tokens
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        pass
+
+    # Python以外の言語や構文エラーのあるコードは簡易的に分割する
+    tokens = []
+    for word in FALLBACK_TOKEN.findall(source):
+        if word[0] in "\"'":
+            tokens.append("S")
+        elif word[0].isdigit():
+            tokens.append("0")
+        elif word[0].isalpha() or word[0] == "_":
+            tokens.append(word if word in KEEP_NAMES else "N")
+        else:
+            tokens.append(word)
+    return tokens
+
+def shingles(tokens: Sequence[str], k: int = DEFAULT_SHINGLE) -> Set[int]:
+    """
+    連続するk個のトークンの組をハッシュ値の集合にする
+
+    @param tokens 正規化したトークンのリスト
+    @param k シングルのトークン数
+    @return 32ビットのハッシュ値の集合
+    """
+    if len(tokens) < k:
+        return {zlib.crc32(" ".join(tokens).encode("utf-8"))}
+    return {zlib.crc32(" ".join(tokens[i:i + k]).encode("utf-8"))
+            for i in range(len(tokens) - k + 1)}
+
+class MinHasher:
+    """ハッシュ関数の族 h(x) = (a * x + b) mod 2^64 の上位32ビットによるMinHash"""
+
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, seed: int = SEED):
+        """
+        @param num_perm 署名の長さ（ハッシュ関数の数）
+        @param seed 係数を決める乱数のシード値
+        """
+        rnd = random.Random(seed)
+        self.num_perm = num_perm
+        self.params = [(rnd.getrandbits(64) | 1, rnd.getrandbits(64)) for _ in range(num_perm)]
+
+    def signature(self, values: Iterable[int]) -> Tuple[int, ...]:
+        """
+        集合のMinHash署名を求める
+
+        @param values シングルのハッシュ値の集合
+        @return 長さnum_permの署名
+        """
+        values = list(values)
+        # 上位32ビットの最小値は64ビット値の最小値の上位32ビットと等しい
+        return tuple(min([(a * x + b) & MASK64 for x in values]) >> 32
+                     for a, b in self.params)
+
+def estimate_similarity(sig1: Sequence[int], sig2: Sequence[int]) -> float:
+    """
+    2つの署名から集合のJaccard係数を推定する
+
+    @param sig1 署名
+    @param sig2 署名
+    @return 推定類似度（0〜1）
+    """
+    return sum(map(operator.eq, sig1, sig2)) / len(sig1)
+
+class LSHIndex:
+    """署名を帯に分けて、いずれかの帯が一致する組を候補とする索引"""
+
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, bands: int = DEFAULT_BANDS):
+        """
+        @param num_perm 署名の長さ
+        @param bands 帯の数（num_permを割り切れること）
+        """
+        if num_perm % bands:
+            raise ValueError(f"署名の長さ{num_perm}は帯の数{bands}で割り切れません")
+        self.rows = num_perm // bands
+        self.bands = bands
+        self.buckets: List[Dict[Tuple[int, ...], List[int]]] = [defaultdict(list)
+                                                                 for _ in range(bands)]
+
+    def add(self, key: int, sig: Sequence[int]):
+        """
+        署名を登録する
+
+        @param key 署名の番号
+        @param sig 署名
+        """
+        r = self.rows
+        for band, buckets in enumerate(self.buckets):
+            buckets[tuple(sig[band * r:(band + 1) * r])].append(key)
+
+    def shared_buckets(self) -> Iterator[List[int]]:
+        """
+        2件以上が同じ値になった帯のバケットを返す
+
+        @return 番号のリストのイテレータ（登録順）
+        """
+        for buckets in self.buckets:
+            for keys in buckets.values():
+                if len(keys) > 1:
+                    yield keys
+
+class SignatureCache:
+    """judgeIdをキーとしたMinHash署名のキャッシュ（SQLite）"""
+
+    def __init__(self, path: str, params: Dict):
+        """
+        @param path キャッシュファイルのパス
+        @param params 署名の作成条件（前回と異なる場合はキャッシュを破棄する）
+        """
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS signatures ("
+            " judge_id INTEGER PRIMARY KEY, tokens INTEGER NOT NULL, signature BLOB NOT NULL);")
+        value = json.dumps(params, sort_keys=True)
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'params'").fetchone()
+        if row is None or row[0] != value:
+            self.conn.execute("DELETE FROM signatures")
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('params', ?)", (value,))
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, judge_id: int) -> Optional[Tuple[int, Tuple[int, ...]]]:
+        """
+        キャッシュした署名を返す
+
+        @param judge_id judgeId
+        @return (トークン数, 署名)（キャッシュになければNone）
+        """
+        row = self.conn.execute("SELECT tokens, signature FROM signatures WHERE judge_id = ?",
+                                (judge_id,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0], tuple(array("Q", row[1]))
+
+    def put(self, judge_id: int, tokens: int, sig: Sequence[int]):
+        """
+        署名を保存する（確定はclose時）
+
+        @param judge_id judgeId
+        @param tokens トークン数
+        @param sig 署名
+        """
+        self.conn.execute("INSERT OR REPLACE INTO signatures VALUES (?, ?, ?)",
+                          (judge_id, tokens, array("Q", sig).tobytes()))
+
+    def close(self):
+        """書き込みを確定して閉じる"""
+        self.conn.commit()
+        self.conn.close()
+
+class Submission:
+    """検査対象の提出1件"""
+    __slots__ = ("student_id", "problem_id", "judge_id", "tokens", "signature")
+
+    def __init__(self, student_id: str, problem_id: str, judge_id: Optional[int],
+                 tokens: int, signature: Tuple[int, ...]):
+        """
+        @param student_id 学籍番号
+        @param problem_id 問題ID
+        @param judge_id judgeId（不明ならNone）
+        @param tokens 正規化後のトークン数
+        @param signature MinHash署名
+        """
+        self.student_id = student_id
+        self.problem_id = problem_id
+        self.judge_id = judge_id
+        self.tokens = tokens
+        self.signature = signature
+
+def split_filename(filename: str, problems: Sequence[str]) -> Optional[Tuple[str, str]]:
+    """
+    「学籍番号_問題ID.py」形式のファイル名を分解する
+
+    @param filename ファイル名
+    @param problems 問題IDのリスト（空なら最初の「_」で分ける）
+    @return (学籍番号, 問題ID)（形式が異なればNone）
+    """
+    if not filename.endswith(".py"):
+        return None
+    stem = filename[:-3]
+    for pid in problems:
+        if stem.endswith("_" + pid) and len(stem) > len(pid) + 1:
+            return stem[:-len(pid) - 1], pid
+    if problems or "_" not in stem:
+        return None
+    student_id, pid = stem.split("_", 1)
+    return student_id, pid
+
+def iter_downloads(directory: str = DOWNLOAD_DIR,
+                   problems: Sequence[str] = ()) -> Iterator[Tuple[str, str, Optional[int], str]]:
+    """
+    downloads/のソースコードを列挙する（judgeIdはmanifest.jsonから取得）
+
+    @param directory ダウンロード先ディレクトリ
+    @param problems 問題IDのリスト
+    @return (学籍番号, 問題ID, judgeId, ソースコード)のイテレータ
+    """
+    manifest = load_manifest(os.path.join(directory, MANIFEST_FILE))
+    for filename in sorted(os.listdir(directory)):
+        parsed = split_filename(filename, problems)
+        if parsed is None:
+            continue
+        with open(os.path.join(directory, filename), "rb") as f:
+            source = f.read().decode("utf-8", errors="replace")
+        entry = manifest.get(filename)
+        yield parsed[0], parsed[1], entry.get("judgeId") if entry else None, source
+
+def build_submissions(sources: Iterable[Tuple[str, str, Optional[int], str]],
+                      hasher: MinHasher, k: int = DEFAULT_SHINGLE,
+                      cache: Optional[SignatureCache] = None) -> List[Submission]:
+    """
+    各提出の署名を求める（judgeIdが分かる提出はキャッシュを使用する）
+
+    @param sources (学籍番号, 問題ID, judgeId, ソースコード)のイテラブル
+    @param hasher MinHasher
+    @param k シングルのトークン数
+    @param cache 署名のキャッシュ
+    @return 提出のリスト
+    """
+    submissions = []
+    for student_id, problem_id, judge_id, source in sources:
+        cached = cache.get(judge_id) if cache is not None and judge_id else None
+        if cached is None:
+            tokens = normalize_tokens(source)
+            sig = hasher.signature(shingles(tokens, k))
+            cached = (len(tokens), sig)
+            if cache is not None and judge_id:
+                cache.put(judge_id, len(tokens), sig)
+        submissions.append(Submission(student_id, problem_id, judge_id, cached[0], cached[1]))
+    return submissions
+
+def find_clusters(submissions: Sequence[Submission], threshold: float = DEFAULT_THRESHOLD,
+                  bands: int = DEFAULT_BANDS) -> List[Tuple[List[int], float]]:
+    """
+    同じ問題の提出の中から、推定類似度がしきい値以上の組をつないだグループを求める
+
+    @param submissions 同じ問題の提出のリスト
+    @param threshold 類似とみなす推定類似度
+    @param bands LSHの帯の数
+    @return (提出の位置のリスト, グループ内の最大の推定類似度)のリスト（大きいグループから順）
+    """
+    if not submissions:
+        return []
+    parent = list(range(len(submissions)))
+    best: Dict[int, float] = {}
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(i: int, j: int, sim: float):
+        ri, rj = find(i), find(j)
+        root = min(ri, rj)
+        parent[max(ri, rj)] = root
+        best[root] = max(sim, best.pop(ri, 0.0), best.pop(rj, 0.0))
+
+    # 署名が完全に一致する提出（同じコードの写しなど）は先にまとめ、代表だけを索引に登録する
+    index = LSHIndex(len(submissions[0].signature), bands)
+    first: Dict[Tuple[int, ...], int] = {}
+    for i, sub in enumerate(submissions):
+        j = first.setdefault(sub.signature, i)
+        if j != i:
+            union(j, i, 1.0)
+        else:
+            index.add(i, sub.signature)
+
+    # バケット内の全ての組ではなく、先頭（と直前）の提出とだけ比較する。
+    # ほとんど同じ解答が多い問題でもバケットの大きさに比例する回数で済み、
+    # 同じグループになったものは比較しない
+    for keys in index.shared_buckets():
+        leader = keys[0]
+        for prev, i in zip(keys, keys[1:]):
+            if find(i) == find(leader):
+                continue
+            sig = submissions[i].signature
+            sim = estimate_similarity(submissions[leader].signature, sig)
+            if sim >= threshold:
+                union(leader, i, sim)
+                continue
+            if prev != leader and find(prev) != find(i):
+                sim = estimate_similarity(submissions[prev].signature, sig)
+                if sim >= threshold:
+                    union(prev, i, sim)
+
+    groups: Dict[int, List[int]] = defaultdict(list)
+    for i in range(len(submissions)):
+        groups[find(i)].append(i)
+    clusters = [(members, best.get(root, 1.0)) for root, members in groups.items()
+                if len(members) > 1]
+    clusters.sort(key=lambda c: (-len(c[0]), -c[1], c[0][0]))
+    return clusters
+
+def detect(submissions: Sequence[Submission], threshold: float = DEFAULT_THRESHOLD,
+           bands: int = DEFAULT_BANDS, min_tokens: int = DEFAULT_MIN_TOKENS
+           ) -> Dict[str, List[Tuple[List[Submission], float]]]:
+    """
+    問題ごとに似た提出のグループを求める
+
+    @param submissions 提出のリスト
+    @param threshold 類似とみなす推定類似度
+    @param bands LSHの帯の数
+    @param min_tokens これより短い提出は比較しない
+    @return 問題IDごとの(提出のリスト, 最大の推定類似度)のリスト
+    """
+    by_problem: Dict[str, List[Submission]] = defaultdict(list)
+    for sub in submissions:
+        if sub.tokens >= min_tokens:
+            by_problem[sub.problem_id].append(sub)
+    result = {}
+    for pid in sorted(by_problem):
+        subs = by_problem[pid]
+        clusters = find_clusters(subs, threshold, bands)
+        if clusters:
+            result[pid] = [([subs[i] for i in members], sim) for members, sim in clusters]
+    return result
+
+def write_report(path: str, result: Dict[str, List[Tuple[List[Submission], float]]]):
+    """
+    検出結果をTSVファイルに書き込む
+
+    @param path 出力ファイル
+    @param result detectの結果
+    """
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, delimiter="\t")
+        writer.writerow(["問題ID", "グループ", "類似度", "学籍番号", "judgeId"])
+        for pid, clusters in result.items():
+            for n, (members, sim) in enumerate(clusters, 1):
+                for sub in members:
+                    writer.writerow([pid, n, f"{sim:.2f}", sub.student_id,
+                                     "" if sub.judge_id is None else sub.judge_id])
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """
+    類似検出の引数を追加する
+
+    @param parser 引数パーサー
+    """
+    parser.add_argument("--dir", default=DOWNLOAD_DIR,
+                        help=f"提出プログラムのディレクトリ（デフォルト: {DOWNLOAD_DIR}）")
+    parser.add_argument("--archive", nargs="?", const=ARCHIVE_FILE,
+                        help=f"ディレクトリの代わりにアーカイブを検査します（デフォルト: {ARCHIVE_FILE}）")
+    parser.add_argument("-p", "--problems", default="prob.csv",
+                        help="問題定義ファイル（ファイル名の解釈に使用、デフォルト: prob.csv）")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"類似とみなす推定類似度（デフォルト: {DEFAULT_THRESHOLD}）")
+    parser.add_argument("--min-tokens", type=int, default=DEFAULT_MIN_TOKENS,
+                        help=f"これより短い提出は比較しない（デフォルト: {DEFAULT_MIN_TOKENS}トークン）")
+    parser.add_argument("--num-perm", type=int, default=DEFAULT_NUM_PERM,
+                        help=f"MinHashの署名の長さ（デフォルト: {DEFAULT_NUM_PERM}）")
+    parser.add_argument("--bands", type=int, default=DEFAULT_BANDS,
+                        help=f"LSHの帯の数（デフォルト: {DEFAULT_BANDS}）")
+    parser.add_argument("--shingle", type=int, default=DEFAULT_SHINGLE,
+                        help=f"シングルのトークン数（デフォルト: {DEFAULT_SHINGLE}）")
+    parser.add_argument("--signature-cache", default=SIGNATURE_CACHE_FILE,
+                        help=f"署名のキャッシュファイル（デフォルト: {SIGNATURE_CACHE_FILE}）")
+    parser.add_argument("--no-cache", action="store_true", help="署名をキャッシュしません")
+    parser.add_argument("-o", "--output", help="検出結果を書き込むTSVファイル")
+
+def run_similarity(args: argparse.Namespace, roster: Optional[Roster] = None) -> Optional[Roster]:
+    """
+    コマンドライン引数に従って似た提出を検出して表示する
+
+    @param args コマンドライン引数（add_argumentsの引数）
+    @param roster 読み込み済みのデータ（問題IDの一覧に使用、省略時はprob.csvを読む）
+    @return rosterをそのまま返す
+    """
+    if args.num_perm % args.bands:
+        print("エラー: --num-permは--bandsで割り切れる値にしてください")
+        return roster
+
+    problems = roster.problems if roster is not None else []
+    if roster is None and os.path.exists(args.problems):
+        with open(args.problems, "r", newline="", encoding="utf-8") as f:
+            problems = next(csv.reader(f), [])
+
+    if args.archive:
+        if not os.path.exists(args.archive):
+            print(f"エラー: {args.archive}が見つかりません")
+            return roster
+        archive = SourceArchive(args.archive)
+        sources: Iterable = archive.iter_sources()
+    else:
+        if not os.path.isdir(args.dir):
+            print(f"エラー: {args.dir}が見つかりません")
+            return roster
+        archive = None
+        sources = iter_downloads(args.dir, problems)
+
+    hasher = MinHasher(args.num_perm)
+    cache = None
+    if not args.no_cache:
+        params = {"num_perm": args.num_perm, "shingle": args.shingle, "seed": SEED,
+                  "tokenizer": TOKENIZER_VERSION}
+        cache = SignatureCache(args.signature_cache, params)
+    try:
+        submissions = build_submissions(sources, hasher, args.shingle, cache)
+    finally:
+        if archive is not None:
+            archive.close()
+        if cache is not None:
+            cache.close()
+
+    result = detect(submissions, args.threshold, args.bands, args.min_tokens)
+    skipped = sum(1 for sub in submissions if sub.tokens < args.min_tokens)
+    print(f"提出: {len(submissions)}件（{args.min_tokens}トークン未満の{skipped}件は対象外）")
+    if cache is not None:
+        print(f"署名のキャッシュ: ヒット {cache.hits}件 / 新規 {cache.misses}件")
+
+    if not result:
+        print("似た提出は見つかりませんでした。")
+    for pid, clusters in result.items():
+        print(f"\n{pid}")
+        for members, sim in clusters:
+            print(f"  類似度{sim:.2f}: " + ", ".join(sub.student_id for sub in members))
+
+    if args.output:
+        write_report(args.output, result)
+        print(f"\n{args.output} に保存しました。")
+    return roster
+
+def main():
+    parser = argparse.ArgumentParser(description="似た提出プログラム（コピーの疑い）を検出")
+    add_arguments(parser)
+    args = parser.parse_args()
+    run_similarity(args)
+
+if __name__ == "__main__":
+    main()
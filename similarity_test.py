@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file similarity_test.py
+@brief similarity.pyのテストコード
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from similarity import (MinHasher, SignatureCache, build_submissions, detect,
+                        normalize_tokens, split_filename)
+
+ORIGINAL = '''import sys
+def solve(n, arr):
+    total = 0
+    for i in range(n):
+        if arr[i] % 2 == 0:
+            total += arr[i] * 3
+    return total
+n = int(input())
+a = list(map(int, input().split()))
+print(solve(n, a))
+'''
+
+# 識別子・数値の書き換えとコメント・空行の追加だけの写し
+RENAMED = '''import sys
+
+def f(m, xs):  # 合計
+    s = 0
+    for j in range(m):
+        if xs[j] % 2 == 0:
+            s += xs[j] * 7
+    return s
+m = int(input())
+b = list(map(int, input().split()))
+print(f(m, b))
+'''
+
+DIFFERENT = '''while True:
+    try:
+        a, b = map(int, input().split())
+    except EOFError:
+        break
+    c = a + b
+    print(len(str(c)), c % 10, sorted([a, b, c]))
+'''
+
+class TestSimilarity(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_normalize_tokens(self):
+        """識別子・リテラルの抽象化とコメントの除去のテスト"""
+        self.assertEqual(normalize_tokens(ORIGINAL), normalize_tokens(RENAMED))
+        self.assertEqual(normalize_tokens("x = 'a' + 1  # c\n"),
+                         ["N", "=", "S", "+", "0", "NEWLINE"])
+        # Pythonとして解析できないコードも簡易的に分割できる
+        self.assertEqual(normalize_tokens('x = 1; y = """abc\n'),
+                         ["N", "=", "0", ";", "N", "=", "S", "S", "N"])
+
+    def test_split_filename(self):
+        """ファイル名から学籍番号と問題IDを取り出すテスト"""
+        self.assertEqual(split_filename("s01_ITP1_1_A.py", ["ITP1_1_A"]), ("s01", "ITP1_1_A"))
+        self.assertEqual(split_filename("s01_ITP1_1_A.py", []), ("s01", "ITP1_1_A"))
+        self.assertIsNone(split_filename("manifest.json", []))
+        self.assertIsNone(split_filename("s01_ITP1_1_B.py", ["ITP1_1_A"]))
+
+    def test_detect_clusters_and_cache(self):
+        """似た提出だけがまとめられ、再実行時は署名をキャッシュから読むことのテスト"""
+        sources = [("s1", "P1", 11, ORIGINAL), ("s2", "P1", 12, RENAMED),
+                   ("s3", "P1", 13, DIFFERENT), ("s4", "P2", 14, ORIGINAL),
+                   ("s5", "P1", 15, "print(1)\n")]
+        path = os.path.join(self.dir, "signatures.sqlite")
+        params = {"num_perm": 128}
+
+        cache = SignatureCache(path, params)
+        submissions = build_submissions(sources, MinHasher(), cache=cache)
+        self.assertEqual((cache.hits, cache.misses), (0, 5))
+        cache.close()
+
+        result = detect(submissions, threshold=0.8)
+        self.assertEqual(list(result), ["P1"])
+        members, sim = result["P1"][0]
+        self.assertEqual([sub.student_id for sub in members], ["s1", "s2"])
+        self.assertEqual(sim, 1.0)
+
+        cache = SignatureCache(path, params)
+        again = build_submissions(sources, MinHasher(), cache=cache)
+        self.assertEqual((cache.hits, cache.misses), (5, 0))
+        cache.close()
+        self.assertEqual([sub.signature for sub in again], [sub.signature for sub in submissions])
+
+        # 作成条件が変わればキャッシュを破棄する
+        cache = SignatureCache(path, {"num_perm": 64})
+        self.assertIsNone(cache.get(11))
+        cache.close()
+
+if __name__ == "__main__":
+    unittest.main()
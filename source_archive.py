@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file source_archive.py
+@brief ダウンロードしたソースコードを1つのSQLiteファイルにまとめて保存するアーカイブ
+
+ソースコードは内容のSHA-256をキーとしてzlib圧縮して1回だけ保存し（同じコードは共有）、
+(学籍番号, 問題ID, judgeId)からそのハッシュを引く索引を持ちます。
+大量の小さな.pyファイルの代わりに1ファイルで管理でき、必要に応じて
+従来の「学籍番号_問題ID.py」形式のディレクトリに書き出せます。
+
+使用方法:
+  python3 source_archive.py stats --archive sources.sqlite
+  python3 source_archive.py export --archive sources.sqlite -o downloads
+  python3 source_archive.py prune --archive sources.sqlite
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import zlib
+from typing import Dict, Iterator, Optional, Tuple
+
+from backup_store import atomic_write_bytes
+
+# デフォルトのアーカイブファイル
+ARCHIVE_FILE = "sources.sqlite"
+
+# .pyファイルとして保存する場合のデフォルトのディレクトリと、その中のファイル一覧
+DOWNLOAD_DIR = "downloads"
+MANIFEST_FILE = "manifest.json"
+
+# iter_sourcesで展開済みのまま保持するソースコードの数（最近使ったもの）
+DECODED_CACHE_SIZE = 64
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256 TEXT PRIMARY KEY,      -- ソースコード（UTF-8）のハッシュ
+    size INTEGER NOT NULL,        -- 圧縮前のバイト数
+    data BLOB NOT NULL            -- zlib圧縮したソースコード
+);
+CREATE TABLE IF NOT EXISTS sources (
+    student_id TEXT NOT NULL,     -- 学籍番号
+    problem_id TEXT NOT NULL,     -- 問題ID
+    judge_id INTEGER NOT NULL,
+    sha256 TEXT NOT NULL REFERENCES blobs (sha256),
+    PRIMARY KEY (student_id, problem_id)
+);
+CREATE INDEX IF NOT EXISTS idx_sources_sha256 ON sources (sha256);
+"""
+
+def content_hash(data: bytes) -> str:
+    """
+    ファイル内容のハッシュを返す
+
+    @param data ファイルの内容
+    @return SHA-256の16進文字列
+    """
+    return hashlib.sha256(data).hexdigest()
+
+def load_manifest(path: str) -> Dict[str, Dict]:
+    """
+    ダウンロード済みファイルの一覧を読み込む
+
+    @param path マニフェストファイルのパス
+    @return ファイル名ごとの{"judgeId": judgeId, "sha256": ハッシュ}
+    """
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (ValueError, OSError) as e:
+        print(f"警告: {path}を読み込めませんでした - {e}")
+        return {}
+
+def save_manifest(path: str, manifest: Dict[str, Dict]):
+    """
+    ダウンロード済みファイルの一覧を保存する
+
+    @param path マニフェストファイルのパス
+    @param manifest ファイル名ごとの{"judgeId": judgeId, "sha256": ハッシュ}
+    """
+    data = json.dumps(manifest, ensure_ascii=False, indent=1, sort_keys=True)
+    atomic_write_bytes(path, data.encode("utf-8"))
+
+class SourceArchive:
+    """内容のハッシュで重複排除したソースコードのアーカイブ"""
+
+    def __init__(self, path: str = ARCHIVE_FILE):
+        """
+        @param path アーカイブファイルのパス
+        """
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        """未確定の書き込みを確定してアーカイブを閉じる"""
+        self.conn.commit()
+        self.conn.close()
+
+    def commit(self):
+        """putした内容を確定する"""
+        self.conn.commit()
+
+    def judge_id(self, student_id: str, problem_id: str) -> Optional[int]:
+        """
+        保存済みのソースコードのjudgeIdを返す
+
+        @param student_id 学籍番号
+        @param problem_id 問題ID
+        @return judgeId（保存されていなければNone）
+        """
+        row = self.conn.execute(
+            "SELECT judge_id FROM sources WHERE student_id = ? AND problem_id = ?",
+            (student_id, problem_id)).fetchone()
+        return row[0] if row else None
+
+    def put(self, student_id: str, problem_id: str, judge_id: int, source: str) -> str:
+        """
+        ソースコードを保存する（確定はcommitまたはclose時）
+
+        @param student_id 学籍番号
+        @param problem_id 問題ID
+        @param judge_id judgeId
+        @param source ソースコード
+        @return ソースコードのハッシュ
+        """
+        data = source.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        previous = self.conn.execute(
+            "SELECT sha256 FROM sources WHERE student_id = ? AND problem_id = ?",
+            (student_id, problem_id)).fetchone()
+        if self.conn.execute("SELECT 1 FROM blobs WHERE sha256 = ?", (digest,)).fetchone() is None:
+            self.conn.execute("INSERT INTO blobs VALUES (?, ?, ?)",
+                              (digest, len(data), zlib.compress(data)))
+        self.conn.execute(
+            "INSERT INTO sources VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (student_id, problem_id) DO UPDATE SET "
+            "judge_id = excluded.judge_id, sha256 = excluded.sha256",
+            (student_id, problem_id, judge_id, digest))
+        # 置き換えた内容がどの提出からも参照されなくなったら削除する
+        if previous is not None and previous[0] != digest:
+            self.conn.execute(
+                "DELETE FROM blobs WHERE sha256 = ? AND "
+                "NOT EXISTS (SELECT 1 FROM sources WHERE sha256 = ?)",
+                (previous[0], previous[0]))
+        return digest
+
+    def get(self, student_id: str, problem_id: str) -> Optional[str]:
+        """
+        ソースコードを読み込む
+
+        @param student_id 学籍番号
+        @param problem_id 問題ID
+        @return ソースコード（保存されていなければNone）
+        """
+        row = self.conn.execute(
+            "SELECT b.data FROM sources s JOIN blobs b ON s.sha256 = b.sha256 "
+            "WHERE s.student_id = ? AND s.problem_id = ?", (student_id, problem_id)).fetchone()
+        return zlib.decompress(row[0]).decode("utf-8") if row else None
+
+    def iter_sources(self) -> Iterator[Tuple[str, str, int, str]]:
+        """
+        全ソースコードを学籍番号・問題ID順に返す
+        （最近展開した内容はDECODED_CACHE_SIZE件まで保持し、同じ内容を展開し直さない）
+
+        @return (学籍番号, 問題ID, judgeId, ソースコード)のイテレータ
+        """
+        cur = self.conn.execute(
+            "SELECT s.student_id, s.problem_id, s.judge_id, s.sha256, b.data "
+            "FROM sources s JOIN blobs b ON s.sha256 = b.sha256 "
+            "ORDER BY s.student_id, s.problem_id")
+        decoded: Dict[str, str] = {}
+        for student_id, problem_id, judge_id, digest, data in cur:
+            # 辞書の挿入順を使用順とし、使うたびに末尾へ移して最も古いものから捨てる
+            source = decoded.pop(digest, None)
+            if source is None:
+                source = zlib.decompress(data).decode("utf-8")
+                if len(decoded) >= DECODED_CACHE_SIZE:
+                    del decoded[next(iter(decoded))]
+            decoded[digest] = source
+            yield student_id, problem_id, judge_id, source
+
+    def export(self, directory: str) -> int:
+        """
+        「学籍番号_問題ID.py」形式のファイルとして書き出す
+
+        @param directory 出力先ディレクトリ
+        @return 書き出したファイル数
+        """
+        os.makedirs(directory, exist_ok=True)
+        count = 0
+        for student_id, problem_id, _, source in self.iter_sources():
+            with open(os.path.join(directory, f"{student_id}_{problem_id}.py"), "wb") as f:
+                f.write(source.encode("utf-8"))
+            count += 1
+        return count
+
+    def prune(self) -> int:
+        """
+        どの提出からも参照されていないソースコードを削除し、ファイルを縮める
+
+        @return 削除したソースコード数
+        """
+        count = self.conn.execute(
+            "DELETE FROM blobs WHERE sha256 NOT IN (SELECT sha256 FROM sources)").rowcount
+        self.conn.commit()
+        self.conn.execute("VACUUM")
+        return count
+
+    def stats(self) -> Tuple[int, int, int, int]:
+        """
+        保存状況を返す
+
+        @return (提出数, 重複排除後のソースコード数, 圧縮前の合計バイト数, 圧縮後の合計バイト数)
+        """
+        sources = self.conn.execute("SELECT COUNT(*) FROM sources").fetchone()[0]
+        blobs, size, stored = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(data)), 0) "
+            "FROM blobs").fetchone()
+        return sources, blobs, size, stored
+
+def main():
+    parser = argparse.ArgumentParser(description="ソースコードアーカイブの管理")
+    parser.add_argument("command", choices=["stats", "export", "prune"],
+                        help="stats: 保存状況の表示, export: .pyファイルとして書き出し, "
+                             "prune: 参照されていないソースコードの削除")
+    parser.add_argument("--archive", default=ARCHIVE_FILE,
+                        help=f"アーカイブファイル（デフォルト: {ARCHIVE_FILE}）")
+    parser.add_argument("-o", "--output", default="downloads",
+                        help="exportの出力先ディレクトリ（デフォルト: downloads）")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.archive):
+        print(f"エラー: {args.archive}が見つかりません")
+        return
+    archive = SourceArchive(args.archive)
+    if args.command == "stats":
+        sources, blobs, size, stored = archive.stats()
+        print(f"提出: {sources}件, ソースコード: {blobs}件（重複排除後）, "
+              f"{size}バイト → 圧縮後{stored}バイト")
+    elif args.command == "prune":
+        count = archive.prune()
+        print(f"参照されていない{count}件のソースコードを削除しました。")
+    else:
+        count = archive.export(args.output)
+        print(f"{count}件のソースコードを{args.output}に書き出しました。")
+    archive.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file source_archive_test.py
+@brief source_archive.pyのテストコード
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import source_archive
+from source_archive import SourceArchive
+
+class TestSourceArchive(unittest.TestCase):
+    def setUp(self):
+        """一時ディレクトリにアーカイブを作成"""
+        self.dir = tempfile.mkdtemp()
+        self.archive = SourceArchive(os.path.join(self.dir, "sources.sqlite"))
+
+    def tearDown(self):
+        self.archive.close()
+        shutil.rmtree(self.dir)
+
+    def test_dedup(self):
+        """同じ内容のソースコードが1回だけ保存されることのテスト"""
+        self.archive.put("123456", "ITP1_1_A", 11, "print('Hello World')\n")
+        self.archive.put("234567", "ITP1_1_A", 21, "print('Hello World')\n")
+        self.archive.put("234567", "ITP1_1_B", 22, "print('こんにちは')\n")
+        self.archive.commit()
+        sources, blobs, size, _ = self.archive.stats()
+        self.assertEqual((sources, blobs), (3, 2))
+        self.assertEqual(size, len("print('Hello World')\n") + len("print('こんにちは')\n".encode("utf-8")))
+        self.assertEqual(self.archive.get("234567", "ITP1_1_B"), "print('こんにちは')\n")
+        self.assertIsNone(self.archive.get("123456", "ITP1_1_B"))
+
+    def test_update(self):
+        """同じ学生・問題の再保存でjudgeIdと内容が置き換わることのテスト"""
+        self.archive.put("123456", "ITP1_1_A", 11, "a\n")
+        self.archive.put("123456", "ITP1_1_A", 12, "b\n")
+        self.assertEqual(self.archive.judge_id("123456", "ITP1_1_A"), 12)
+        self.assertEqual(self.archive.get("123456", "ITP1_1_A"), "b\n")
+        self.assertIsNone(self.archive.judge_id("234567", "ITP1_1_A"))
+        # 置き換えられて参照されなくなった内容は残らない
+        self.assertEqual(self.archive.stats()[:2], (1, 1))
+
+    def test_shared_blob_kept(self):
+        """他の提出が参照している内容は置き換えても削除しないことのテスト"""
+        self.archive.put("123456", "ITP1_1_A", 11, "a\n")
+        self.archive.put("234567", "ITP1_1_A", 21, "a\n")
+        self.archive.put("123456", "ITP1_1_A", 12, "b\n")
+        self.assertEqual(self.archive.stats()[:2], (2, 2))
+        self.assertEqual(self.archive.get("234567", "ITP1_1_A"), "a\n")
+
+    def test_prune(self):
+        """参照されていないソースコードを削除できることのテスト"""
+        self.archive.put("123456", "ITP1_1_A", 11, "a\n")
+        self.archive.conn.execute("INSERT INTO blobs VALUES ('orphan', 1, x'00')")
+        self.assertEqual(self.archive.prune(), 1)
+        self.assertEqual(self.archive.stats()[:2], (1, 1))
+        self.assertEqual(self.archive.get("123456", "ITP1_1_A"), "a\n")
+
+    def test_iter_sources_bounded(self):
+        """展開したソースコードを保持しすぎずに全件を順に返すことのテスト"""
+        expected = []
+        for i in range(source_archive.DECODED_CACHE_SIZE + 10):
+            student_id = f"{i:06d}"
+            expected.append((student_id, "ITP1_1_A", i, f"print({i % 70})\n"))
+            self.archive.put(*expected[-1])
+        self.assertEqual(list(self.archive.iter_sources()), expected)
+
+    def test_export(self):
+        """「学籍番号_問題ID.py」形式で書き出せることのテスト"""
+        self.archive.put("123456", "ITP1_1_A", 11, "a\n")
+        self.archive.put("234567", "ITP1_1_A", 21, "a\n")
+        out = os.path.join(self.dir, "downloads")
+        self.assertEqual(self.archive.export(out), 2)
+        self.assertEqual(sorted(os.listdir(out)), ["123456_ITP1_1_A.py", "234567_ITP1_1_A.py"])
+        with open(os.path.join(out, "234567_ITP1_1_A.py"), encoding="utf-8") as f:
+            self.assertEqual(f.read(), "a\n")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file stub_server.py
+@brief テスト・ベンチマーク用のAOJ APIスタブサーバー
+
+実際のAOJにアクセスせずに各スクリプトを動かせるよう、
+以下のAPIを合成データで応答するローカルHTTPサーバーです。
+
+- /submission_records/users/{userId}/problems/{problemId}（新しい順、sizeを指定した場合はpage=N&size=M）
+- /submission_records/users/{userId}?page=N&size=M（新しい順）
+- /reviews/{judgeId}
+
+提出記録はシード値から決定的に生成します。
+応答の遅延、5xxエラー・429（Retry-After付き）の発生率を指定できます。
+各スクリプトは環境変数AOJ_ENDPOINTにサーバーのURLを指定すると、このサーバーを使用します。
+
+使用方法:
+  python3 stub_server.py --port 8080 --latency 0.02
+  AOJ_ENDPOINT=http://127.0.0.1:8080 python3 check_submission.py
+"""
+
+import argparse
+import csv
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+# 合成データの設定
+BASE_DATE = 1744787000000              # 最初の提出日時（ミリ秒）
+DATE_SPAN = 30 * 24 * 3600 * 1000      # 提出日時の範囲（30日）
+SUBMIT_PROBABILITY = 0.7               # 各問題に提出している確率
+MAX_SUBMISSIONS = 3                    # 1問題あたりの最大提出数
+OTHER_PROBLEMS = 2                     # prob.csvにない問題への提出数
+
+class StubData:
+    """シード値から決定的に生成した提出記録"""
+
+    def __init__(self, users: List[str], problems: List[str], seed: int = 0):
+        """
+        @param users AOJユーザーIDのリスト
+        @param problems 問題IDのリスト
+        @param seed 乱数のシード値
+        """
+        self.records: Dict[str, List[dict]] = {}  # ユーザーごとの提出記録（新しい順）
+        self.reviews: Dict[int, dict] = {}        # judgeIdごとの提出
+        judge_id = 1000000
+        for user_id in users:
+            rnd = random.Random(f"{seed}:{user_id}")
+            targets = [pid for pid in problems if rnd.random() < SUBMIT_PROBABILITY]
+            targets += [f"OTHER_{k}" for k in range(OTHER_PROBLEMS)]
+            records = []
+            for pid in targets:
+                for _ in range(rnd.randint(1, MAX_SUBMISSIONS)):
+                    judge_id += 1
+                    record = {
+                        "judgeId": judge_id,
+                        "userId": user_id,
+                        "problemId": pid,
+                        "language": "Python3",
+                        "score": rnd.choice((0, 50, 100, 100)),
+                        "submissionDate": BASE_DATE + rnd.randrange(DATE_SPAN),
+                    }
+                    records.append(record)
+                    # 同じ内容のソースコードも含まれるようにする
+                    source = f"# {pid}\nprint({rnd.randrange(3)})\n"
+                    self.reviews[judge_id] = dict(record, sourceCode=source)
+            records.sort(key=lambda r: (r["submissionDate"], r["judgeId"]), reverse=True)
+            self.records[user_id] = records
+
+class StubAOJServer:
+    """合成データを応答するAOJ APIのスタブサーバー"""
+
+    def __init__(self, users: List[str], problems: List[str], seed: int = 0,
+                 host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 error_rate: float = 0.0, throttle_rate: float = 0.0, retry_after: float = 0.1):
+        """
+        @param users AOJユーザーIDのリスト（それ以外のユーザーは404）
+        @param problems 問題IDのリスト
+        @param seed 合成データのシード値
+        @param host 待ち受けるアドレス
+        @param port 待ち受けるポート（0なら空いているポート）
+        @param latency 応答ごとの遅延（秒）
+        @param error_rate HTTP 500を返す確率
+        @param throttle_rate HTTP 429を返す確率
+        @param retry_after 429で返すRetry-After（秒）
+        """
+        self.data = StubData(users, problems, seed)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+
+        # 統計情報
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.bytes_sent = 0
+
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        """サーバーのベースURL"""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubAOJServer":
+        """バックグラウンドのスレッドで応答を開始する"""
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """サーバーを停止する"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread is not None:
+            self.thread.join()
+
+    def __enter__(self) -> "StubAOJServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        統計情報を返す
+
+        @return リクエスト数・エラー数・429の数・送信バイト数
+        """
+        with self.lock:
+            return {"requests": self.requests, "errors": self.errors,
+                    "throttled": self.throttled, "bytes_sent": self.bytes_sent}
+
+    def respond(self, path: str, query: Dict[str, List[str]]) -> Tuple[int, Optional[object]]:
+        """
+        リクエストに対する応答を決める
+
+        @param path リクエストのパス
+        @param query クエリパラメータ
+        @return (HTTPステータス, JSONにする応答データ)
+        """
+        parts = path.strip("/").split("/")
+        if len(parts) == 2 and parts[0] == "reviews":
+            try:
+                review = self.data.reviews.get(int(parts[1]))
+            except ValueError:
+                review = None
+            return (200, review) if review else (404, None)
+
+        if len(parts) >= 3 and parts[:2] == ["submission_records", "users"]:
+            records = self.data.records.get(parts[2])
+            if records is None:
+                return 404, None
+            if len(parts) == 5 and parts[3] == "problems":
+                matched = [r for r in records if r["problemId"] == parts[4]]
+                if not matched:
+                    return 404, None
+                if "size" not in query:
+                    return 200, matched
+                try:
+                    page = int(query.get("page", ["0"])[0])
+                    size = int(query["size"][0])
+                except ValueError:
+                    return 400, None
+                return 200, matched[page * size:(page + 1) * size]
+            if len(parts) == 3:
+                try:
+                    page = int(query.get("page", ["0"])[0])
+                    size = int(query.get("size", ["100"])[0])
+                except ValueError:
+                    return 400, None
+                return 200, records[page * size:(page + 1) * size]
+        return 404, None
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if server.latency > 0:
+                    time.sleep(server.latency)
+                with server.lock:
+                    server.requests += 1
+                    roll = server.random.random()
+                headers = {}
+                if roll < server.throttle_rate:
+                    status, body = 429, None
+                    headers["Retry-After"] = f"{server.retry_after:g}"
+                elif roll < server.throttle_rate + server.error_rate:
+                    status, body = 500, None
+                else:
+                    url = urlparse(self.path)
+                    status, body = server.respond(url.path, parse_qs(url.query))
+
+                payload = json.dumps(body).encode("utf-8") if body is not None else b""
+                with server.lock:
+                    if status == 429:
+                        server.throttled += 1
+                    elif status >= 500:
+                        server.errors += 1
+                    server.bytes_sent += len(payload)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description="AOJ APIのスタブサーバー")
+    parser.add_argument("--host", default="127.0.0.1", help="待ち受けるアドレス")
+    parser.add_argument("--port", type=int, default=8080, help="待ち受けるポート（デフォルト: 8080）")
+    parser.add_argument("-u", "--user", default="user.csv", help="ユーザー一覧（user.csv形式）")
+    parser.add_argument("-p", "--problems", default="prob.csv", help="問題定義ファイル")
+    parser.add_argument("--seed", type=int, default=0, help="合成データのシード値")
+    parser.add_argument("--latency", type=float, default=0.0, help="応答ごとの遅延（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="HTTP 500を返す確率")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="HTTP 429を返す確率")
+    args = parser.parse_args()
+
+    with open(args.user, "r", newline="", encoding="utf-8") as f:
+        users = [row[3] for row in csv.reader(f) if len(row) >= 4]
+    with open(args.problems, "r", newline="", encoding="utf-8") as f:
+        problems = next(csv.reader(f))
+
+    server = StubAOJServer(users, problems, args.seed, args.host, args.port, args.latency,
+                           args.error_rate, args.throttle_rate)
+    print(f"{server.url} で待ち受けています（{len(users)}人, {len(problems)}問, Ctrl+Cで終了）")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"\n{server.stats()}")
+
+if __name__ == "__main__":
+    main()
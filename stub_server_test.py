@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file stub_server_test.py
+@brief stub_server.pyのテストコード
+"""
+
+import unittest
+
+from aoj_client import AOJClient, STATUS_ERROR, STATUS_NOT_FOUND, STATUS_OK
+from rate_limiter import RateLimiter
+from stub_server import StubAOJServer
+
+class TestStubAOJServer(unittest.TestCase):
+    def make_client(self, server, max_retries=0):
+        return AOJClient(server.url, max_retries=max_retries, backoff_base=0.001,
+                         rate_limiter=RateLimiter(1000, max_rate=1000))
+
+    def test_endpoints(self):
+        """提出記録のページ分割・問題ごとの取得・ソースコードの取得のテスト"""
+        with StubAOJServer(["test1"], ["ITP1_1_A", "ITP1_1_B"]) as server:
+            client = self.make_client(server)
+            records = server.data.records["test1"]
+            pages = []
+            for page in range(len(records) // 2 + 1):
+                result = client.get_json("/submission_records/users/test1",
+                                         params={"page": page, "size": 2})
+                pages.extend(result.data)
+            self.assertEqual(pages, records)
+            dates = [r["submissionDate"] for r in pages]
+            self.assertEqual(dates, sorted(dates, reverse=True))
+
+            pid = records[0]["problemId"]
+            result = client.get_json(f"/submission_records/users/test1/problems/{pid}")
+            self.assertEqual(result.data, [r for r in records if r["problemId"] == pid])
+
+            review = client.get_json(f"/reviews/{records[0]['judgeId']}")
+            self.assertIn("sourceCode", review.data)
+            self.assertEqual(client.get_json("/submission_records/users/nobody").status,
+                             STATUS_NOT_FOUND)
+            self.assertEqual(client.get_json("/reviews/1").status, STATUS_NOT_FOUND)
+
+    def test_errors_and_throttling(self):
+        """エラー・429を指定した確率で返し、統計に数えることのテスト"""
+        with StubAOJServer(["test1"], ["ITP1_1_A"], error_rate=1.0) as server:
+            result = self.make_client(server).get_json("/submission_records/users/test1")
+            self.assertEqual(result.status, STATUS_ERROR)
+            self.assertEqual(server.stats()["errors"], 1)
+
+        with StubAOJServer(["test1"], ["ITP1_1_A"], throttle_rate=0.5, retry_after=0.01) as server:
+            client = self.make_client(server, max_retries=20)
+            for _ in range(5):
+                self.assertEqual(client.get_json("/submission_records/users/test1").status,
+                                 STATUS_OK)
+            stats = server.stats()
+            self.assertGreater(stats["throttled"], 0)
+            self.assertEqual(stats["requests"], stats["throttled"] + 5)
+
+if __name__ == "__main__":
+    unittest.main()
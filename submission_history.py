@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file submission_history.py
+@brief 取得した提出記録を全件保存する履歴ストア（check_submission.py --history）
+
+user.csvは(学生, 問題)ごとに最高の提出1件しか保持しないため、提出回数や初めて満点を取った日時、
+締切時点のスコアなどを調べるにはAPIから全件を取得し直す必要があります。
+check_submission.pyに--historyを指定すると、APIから受け取った提出記録を1件ずつ
+SQLiteファイルに追記します（judgeIdで重複排除し、既存の記録は変更しません）。
+記録は(ユーザーID, 問題ID, 提出日時)の索引を持ち、以下の集計をAPIにアクセスせずに求められます。
+
+- 締切時点のスコア（user.csv形式で書き出し、export_excel.py -iでレポートを作成可能）
+- 提出回数、初めて満点を取った日時とそれまでの提出回数
+
+使用方法:
+  python3 submission_history.py stats
+  python3 submission_history.py asof --deadline "2025/05/01 23:59:59" -o user_asof.csv
+  python3 submission_history.py attempts -o attempts.tsv
+"""
+
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+import threading
+import time
+from array import array
+from typing import Dict, Iterable, Optional, Tuple
+
+from backup_store import atomic_write_csv
+from fetch_planner import MAX_SCORE
+from roster import NO_SUBMISSION, Roster, load_roster, to_int
+from timestamps import convert_timestamp, parse_timestamp
+
+# デフォルトの履歴ファイル
+HISTORY_FILE = "history.sqlite"
+
+# 締切を指定しない場合の上限（ミリ秒）
+MAX_DATE = (1 << 44) - 1
+
+# 追記した内容を確定（commit）する間隔（秒）
+COMMIT_INTERVAL = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    judge_id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,        -- AOJユーザーID
+    problem_id TEXT NOT NULL,
+    date INTEGER NOT NULL,        -- 提出日時（UNIXタイムスタンプミリ秒）
+    score INTEGER NOT NULL,
+    language TEXT NOT NULL
+);
+-- scoreも索引に含め、集計を表を読まずに索引の順に1回走査するだけで行う
+CREATE INDEX IF NOT EXISTS idx_records_user_problem_date
+    ON records (user_id, problem_id, date, score);
+"""
+
+# スコアと提出日時を1つの整数で比較するための係数（提出日時のミリ秒は2^44未満）
+_SCORE_WEIGHT = MAX_DATE + 1
+
+class SubmissionHistory:
+    """judgeIdで重複排除した提出記録の履歴"""
+
+    def __init__(self, path: str = HISTORY_FILE):
+        """
+        @param path 履歴ファイルのパス
+        """
+        self.path = path
+        # 並列取得の各スレッドから追記するため、接続を共有してロックで直列化する
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self.last_commit = time.monotonic()
+        self.added = 0
+
+    def close(self):
+        """未確定の追記を確定して履歴を閉じる"""
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
+
+    def commit(self):
+        """追記した内容を確定する"""
+        with self.lock:
+            self.conn.commit()
+            self.last_commit = time.monotonic()
+
+    def add(self, user_id: str, records: Iterable[dict], problem_id: Optional[str] = None) -> int:
+        """
+        APIから取得した提出記録を追記する（記録済みのjudgeIdは無視する）。
+        確定は一定間隔ごと、およびcommit・close時に行う。
+
+        @param user_id AOJユーザーID（記録にuserIdがない場合に使用）
+        @param records 提出記録（APIの応答の要素）
+        @param problem_id 問題ID（記録にproblemIdがない場合に使用）
+        @return 新たに追記した件数
+        """
+        rows = []
+        for sub in records:
+            judge_id = to_int(sub.get("judgeId"), NO_SUBMISSION)
+            pid = sub.get("problemId") or problem_id
+            if judge_id == NO_SUBMISSION or not pid:
+                continue
+            rows.append((judge_id, sub.get("userId") or user_id, pid,
+                         to_int(sub.get("submissionDate"), 0), to_int(sub.get("score"), 0),
+                         sub.get("language") or ""))
+        if not rows:
+            return 0
+        with self.lock:
+            before = self.conn.total_changes
+            self.conn.executemany("INSERT OR IGNORE INTO records VALUES (?, ?, ?, ?, ?, ?)", rows)
+            added = self.conn.total_changes - before
+            self.added += added
+            now = time.monotonic()
+            if now - self.last_commit >= COMMIT_INTERVAL:
+                self.conn.commit()
+                self.last_commit = now
+        return added
+
+    def stats(self) -> Tuple[int, int, int, int, int]:
+        """
+        保存状況を返す
+
+        @return (提出記録数, ユーザー数, 問題数, 最古の提出日時, 最新の提出日時)
+        """
+        with self.lock:
+            return self.conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT user_id), COUNT(DISTINCT problem_id), "
+                "COALESCE(MIN(date), 0), COALESCE(MAX(date), 0) FROM records").fetchone()
+
+    def best_as_of(self, deadline: Optional[int] = None
+                   ) -> Dict[Tuple[str, str], Tuple[int, int, int]]:
+        """
+        締切時点の(ユーザー, 問題)ごとの最高の提出を求める。
+        判定規則はcheck_submission.is_betterと同じ（スコアが高く、同スコアなら日時が新しい提出）。
+
+        @param deadline 締切（ミリ秒、この日時以前の提出のみ対象、Noneなら全件）
+        @return (ユーザーID, 問題ID)ごとの(スコア, 提出日時, judgeId)
+        """
+        with self.lock:
+            # MAXの対象の行からjudge_idを取り出す（SQLiteの集約関数が1つの場合の仕様）
+            cur = self.conn.execute(
+                "SELECT user_id, problem_id, MAX(score * ? + date), judge_id FROM records "
+                "WHERE date <= ? GROUP BY user_id, problem_id",
+                (_SCORE_WEIGHT, MAX_DATE if deadline is None else deadline))
+            return {(uid, pid): divmod(key, _SCORE_WEIGHT) + (jid,) for uid, pid, key, jid in cur}
+
+    def attempt_counts(self, deadline: Optional[int] = None,
+                       full_score: int = MAX_SCORE) -> Dict[Tuple[str, str], Tuple[int, int, int]]:
+        """
+        (ユーザー, 問題)ごとの提出回数と、初めて満点を取った日時・それまでの提出回数を求める
+
+        @param deadline 締切（ミリ秒、この日時以前の提出のみ対象、Noneなら全件）
+        @param full_score 満点とみなすスコア
+        @return (ユーザーID, 問題ID)ごとの(提出回数, 初めて満点を取った日時, 満点までの提出回数)。
+                満点を取っていない場合、日時と提出回数は0
+        """
+        with self.lock:
+            # 満点までの提出回数は、満点の組についてのみ索引の範囲で数える
+            cur = self.conn.execute(
+                "SELECT user_id, problem_id, attempts, first, "
+                "       CASE WHEN first IS NULL THEN 0 ELSE ("
+                "           SELECT COUNT(*) FROM records r WHERE r.user_id = a.user_id "
+                "           AND r.problem_id = a.problem_id AND r.date <= a.first) END "
+                "FROM (SELECT user_id, problem_id, COUNT(*) AS attempts, "
+                "             MIN(CASE WHEN score >= ? THEN date END) AS first "
+                "      FROM records WHERE date <= ? GROUP BY user_id, problem_id) AS a",
+                (full_score, MAX_DATE if deadline is None else deadline))
+            return {(uid, pid): (count, first or 0, until)
+                    for uid, pid, count, first, until in cur}
+
+def snapshot_roster(history: SubmissionHistory, roster: Roster,
+                    deadline: Optional[int] = None) -> Roster:
+    """
+    締切時点の提出記録からuser.csvと同じ形のデータを作る（学生一覧・問題はrosterのもの）
+
+    @param history 提出記録の履歴
+    @param roster 学生一覧と問題
+    @param deadline 締切（ミリ秒、Noneなら全件）
+    @return 締切時点のRoster
+    """
+    best = history.best_as_of(deadline)
+    size = len(roster.students) * len(roster.problems)
+    snapshot = Roster(roster.problems, roster.students, array("q", [0]) * size,
+                      array("q", [0]) * size, array("q", [NO_SUBMISSION]) * size)
+    for s, student in enumerate(roster.students):
+        for p, pid in enumerate(roster.problems):
+            info = best.get((student.user_id, pid))
+            if info is not None:
+                snapshot.set_cell(s, p, *info)
+    return snapshot
+
+def attempt_rows(history: SubmissionHistory, roster: Roster,
+                 deadline: Optional[int] = None) -> Iterable[list]:
+    """
+    学生・問題ごとの提出回数の表（TSVの行）を作る
+
+    @param history 提出記録の履歴
+    @param roster 学生一覧と問題
+    @param deadline 締切（ミリ秒、Noneなら全件）
+    @return 見出し行に続く各行
+    """
+    counts = history.attempt_counts(deadline)
+    yield ["学籍番号", "姓", "名", "問題ID", "提出回数", "初回満点日時", "満点までの提出回数"]
+    for student in roster.students:
+        for pid in roster.problems:
+            count, first, until = counts.get((student.user_id, pid), (0, 0, 0))
+            yield student.fields()[:3] + [pid, count, convert_timestamp(first) if first else "",
+                                          until or ""]
+
+def main():
+    parser = argparse.ArgumentParser(description="提出記録の履歴の集計")
+    parser.add_argument("command", choices=["stats", "asof", "attempts"],
+                        help="stats: 保存状況の表示, asof: 締切時点のスコアをuser.csv形式で出力, "
+                             "attempts: 提出回数・初回満点日時をTSVで出力")
+    parser.add_argument("--history", default=HISTORY_FILE,
+                        help=f"履歴ファイル（デフォルト: {HISTORY_FILE}）")
+    parser.add_argument("--deadline",
+                        help="締切（「YYYY/MM/DD HH:MM:SS」形式、この日時以前の提出のみ集計）")
+    parser.add_argument("-u", "--user", default="user.csv", help="学生一覧（user.csv）")
+    parser.add_argument("-p", "--problems", default="prob.csv", help="問題定義ファイル")
+    parser.add_argument("--db", help="user.csvの代わりに学生一覧を読み込むSQLiteデータベース")
+    parser.add_argument("-o", "--output",
+                        help="出力ファイル（asofのデフォルト: user_asof.csv、attemptsのデフォルト: 標準出力）")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.history):
+        print(f"エラー: {args.history}が見つかりません（check_submission.py --historyで作成）")
+        return
+    try:
+        deadline = parse_timestamp(args.deadline) if args.deadline else None
+    except ValueError as e:
+        print(f"エラー: {e}")
+        return
+    history = SubmissionHistory(args.history)
+    if args.command == "stats":
+        count, users, problems, oldest, newest = history.stats()
+        print(f"提出記録: {count}件, ユーザー: {users}人, 問題: {problems}問")
+        if count:
+            print(f"期間: {convert_timestamp(oldest)} 〜 {convert_timestamp(newest)}")
+    else:
+        roster = load_roster(args.user, args.problems, args.db)
+        if args.command == "asof":
+            output = args.output or "user_asof.csv"
+            atomic_write_csv(output, snapshot_roster(history, roster, deadline).to_rows())
+            print(f"締切時点のスコアを{output}に出力しました。")
+        elif args.output:
+            with open(args.output, "w", newline="", encoding="utf-8") as f:
+                csv.writer(f, delimiter="\t").writerows(attempt_rows(history, roster, deadline))
+            print(f"提出回数を{args.output}に出力しました。")
+        else:
+            csv.writer(sys.stdout, delimiter="\t").writerows(attempt_rows(history, roster, deadline))
+    history.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file submission_history_test.py
+@brief submission_history.pyのテストコード
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from aoj_client import AOJClient
+from check_submission import STRATEGY_PAIR, update_roster
+from rate_limiter import RateLimiter
+from roster import NO_SUBMISSION, Roster
+from stub_server import StubAOJServer
+from submission_history import SubmissionHistory, snapshot_roster
+
+# test1のITP1_1_Aは50点→100点→100点、ITP1_1_Bは0点の提出のみ
+RECORDS = [
+    {"judgeId": 4, "userId": "test1", "problemId": "ITP1_1_B", "score": 0,
+     "submissionDate": 1683936400000, "language": "C"},
+    {"judgeId": 3, "userId": "test1", "problemId": "ITP1_1_A", "score": 100,
+     "submissionDate": 1683936300000, "language": "Python3"},
+    {"judgeId": 2, "userId": "test1", "problemId": "ITP1_1_A", "score": 100,
+     "submissionDate": 1683936200000, "language": "Python3"},
+    {"judgeId": 1, "userId": "test1", "problemId": "ITP1_1_A", "score": 50,
+     "submissionDate": 1683936100000, "language": "Python3"},
+]
+
+class TestSubmissionHistory(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.history = SubmissionHistory(os.path.join(self.dir, "history.sqlite"))
+
+    def tearDown(self):
+        self.history.close()
+        shutil.rmtree(self.dir)
+
+    def test_add_dedup(self):
+        """同じjudgeIdの記録は1回だけ保存し、既存の記録を変更しないことのテスト"""
+        self.assertEqual(self.history.add("test1", RECORDS[:2]), 2)
+        changed = dict(RECORDS[1], score=0)
+        self.assertEqual(self.history.add("test1", [changed] + RECORDS[2:]), 2)
+        self.assertEqual(self.history.stats(), (4, 1, 2, 1683936100000, 1683936400000))
+        self.assertEqual(self.history.best_as_of()[("test1", "ITP1_1_A")],
+                         (100, 1683936300000, 3))
+
+    def test_best_as_of(self):
+        """締切時点の最高の提出（同スコアなら新しい提出）を求めるテスト"""
+        self.history.add("test1", RECORDS)
+        self.assertEqual(self.history.best_as_of(1683936250000),
+                         {("test1", "ITP1_1_A"): (100, 1683936200000, 2)})
+        self.assertEqual(self.history.best_as_of(1683936000000), {})
+
+        roster = Roster.from_rows([["123456", "テスト", "太郎", "test1"],
+                                   ["234567", "テスト", "花子", "test2"]], ["ITP1_1_A", "ITP1_1_B"])
+        rows = snapshot_roster(self.history, roster, 1683936150000).to_rows()
+        self.assertEqual(rows[0][4:], ["50", "1683936100000", "1", "0", "0", str(NO_SUBMISSION)])
+        self.assertEqual(rows[1][4:], ["0", "0", str(NO_SUBMISSION)] * 2)
+
+    def test_attempt_counts(self):
+        """提出回数・初めて満点を取った日時・満点までの提出回数のテスト"""
+        self.history.add("test1", RECORDS)
+        self.assertEqual(self.history.attempt_counts(),
+                         {("test1", "ITP1_1_A"): (3, 1683936200000, 2),
+                          ("test1", "ITP1_1_B"): (1, 0, 0)})
+        self.assertEqual(self.history.attempt_counts(1683936150000),
+                         {("test1", "ITP1_1_A"): (1, 0, 0)})
+
+    def test_update_roster_records_all_submissions(self):
+        """--history指定時は満点で打ち切らずに全ての提出記録を保存することのテスト"""
+        with StubAOJServer(["test1", "test2"], ["ITP1_1_A", "ITP1_1_B"]) as server:
+            client = AOJClient(server.url, rate_limiter=RateLimiter(1000, max_rate=1000))
+            roster = Roster.from_rows([["123456", "テスト", "太郎", "test1"],
+                                       ["234567", "テスト", "花子", "test2"]],
+                                      ["ITP1_1_A", "ITP1_1_B"])
+            with mock.patch("builtins.print"):
+                update_roster(roster, client=client, strategy=STRATEGY_PAIR,
+                              history=self.history)
+            client.close()
+            records = [r for uid in ("test1", "test2") for r in server.data.records[uid]
+                       if r["problemId"] in roster.problems]
+
+        self.assertEqual(self.history.stats()[0], len(records))
+        # 保存した記録から求めた結果はuser.csvの値と一致する
+        self.assertEqual(snapshot_roster(self.history, roster).to_rows(), roster.to_rows())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file submission_store.py
+@brief user.csvの代わりに提出記録をSQLiteで管理するストア
+
+user.csvの横長の形式（基本情報4列 + 問題ごとに3列）の代わりに、
+(学籍番号, 問題ID, スコア, 提出日時, judgeId)を1行とする正規化したテーブルで管理します。
+更新時は変更のあったセルだけを1つのトランザクションで書き込みます。
+
+使用方法:
+  python3 submission_store.py import --db aoj.sqlite   # user.csvを取り込み
+  python3 submission_store.py export --db aoj.sqlite   # user.csvに書き出し
+"""
+
+import argparse
+import csv
+import sqlite3
+from typing import Dict, Iterable, List, Tuple
+
+from backup_store import atomic_write_csv
+
+# 未設定時の値（check_submission.NO_SUBMISSIONと同じ）
+NO_SUBMISSION = -1
+
+# デフォルトのデータベースファイル
+DB_FILE = "aoj.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    student_id TEXT PRIMARY KEY,  -- 学籍番号
+    surname TEXT NOT NULL,        -- 姓
+    name TEXT NOT NULL,           -- 名
+    user_id TEXT NOT NULL,        -- AOJユーザーID
+    position INTEGER NOT NULL     -- user.csvでの行番号
+);
+CREATE TABLE IF NOT EXISTS submissions (
+    student_id TEXT NOT NULL,
+    problem_id TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    date INTEGER NOT NULL,        -- 提出日時（UNIXタイムスタンプミリ秒）
+    judge_id INTEGER NOT NULL,
+    PRIMARY KEY (student_id, problem_id)
+);
+CREATE INDEX IF NOT EXISTS idx_submissions_problem ON submissions (problem_id);
+"""
+
+def to_int(value: str, default: int) -> int:
+    """
+    文字列を整数に変換する（変換失敗時はdefault）
+
+    @param value 変換する文字列
+    @param default 変換失敗時の値
+    @return 整数
+    """
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return default
+
+class SubmissionStore:
+    """SQLiteによる提出記録ストア"""
+
+    def __init__(self, path: str = DB_FILE):
+        """
+        @param path データベースファイルのパス
+        """
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        """データベースを閉じる"""
+        self.conn.close()
+
+    def import_rows(self, rows: List[List[str]], probs: List[str]):
+        """
+        user.csv形式の行を取り込む（既存のデータはすべて置き換える）
+
+        @param rows user.csvの全行
+        @param probs 問題IDのリスト
+        """
+        students = []
+        cells = []
+        for row in rows:
+            # 空行・列が足りない行はRoster.from_rowsと同様に読み飛ばす
+            if len(row) < 4:
+                continue
+            student_id = row[0]
+            students.append((student_id, row[1], row[2], row[3], len(students)))
+            for i, pid in enumerate(probs):
+                base_idx = 4 + i * 3
+                if base_idx + 2 >= len(row):
+                    continue
+                cells.append((student_id, pid,
+                              to_int(row[base_idx], 0),
+                              to_int(row[base_idx + 1], 0),
+                              to_int(row[base_idx + 2], NO_SUBMISSION)))
+        with self.conn:
+            self.conn.execute("DELETE FROM students")
+            self.conn.execute("DELETE FROM submissions")
+            self.conn.executemany("INSERT INTO students VALUES (?, ?, ?, ?, ?)", students)
+            self.conn.executemany("INSERT INTO submissions VALUES (?, ?, ?, ?, ?)", cells)
+
+    def load_cells(self) -> Dict[Tuple[str, str], Tuple[int, int, int]]:
+        """
+        全提出記録を読み込む
+
+        @return (学籍番号, 問題ID)ごとの(score, date, judge_id)
+        """
+        cur = self.conn.execute(
+            "SELECT student_id, problem_id, score, date, judge_id FROM submissions")
+        return {(sid, pid): (score, date, jid) for sid, pid, score, date, jid in cur}
+
+    def load_rows(self, probs: List[str]) -> List[List[str]]:
+        """
+        user.csvと同じ形式の行として読み込む（記録のない問題は初期値）
+
+        @param probs 問題IDのリスト
+        @return user.csv形式の全行
+        """
+        cells = self.load_cells()
+        rows = []
+        cur = self.conn.execute(
+            "SELECT student_id, surname, name, user_id FROM students ORDER BY position")
+        for student_id, surname, name, user_id in cur:
+            row = [student_id, surname, name, user_id]
+            for pid in probs:
+                score, date, jid = cells.get((student_id, pid), (0, 0, NO_SUBMISSION))
+                row.extend([str(score), str(date), str(jid)])
+            rows.append(row)
+        return rows
+
+    def update_cells(self, cells: Iterable[Tuple[str, str, int, int, int]]) -> int:
+        """
+        指定した提出記録だけを1つのトランザクションで更新する
+
+        @param cells (学籍番号, 問題ID, score, date, judge_id)のリスト
+        @return 更新した件数
+        """
+        cells = list(cells)
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO submissions VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (student_id, problem_id) DO UPDATE SET "
+                "score = excluded.score, date = excluded.date, judge_id = excluded.judge_id",
+                cells)
+        return len(cells)
+
+    def save_rows(self, rows: List[List[str]], probs: List[str]) -> int:
+        """
+        user.csv形式の行を保存する（変更のあったセルのみ書き込む）
+
+        @param rows user.csvの全行
+        @param probs 問題IDのリスト
+        @return 更新した件数
+        """
+        current = self.load_cells()
+        changed = []
+        for row in rows:
+            if len(row) < 4:
+                continue
+            student_id = row[0]
+            for i, pid in enumerate(probs):
+                base_idx = 4 + i * 3
+                if base_idx + 2 >= len(row):
+                    continue
+                cell = (to_int(row[base_idx], 0),
+                        to_int(row[base_idx + 1], 0),
+                        to_int(row[base_idx + 2], NO_SUBMISSION))
+                if current.get((student_id, pid), (0, 0, NO_SUBMISSION)) != cell:
+                    changed.append((student_id, pid) + cell)
+        return self.update_cells(changed)
+
+    def reset(self):
+        """全提出記録を削除する（学生情報は保持）"""
+        with self.conn:
+            self.conn.execute("DELETE FROM submissions")
+
+def import_csv(db: str = DB_FILE, user_csv: str = "user.csv", prob_csv: str = "prob.csv"):
+    """
+    user.csvをデータベースに取り込む
+
+    @param db データベースファイルのパス
+    @param user_csv 入力するuser.csv
+    @param prob_csv 問題定義ファイル
+    """
+    with open(user_csv, "r", newline="") as f:
+        rows = list(csv.reader(f))
+    with open(prob_csv, "r", newline="") as f:
+        probs = next(csv.reader(f))
+    store = SubmissionStore(db)
+    store.import_rows(rows, probs)
+    store.close()
+    print(f"{user_csv}を{db}に取り込みました。")
+
+def export_csv(db: str = DB_FILE, user_csv: str = "user.csv", prob_csv: str = "prob.csv"):
+    """
+    データベースの内容をuser.csv形式で書き出す
+
+    @param db データベースファイルのパス
+    @param user_csv 出力するuser.csv
+    @param prob_csv 問題定義ファイル
+    """
+    with open(prob_csv, "r", newline="") as f:
+        probs = next(csv.reader(f))
+    store = SubmissionStore(db)
+    rows = store.load_rows(probs)
+    store.close()
+    # 書き出し途中で中断してもuser.csvが壊れないよう一時ファイル経由で置き換える
+    atomic_write_csv(user_csv, rows)
+    print(f"{db}を{user_csv}に書き出しました。")
+
+def main():
+    parser = argparse.ArgumentParser(description="user.csvとSQLiteデータベースの相互変換")
+    parser.add_argument("command", choices=["import", "export"],
+                        help="import: user.csv→DB, export: DB→user.csv")
+    parser.add_argument("--db", default=DB_FILE,
+                        help=f"データベースファイル（デフォルト: {DB_FILE}）")
+    parser.add_argument("-u", "--user", default="user.csv",
+                        help="user.csvのパス（デフォルト: user.csv）")
+    parser.add_argument("-p", "--problems", default="prob.csv",
+                        help="問題定義ファイル（デフォルト: prob.csv）")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        import_csv(args.db, args.user, args.problems)
+    else:
+        export_csv(args.db, args.user, args.problems)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file submission_store_test.py
+@brief submission_store.pyのテストコード
+"""
+
+import os
+import tempfile
+import unittest
+
+from submission_store import SubmissionStore, NO_SUBMISSION
+
+class TestSubmissionStore(unittest.TestCase):
+    def setUp(self):
+        """テスト用のデータベースを作成"""
+        fd, self.path = tempfile.mkstemp(suffix=".sqlite")
+        os.close(fd)
+        self.store = SubmissionStore(self.path)
+        self.probs = ["ITP1_1_A", "ITP1_1_B"]
+        self.rows = [
+            ["123456", "テスト", "太郎", "test1", "100", "1683936000000", "12345", "0", "0", "-1"],
+            ["234567", "テスト", "花子", "test2", "80", "1683936100000", "12346", "100",
+             "1683936200000", "12347"],
+        ]
+
+    def tearDown(self):
+        """テスト用のデータベースを削除"""
+        self.store.close()
+        os.remove(self.path)
+
+    def test_round_trip(self):
+        """取り込んだ内容がuser.csv形式で同じように読み出せることのテスト"""
+        self.store.import_rows(self.rows, self.probs)
+        self.assertEqual(self.store.load_rows(self.probs), self.rows)
+
+    def test_missing_columns(self):
+        """列が足りない行は初期値で補完されることのテスト"""
+        self.store.import_rows([["345678", "テスト", "三郎", "test3"]], self.probs)
+        self.assertEqual(self.store.load_rows(self.probs)[0][4:],
+                         ["0", "0", str(NO_SUBMISSION)] * 2)
+
+    def test_short_rows_skipped(self):
+        """空行・学生情報の列が足りない行は読み飛ばすことのテスト"""
+        self.store.import_rows([[], self.rows[0], ["999999"], self.rows[1]], self.probs)
+        self.assertEqual(self.store.load_rows(self.probs), self.rows)
+        self.assertEqual(self.store.save_rows([[]] + self.rows, self.probs), 0)
+
+    def test_save_rows_only_changed(self):
+        """変更のあったセルだけが書き込まれることのテスト"""
+        self.store.import_rows(self.rows, self.probs)
+        updated = [list(r) for r in self.rows]
+        updated[0][7:10] = ["100", "1683936300000", "12348"]
+        self.assertEqual(self.store.save_rows(updated, self.probs), 1)
+        self.assertEqual(self.store.load_rows(self.probs), updated)
+        self.assertEqual(self.store.save_rows(updated, self.probs), 0)
+
+if __name__ == "__main__":
+    unittest.main()
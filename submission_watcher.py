@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file submission_watcher.py
+@brief 提出状況を常駐して監視する（check_submission.py --watch）
+
+学生ごとの次回確認時刻を優先度付きキュー（heapq）で管理し、確認時刻になった学生だけを
+増分取得（前回確認した提出より新しい提出のみ）します。
+新しい提出があった学生は短い間隔で、提出のない学生は間隔を倍々に延ばして、
+全問題を解き終えた学生はさらに長い間隔で確認します。
+更新内容はメモリ上に保持し、一定間隔ごとにまとめてuser.csv（またはデータベース）に保存します。
+"""
+
+import heapq
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from aoj_client import AOJClient
+from change_log import make_entry
+from check_submission import debug_print, fetch_user_submissions, is_better
+from metrics import TimedIterator, get_metrics
+from parallel import map_ordered
+from roster import Roster
+from submission_history import SubmissionHistory
+
+# デフォルト設定（秒）
+DEFAULT_MIN_INTERVAL = 30.0       # 新しい提出があった学生の確認間隔
+DEFAULT_MAX_INTERVAL = 600.0      # 提出のない学生の確認間隔の上限
+DEFAULT_SOLVED_INTERVAL = 1800.0  # 全問題を解き終えた学生の確認間隔
+DEFAULT_FLUSH_INTERVAL = 60.0     # 更新内容を保存する間隔
+
+class PollScheduler:
+    """学生ごとの次回確認時刻を管理する優先度付きキュー"""
+
+    def __init__(self, count: int, min_interval: float = DEFAULT_MIN_INTERVAL,
+                 max_interval: float = DEFAULT_MAX_INTERVAL,
+                 solved_interval: float = DEFAULT_SOLVED_INTERVAL, now: float = 0.0):
+        """
+        @param count 学生数（全員をnowの時点で確認対象にする）
+        @param min_interval 最短の確認間隔
+        @param max_interval 提出のない学生の確認間隔の上限
+        @param solved_interval 全問題を解き終えた学生の確認間隔
+        @param now 現在時刻
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.solved_interval = solved_interval
+        self.intervals = [min_interval] * count
+        self.heap = [(now, i) for i in range(count)]
+        heapq.heapify(self.heap)
+
+    def next_time(self) -> Optional[float]:
+        """
+        次に確認する時刻を返す
+
+        @return 時刻（対象がいなければNone）
+        """
+        return self.heap[0][0] if self.heap else None
+
+    def pop_due(self, now: float, limit: Optional[int] = None) -> List[int]:
+        """
+        確認時刻になった学生を取り出す
+
+        @param now 現在時刻
+        @param limit 取り出す最大人数
+        @return 学生の位置のリスト（確認時刻の早い順）
+        """
+        due = []
+        while self.heap and self.heap[0][0] <= now and (limit is None or len(due) < limit):
+            due.append(heapq.heappop(self.heap)[1])
+        return due
+
+    def reschedule(self, index: int, now: float, active: bool, solved: bool) -> float:
+        """
+        確認結果に応じて次回の確認時刻を決める
+
+        @param index 学生の位置
+        @param now 現在時刻
+        @param active 新しい提出があったか
+        @param solved 全問題を解き終えているか
+        @return 次回までの間隔
+        """
+        if active:
+            interval = self.min_interval
+        else:
+            interval = min(self.max_interval, self.intervals[index] * 2)
+        if solved:
+            interval = max(interval, self.solved_interval)
+        self.intervals[index] = interval
+        heapq.heappush(self.heap, (now + interval, index))
+        return interval
+
+class SubmissionWatcher:
+    """提出状況を常駐して監視し、まとめて保存する"""
+
+    def __init__(self, roster: Roster, client: AOJClient, save: Callable[[], None],
+                 watermarks: Dict[str, int], scheduler: PollScheduler, workers: int = 1,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL, debug: bool = False,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep,
+                 history: Optional[SubmissionHistory] = None):
+        """
+        @param roster 学生一覧と提出記録（その場で更新する）
+        @param client 使用するAPIクライアント
+        @param save 更新内容を保存する関数
+        @param watermarks ユーザーIDごとの確認済み最新提出日時（その場で更新する）
+        @param scheduler 確認時刻を管理するスケジューラー
+        @param workers 並列実行数
+        @param flush_interval 更新内容を保存する間隔（秒）
+        @param debug デバッグ情報を表示するか
+        @param clock 現在時刻を返す関数
+        @param sleep 待機する関数
+        @param history 取得した提出記録を保存する履歴
+        """
+        self.roster = roster
+        self.client = client
+        self.save = save
+        self.watermarks = watermarks
+        self.scheduler = scheduler
+        self.workers = workers
+        self.flush_interval = flush_interval
+        self.debug = debug
+        self.clock = clock
+        self.sleep = sleep
+        self.history = history
+
+        self.dirty = False
+        self.last_flush = clock()
+        self.changes: List[Dict] = []  # 保存前の変更ログの行（saveで追記して空にする）
+
+        # 統計情報
+        self.polls = 0
+        self.updates = 0
+        self.flushes = 0
+
+    def is_solved(self, index: int) -> bool:
+        """
+        全問題を満点で解き終えているか
+
+        @param index 学生の位置
+        @return 解き終えていればTrue
+        """
+        return all(score == 100 for score in self.roster.scores[self.roster.row_slice(index)])
+
+    def apply(self, index: int, infos: Dict[str, Tuple[int, int, int]]) -> List[str]:
+        """
+        取得結果をrosterに反映する
+
+        @param index 学生の位置
+        @param infos 問題IDごとの(max_score, submission_timestamp, judge_id)
+        @return 更新があった問題IDのリスト
+        """
+        updated = []
+        for i, pid in enumerate(self.roster.problems):
+            score, date, jid = infos[pid]
+            current = self.roster.cell(index, i)
+            if is_better(score, date, current[0], current[1]):
+                self.roster.set_cell(index, i, score, date, jid)
+                student = self.roster.students[index]
+                self.changes.append(make_entry(student.student_id, student.user_id, pid,
+                                               current, (score, date, jid)))
+                updated.append(pid)
+        return updated
+
+    def poll(self, indices: List[int]):
+        """
+        指定した学生の新しい提出を取得して反映し、次回の確認時刻を決める
+
+        @param indices 学生の位置のリスト
+        """
+        students = self.roster.students
+        probs = self.roster.problems
+        since = {students[i].user_id: self.watermarks.get(students[i].user_id, 0) for i in indices}
+        start = time.perf_counter()
+        results = TimedIterator(map_ordered(
+            lambda i: fetch_user_submissions(students[i].user_id, probs, self.debug, self.client,
+                                             since=since[students[i].user_id],
+                                             history=self.history),
+            indices, self.workers))
+
+        for index, fetched in zip(indices, results):
+            self.polls += 1
+            user_id = students[index].user_id
+            active = False
+            if fetched is not None:
+                infos, newest = fetched
+                active = newest > since[user_id]
+                self.watermarks[user_id] = newest
+                updated = self.apply(index, infos)
+                if updated:
+                    self.dirty = True
+                    self.updates += len(updated)
+                    stamp = datetime.now().strftime("%H:%M:%S")
+                    print(f"[{stamp}] {students[index].student_id}: {', '.join(updated)}")
+            # 取得失敗時は提出がなかったものとして間隔を延ばす
+            interval = self.scheduler.reschedule(index, self.clock(), active, self.is_solved(index))
+            debug_print(self.debug, "%s: 次回確認まで%.0f秒", user_id, interval)
+
+        metrics = get_metrics()
+        metrics.add_phase("fetch", results.elapsed)
+        metrics.add_phase("merge", time.perf_counter() - start - results.elapsed)
+
+    def flush(self):
+        """更新内容があれば保存する"""
+        if self.dirty:
+            self.save()
+            self.dirty = False
+            self.flushes += 1
+        self.last_flush = self.clock()
+
+    def run(self, duration: Optional[float] = None):
+        """
+        監視を開始する（Ctrl+Cまたはduration秒の経過で終了し、最後に保存する）
+
+        @param duration 監視する秒数（Noneなら無期限）
+        """
+        start = self.clock()
+        try:
+            while True:
+                now = self.clock()
+                if duration is not None and now - start >= duration:
+                    break
+                due = self.scheduler.pop_due(now, max(self.workers, 1) * 4)
+                if due:
+                    self.poll(due)
+                if self.clock() - self.last_flush >= self.flush_interval:
+                    self.flush()
+                if due:
+                    continue
+
+                # 次の確認時刻・保存時刻・終了時刻のうち最も早いものまで待機
+                wake = [self.last_flush + self.flush_interval]
+                next_time = self.scheduler.next_time()
+                if next_time is not None:
+                    wake.append(next_time)
+                if duration is not None:
+                    wake.append(start + duration)
+                self.sleep(max(0.0, min(wake) - self.clock()))
+        except KeyboardInterrupt:
+            print("\n監視を終了します。")
+        finally:
+            self.flush()
+
+    def print_stats(self):
+        """監視の統計情報を表示する"""
+        print(f"確認: {self.polls}回, 更新: {self.updates}件, 保存: {self.flushes}回")
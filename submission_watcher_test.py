@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file submission_watcher_test.py
+@brief submission_watcher.pyのテストコード
+"""
+
+import unittest
+from unittest import mock
+
+from aoj_client import FetchResult, STATUS_OK
+from roster import Roster
+from submission_watcher import PollScheduler, SubmissionWatcher
+
+class FakeClock:
+    """テスト用の時計（sleepで時刻を進める）"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+class TestPollScheduler(unittest.TestCase):
+    def test_intervals(self):
+        """提出があれば最短間隔、なければ倍々、解き終えたら長い間隔になることのテスト"""
+        scheduler = PollScheduler(2, min_interval=10, max_interval=50, solved_interval=100)
+        self.assertEqual(scheduler.pop_due(0), [0, 1])
+        self.assertEqual(scheduler.reschedule(0, 0, active=False, solved=False), 20)
+        self.assertEqual(scheduler.reschedule(1, 0, active=False, solved=True), 100)
+        self.assertEqual(scheduler.pop_due(19), [])
+        self.assertEqual(scheduler.pop_due(20), [0])
+        self.assertEqual(scheduler.reschedule(0, 20, active=False, solved=False), 40)
+        self.assertEqual(scheduler.pop_due(60), [0])
+        self.assertEqual(scheduler.reschedule(0, 60, active=False, solved=False), 50)
+        self.assertEqual(scheduler.pop_due(110), [1, 0])
+        self.assertEqual(scheduler.reschedule(0, 110, active=True, solved=False), 10)
+        self.assertEqual(scheduler.next_time(), 120)
+
+class TestSubmissionWatcher(unittest.TestCase):
+    def setUp(self):
+        """テスト用のデータを作成"""
+        self.probs = ["ITP1_1_A", "ITP1_1_B"]
+        rows = [
+            ["123456", "テスト", "太郎", "test1", "0", "0", "-1", "0", "0", "-1"],
+            ["234567", "テスト", "花子", "test2", "100", "1000", "1", "100", "2000", "2"],
+        ]
+        self.roster = Roster.from_rows(rows, self.probs)
+        self.clock = FakeClock()
+        self.records = {"test1": [], "test2": []}
+        self.client = mock.Mock()
+        self.client.get_json.side_effect = self.fake_get_json
+        self.save = mock.Mock()
+
+    def fake_get_json(self, path, params=None):
+        """ユーザーの提出記録を新しい順に返す"""
+        user_id = path.rsplit("/", 1)[1]
+        data = sorted(self.records[user_id], key=lambda r: -r["submissionDate"])
+        return FetchResult(STATUS_OK, data, None)
+
+    def make_watcher(self, watermarks):
+        scheduler = PollScheduler(2, min_interval=10, max_interval=40, solved_interval=100)
+        return SubmissionWatcher(self.roster, self.client, self.save, watermarks, scheduler,
+                                 flush_interval=30, clock=self.clock, sleep=self.clock.sleep)
+
+    def test_run(self):
+        """解き終えた学生の確認回数が少なく、更新がまとめて保存されることのテスト"""
+        self.records["test1"].append({"problemId": "ITP1_1_A", "score": 100,
+                                      "submissionDate": 5000, "judgeId": 11})
+        watermarks = {"test2": 2000}
+        watcher = self.make_watcher(watermarks)
+        with mock.patch("builtins.print"):
+            watcher.run(duration=120)
+
+        self.assertEqual(self.roster.cell(0, 0), (100, 5000, 11))
+        self.assertEqual(watermarks, {"test1": 5000, "test2": 2000})
+        polled = [c.args[0].rsplit("/", 1)[1] for c in self.client.get_json.call_args_list]
+        # test1: 0, 10, 30, 70, 110秒 / test2: 0, 100秒（解き終えているため）
+        self.assertEqual(polled.count("test1"), 5)
+        self.assertEqual(polled.count("test2"), 2)
+        # 更新は30秒ごとにまとめて保存（更新がなければ保存しない）
+        self.assertEqual(self.save.call_count, 1)
+        self.assertEqual(watcher.updates, 1)
+
+    def test_keyboard_interrupt_flushes(self):
+        """中断時にも未保存の更新が保存されることのテスト"""
+        self.records["test1"].append({"problemId": "ITP1_1_B", "score": 100,
+                                      "submissionDate": 5000, "judgeId": 12})
+        watcher = self.make_watcher({})
+        self.clock.sleep = mock.Mock(side_effect=KeyboardInterrupt)
+        watcher.sleep = self.clock.sleep
+        with mock.patch("builtins.print"):
+            watcher.run()
+        self.assertEqual(self.roster.cell(0, 1), (100, 5000, 12))
+        self.save.assert_called_once()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file timestamps.py
+@brief 提出日時（UNIXタイムスタンプミリ秒）の変換を高速化する共通モジュール
+
+使用中のタイムゾーンのUTCオフセットはすべて15分の倍数なので、15分単位の区間内では
+ローカル時刻の「YYYY/MM/DD HH:」の部分と開始分、UTCオフセットが一定です。
+区間ごとにこれらを1回だけ求めてキャッシュし、セルごとの
+datetime.fromtimestamp・strftimeの呼び出しを省きます。
+"""
+
+from datetime import datetime
+from typing import Iterable, List, Tuple
+
+# キャッシュの区間（ミリ秒）
+BUCKET_MS = 15 * 60 * 1000
+
+# Excelのシリアル値でのUNIXエポック（1970/1/1）
+EXCEL_EPOCH = 25569
+
+# 区間内の経過秒数 → 「MM:SS」（区間の開始分ごと）
+_MINUTE_SECOND = [[f"{start + sec // 60:02d}:{sec % 60:02d}" for sec in range(BUCKET_MS // 1000)]
+                  for start in range(0, 60, 15)]
+_bucket_cache = {}
+
+def _bucket_base(bucket: int) -> Tuple[str, List[str], int]:
+    """
+    15分単位の区間の情報を返す
+
+    @param bucket UNIXタイムスタンプ（ミリ秒）をBUCKET_MSで割った値
+    @return (「YYYY/MM/DD HH:」, 「MM:SS」の表, UTCオフセット（秒）)
+    """
+    base = _bucket_cache.get(bucket)
+    if base is None:
+        seconds = bucket * BUCKET_MS // 1000
+        dt = datetime.fromtimestamp(seconds)
+        offset = int((dt - datetime(1970, 1, 1)).total_seconds()) - seconds
+        base = _bucket_cache[bucket] = (dt.strftime('%Y/%m/%d %H:'),
+                                        _MINUTE_SECOND[dt.minute // 15], offset)
+    return base
+
+def convert_timestamp(ms: int) -> str:
+    """
+    UNIXタイムスタンプ（ミリ秒）を読みやすい日時文字列に変換
+
+    @param ms UNIXタイムスタンプ（ミリ秒）
+    @return 「YYYY/MM/DD HH:MM:SS」形式の文字列（不正な値は「未提出」）
+    """
+    try:
+        bucket, rem = divmod(int(ms), BUCKET_MS)
+        prefix, table, _ = _bucket_base(bucket)
+        return prefix + table[rem // 1000]
+    except (ValueError, TypeError, OSError, OverflowError):
+        return "未提出"
+
+def convert_timestamps(dates: Iterable[int]) -> List[str]:
+    """
+    有効なUNIXタイムスタンプ（ミリ秒）をまとめて変換
+
+    @param dates 正のUNIXタイムスタンプ（ミリ秒）
+    @return 「YYYY/MM/DD HH:MM:SS」形式の文字列のリスト
+    """
+    cache = _bucket_cache
+    result = []
+    append = result.append
+    for ms in dates:
+        bucket, rem = divmod(ms, BUCKET_MS)
+        prefix, table, _ = cache.get(bucket) or _bucket_base(bucket)
+        append(prefix + table[rem // 1000])
+    return result
+
+def excel_serial(ms: int) -> float:
+    """
+    UNIXタイムスタンプ（ミリ秒）をローカル時刻のExcelシリアル値に変換
+    （表示を文字列の変換と揃えるため、秒未満は切り捨てる）
+
+    @param ms 正のUNIXタイムスタンプ（ミリ秒）
+    @return 1900年日付システムのシリアル値
+    """
+    bucket = ms // BUCKET_MS
+    offset = (_bucket_cache.get(bucket) or _bucket_base(bucket))[2]
+    return (ms // 1000 + offset) / 86400 + EXCEL_EPOCH
+
+# parse_timestampで受け付ける日時の書式（ローカル時刻）
+_PARSE_FORMATS = ("%Y/%m/%d %H:%M:%S", "%Y/%m/%d %H:%M", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M",
+                  "%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M")
+
+def parse_timestamp(text: str) -> int:
+    """
+    日時の文字列をUNIXタイムスタンプ（ミリ秒）に変換（convert_timestampの逆変換）
+
+    @param text 「YYYY/MM/DD HH:MM[:SS]」「YYYY-MM-DD HH:MM[:SS]」形式のローカル時刻、
+                またはUNIXタイムスタンプ（ミリ秒）の整数
+    @return UNIXタイムスタンプ（ミリ秒）
+    @throws ValueError 解釈できない場合
+    """
+    text = text.strip()
+    if text.isdigit():
+        return int(text)
+    for fmt in _PARSE_FORMATS:
+        try:
+            return int(datetime.strptime(text, fmt).timestamp()) * 1000
+        except ValueError:
+            continue
+    raise ValueError(f"日時を解釈できません: {text}")
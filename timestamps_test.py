@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file timestamps_test.py
+@brief timestamps.pyのテストコード
+"""
+
+import unittest
+from datetime import datetime
+
+from timestamps import convert_timestamp, convert_timestamps, excel_serial, parse_timestamp
+
+class TestTimestamps(unittest.TestCase):
+    def setUp(self):
+        """15分の区間をまたぐテスト用の日時"""
+        self.dates = [1683936000000 + i * 997_001 for i in range(2000)]
+
+    def test_convert_timestamp(self):
+        """15分単位のキャッシュを使っても通常の変換と一致することのテスト"""
+        expected = [datetime.fromtimestamp(ms / 1000).strftime('%Y/%m/%d %H:%M:%S')
+                    for ms in self.dates]
+        self.assertEqual(convert_timestamps(self.dates), expected)
+        self.assertEqual([convert_timestamp(ms) for ms in self.dates], expected)
+        self.assertEqual(convert_timestamp("abc"), "未提出")
+
+    def test_excel_serial(self):
+        """Excelのシリアル値がローカル時刻の日時を表すことのテスト"""
+        base = datetime(1899, 12, 30)
+        for ms in self.dates[:200]:
+            serial = excel_serial(ms)
+            seconds = round((serial - int(serial)) * 86400)
+            dt = datetime.fromtimestamp(ms // 1000)
+            self.assertEqual((base.toordinal() + int(serial), seconds),
+                             (dt.toordinal(), dt.hour * 3600 + dt.minute * 60 + dt.second))
+
+    def test_parse_timestamp(self):
+        """表示用の文字列から元の日時（秒単位）に戻せることのテスト"""
+        for ms in self.dates[:200]:
+            self.assertEqual(parse_timestamp(convert_timestamp(ms)), ms // 1000 * 1000)
+        self.assertEqual(parse_timestamp("2023-05-13 09:00"), parse_timestamp("2023/05/13 09:00:00"))
+        self.assertEqual(parse_timestamp("1683936000000"), 1683936000000)
+        with self.assertRaises(ValueError):
+            parse_timestamp("2023/05/13")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file xlsx_writer.py
+@brief 行を順に書き出すだけの軽量な.xlsxライター（標準ライブラリのみ）
+
+シートのXMLをzipファイルへ直接ストリームで書き込むため、
+ブック全体をメモリに保持せず、行数によらず一定のメモリで出力できます。
+文字列はインライン文字列として書き込み（共有文字列表を作らない）、
+日時はExcelのシリアル値に日付の表示形式を付けたセルとして書き込みます。
+"""
+
+import zipfile
+from typing import Dict, Iterable, List, Optional, Union
+
+# セルの値の種類
+Cell = Union[str, int, float, "DateCell", None]
+
+def escape(text: str) -> str:
+    """
+    XMLの特殊文字をエスケープする
+    （xml.sax.saxutilsはurllib・httpを読み込み、起動が遅くなるため使わない）
+
+    @param text 文字列
+    @return エスケープした文字列
+    """
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;")
+
+# 日時セルの表示形式
+DATE_FORMAT = "yyyy/mm/dd hh:mm:ss"
+
+CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>
+</Types>"""
+
+ROOT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>"""
+
+WORKBOOK = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>
+</workbook>"""
+
+WORKBOOK_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+</Relationships>"""
+
+# スタイル0: 標準, スタイル1: 日時（表示形式164）
+STYLES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<numFmts count="1"><numFmt numFmtId="164" formatCode="{date_format}"/></numFmts>
+<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>
+<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>
+<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>
+<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/><xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>
+<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>
+</styleSheet>"""
+
+SHEET_HEADER = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">"""
+
+class DateCell(float):
+    """日時の表示形式で書き込むExcelのシリアル値"""
+    __slots__ = ()
+
+def column_name(index: int) -> str:
+    """
+    列番号を列名に変換する
+
+    @param index 列番号（0始まり）
+    @return 列名（A, B, ..., Z, AA, ...）
+    """
+    name = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        name = chr(ord("A") + rem) + name
+    return name
+
+class XlsxWriter:
+    """1シートの.xlsxファイルを行単位でストリーム出力するライター"""
+
+    def __init__(self, path: str, sheet_name: str = "Sheet1",
+                 column_widths: Optional[Dict[int, float]] = None):
+        """
+        @param path 出力ファイル
+        @param sheet_name シート名
+        @param column_widths 列番号（0始まり）ごとの列幅
+        """
+        self.zip = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED)
+        self.zip.writestr("[Content_Types].xml", CONTENT_TYPES)
+        self.zip.writestr("_rels/.rels", ROOT_RELS)
+        self.zip.writestr("xl/workbook.xml", WORKBOOK.format(name=escape(sheet_name)))
+        self.zip.writestr("xl/_rels/workbook.xml.rels", WORKBOOK_RELS)
+        self.zip.writestr("xl/styles.xml", STYLES.format(date_format=DATE_FORMAT))
+
+        self.sheet = self.zip.open("xl/worksheets/sheet1.xml", "w", force_zip64=True)
+        self.sheet.write(SHEET_HEADER.encode("utf-8"))
+        if column_widths:
+            cols = "".join(f'<col min="{i + 1}" max="{i + 1}" width="{w}" customWidth="1"/>'
+                           for i, w in sorted(column_widths.items()))
+            self.sheet.write(f"<cols>{cols}</cols>".encode("utf-8"))
+        self.sheet.write(b"<sheetData>")
+        self.columns: List[str] = []
+        self.rows = 0
+
+    def write_row(self, values: Iterable[Cell]):
+        """
+        1行を書き込む
+
+        @param values セルの値（文字列・数値・DateCell、Noneは空セル）
+        """
+        self.rows += 1
+        r = self.rows
+        columns = self.columns
+        parts = [f'<row r="{r}">']
+        append = parts.append
+        for i, value in enumerate(values):
+            if i >= len(columns):
+                columns.append(column_name(i))
+            if value is None:
+                continue
+            kind = type(value)
+            if kind is int:
+                append(f'<c r="{columns[i]}{r}"><v>{value}</v></c>')
+            elif kind is DateCell:
+                append(f'<c r="{columns[i]}{r}" s="1"><v>{float(value)!r}</v></c>')
+            elif kind is str:
+                append(f'<c r="{columns[i]}{r}" t="inlineStr"><is><t>{escape(value)}</t></is></c>')
+            elif isinstance(value, (int, float)):
+                append(f'<c r="{columns[i]}{r}"><v>{float(value)!r}</v></c>')
+            else:
+                append(f'<c r="{columns[i]}{r}" t="inlineStr"><is><t>{escape(str(value))}</t></is></c>')
+        append("</row>")
+        self.sheet.write("".join(parts).encode("utf-8"))
+
+    def close(self):
+        """シートを閉じてファイルを完成させる"""
+        self.sheet.write(b"</sheetData></worksheet>")
+        self.sheet.close()
+        self.zip.close()
+
+    def __enter__(self) -> "XlsxWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+@file xlsx_writer_test.py
+@brief xlsx_writer.pyのテストコード
+"""
+
+import os
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+import zipfile
+
+from xlsx_writer import DateCell, XlsxWriter, column_name
+
+NS = {"m": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+class TestXlsxWriter(unittest.TestCase):
+    def setUp(self):
+        """一時ディレクトリを作成"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "out.xlsx")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_cells(self) -> dict:
+        """シートのセルを{参照: (型, スタイル, 値)}として読み込む"""
+        with zipfile.ZipFile(self.path) as z:
+            self.assertIn("xl/styles.xml", z.namelist())
+            root = ET.fromstring(z.read("xl/worksheets/sheet1.xml"))
+        cells = {}
+        for c in root.iterfind(".//m:c", NS):
+            if c.get("t") == "inlineStr":
+                value = c.find("m:is/m:t", NS).text
+            else:
+                value = c.find("m:v", NS).text
+            cells[c.get("r")] = (c.get("t"), c.get("s"), value)
+        return cells
+
+    def test_column_name(self):
+        """列番号から列名への変換テスト"""
+        self.assertEqual([column_name(i) for i in (0, 25, 26, 51, 701, 702)],
+                         ["A", "Z", "AA", "AZ", "ZZ", "AAA"])
+
+    def test_write_rows(self):
+        """文字列・数値・日時・空セルの書き込みテスト"""
+        with XlsxWriter(self.path, "scores", {1: 16}) as writer:
+            writer.write_row(["学籍番号", "氏名<&>"])
+            writer.write_row(["1", 100, DateCell(45763.5), None, 2.5])
+        cells = self.read_cells()
+        self.assertEqual(cells["B1"], ("inlineStr", None, "氏名<&>"))
+        self.assertEqual(cells["A2"], ("inlineStr", None, "1"))
+        self.assertEqual(cells["B2"], (None, None, "100"))
+        self.assertEqual(cells["C2"], (None, "1", "45763.5"))
+        self.assertNotIn("D2", cells)
+        self.assertEqual(cells["E2"], (None, None, "2.5"))
+
+if __name__ == "__main__":
+    unittest.main()